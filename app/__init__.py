@@ -7,6 +7,7 @@ from config.logger import setup_logging_dict
 from .db import init_db, db, shutdown_session
 from .extensions import login_manager
 from .models.user import user_loader
+from .utils.clock import freeze, unfreeze
 
 
 def create_app(cfg_setting: CONFIG = 'default') -> Flask:
@@ -40,5 +41,9 @@ def create_app(cfg_setting: CONFIG = 'default') -> Flask:
     
     # --------- Extension Initialization 
     login_manager.init_app(app)
+
+    # --------- Request Clock, one reference instant for every state check of a request
+    app.before_request(freeze)
+    app.teardown_request(unfreeze)
     
     return app
@@ -4,6 +4,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy_utils import force_auto_coercion
 
+from .utils.ids import use_time_ordered_ids
 from .utils.loaders import load_models
 
 # Our global DB object (imported by models & views & everything else)
@@ -23,6 +24,7 @@ def init_db(app: Flask, database: SQLAlchemy) -> None:
     """
     if isinstance(app, Flask) and isinstance(database, SQLAlchemy):
         force_auto_coercion()
+        use_time_ordered_ids(app.config.get('TIME_ORDERED_IDS', False))
         load_models()
         database.init_app(app)
     else:
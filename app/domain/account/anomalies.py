@@ -0,0 +1,146 @@
+import warnings
+from dataclasses import dataclass
+from typing import Any, Sequence
+from uuid import UUID
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .constants import ROLLOVER_ALLOWANCE, AnomalyType
+
+
+@dataclass
+class ReadingHistory:
+    """Readings of many meters as a `(meters, readings)` matrix, oldest first, padded
+    at the end with `-1` values."""
+
+    meter_ids: list[UUID]
+    values: np.ndarray          # int64, shape (meters, readings)
+    counts: np.ndarray          # Readings by meter
+    top_limits: np.ndarray      # int64, by meter
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> 'ReadingHistory':
+        """Builds the matrix from `(meter_id, value, top_limit)` rows sorted by meter and date."""
+        meter_ids = list(dict.fromkeys(row[0] for row in rows))
+        positions = {meter_id: index for index, meter_id in enumerate(meter_ids)}
+
+        codes = np.array([positions[row[0]] for row in rows], dtype=np.int64)
+        counts = np.bincount(codes, minlength=len(meter_ids))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        columns = np.arange(len(rows)) - starts[codes] if len(rows) else codes
+
+        values = np.full((len(meter_ids), counts.max(initial=0)), -1, dtype=np.int64)
+        values[codes, columns] = [row[1] for row in rows]
+        top_limits = np.zeros(len(meter_ids), dtype=np.int64)
+        top_limits[codes] = [row[2] for row in rows]
+
+        return cls(meter_ids=meter_ids, values=values, counts=counts, top_limits=top_limits)
+
+    def __len__(self) -> int:
+        return len(self.meter_ids)
+
+
+@dataclass
+class HistoryScores:
+    """Per reading consumption and scores of a `ReadingHistory`, `nan` where undefined."""
+
+    consumptions: np.ndarray    # Consumption since the previous reading
+    medians: np.ndarray         # Median of the previous `window` consumptions
+    z_scores: np.ndarray        # Robust z-score of the consumption against the medians
+    rollovers: np.ndarray       # bool, the reading is lower than the previous one
+    suspicious_rollovers: np.ndarray  # bool, rollover from below `top_limit - ROLLOVER_ALLOWANCE`
+
+
+@dataclass(frozen=True)
+class MeterAnomaly:
+
+    meter_id: UUID
+    anomaly_type: AnomalyType
+    score: float
+    consumption: int
+
+
+def score_history(history: ReadingHistory, window: int = 6, min_periods: int = 3) -> HistoryScores:
+    """Scores every reading of every meter at once.
+
+    Consumption follows `WaterMeterMixin.last_consumption` (rollover aware). Each consumption
+    is compared with the median of the meter previous `window` consumptions, the z-score is
+    robust: `(consumption - median) / (1.4826 * MAD)`, with a 1 m³ minimum scale.
+
+    Args:
+        history (ReadingHistory): Readings by meter.
+        window (int, optional): Consumptions in the rolling median. Defaults to 6.
+        min_periods (int, optional): Consumptions needed to score a reading. Defaults to 3.
+
+    Returns:
+        HistoryScores: Scores by meter and reading
+    """
+    values = history.values.astype(float)
+    values[history.values < 0] = np.nan
+    top_limits = history.top_limits[:, None]
+
+    previous = np.concatenate((np.full((len(history), 1), np.nan), values[:, :-1]), axis=1)
+    rollovers = values < previous
+    consumptions = np.where(rollovers, top_limits - (previous - values), values - previous)
+    suspicious = rollovers & (previous < top_limits - ROLLOVER_ALLOWANCE)
+
+    padded = np.concatenate((np.full((len(history), window), np.nan), consumptions), axis=1)
+    windows = sliding_window_view(padded, window, axis=1)[:, :consumptions.shape[1]]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)  # All-nan windows
+        medians = np.nanmedian(windows, axis=2)
+        mad = np.nanmedian(np.abs(windows - medians[..., None]), axis=2)
+
+    medians[np.sum(~np.isnan(windows), axis=2) < min_periods] = np.nan
+    z_scores = (consumptions - medians) / np.maximum(1.4826 * mad, 1.0)
+
+    return HistoryScores(consumptions=consumptions, medians=medians, z_scores=z_scores,
+                         rollovers=rollovers, suspicious_rollovers=suspicious)
+
+
+def detect_anomalies(history: ReadingHistory, window: int = 6, z_threshold: float = 3.5,
+                     stall_readings: int = 3) -> list[MeterAnomaly]:
+    """Flags the meters whose last reading is anomalous.
+
+    LEAK: the last consumption z-score is over `z_threshold`, unless it is a ROLLOVER. STALL: the last `stall_readings`
+    consumptions are 0 on a meter with a positive median before them. ROLLOVER: the last
+    reading rolled over from a value not near the meter top limit.
+
+    Args:
+        history (ReadingHistory): Readings by meter.
+        window (int, optional): Consumptions in the rolling median. Defaults to 6.
+        z_threshold (float, optional): Leak z-score. Defaults to 3.5.
+        stall_readings (int, optional): Zero consumptions of a stall. Defaults to 3.
+
+    Returns:
+        list[MeterAnomaly]: Flagged meters sorted by type and descending score
+    """
+    scores = score_history(history, window)
+    meters = np.arange(len(history))
+    last = history.counts - 1
+
+    consumption = scores.consumptions[meters, last]
+    z_scores = scores.z_scores[meters, last]
+    suspicious_rollovers = scores.suspicious_rollovers[meters, last]
+
+    stall_start = np.maximum(last - stall_readings + 1, 0)
+    columns = stall_start[:, None] + np.arange(stall_readings)[None, :]
+    recent = np.take_along_axis(scores.consumptions, np.minimum(columns, last[:, None]), axis=1)
+    median_before = scores.medians[meters, stall_start]
+    stalled = (last >= stall_readings) & np.all(recent == 0, axis=1) & (median_before > 0)
+
+    flags = [
+        (AnomalyType.LEAK, (z_scores > z_threshold) & ~suspicious_rollovers, z_scores),
+        (AnomalyType.STALL, stalled, median_before),
+        (AnomalyType.ROLLOVER, suspicious_rollovers,
+         (history.top_limits - history.values[meters, np.maximum(last - 1, 0)]) / ROLLOVER_ALLOWANCE),
+    ]
+
+    anomalies = []
+    for anomaly_type, mask, score in flags:
+        for index in sorted(np.flatnonzero(mask), key=lambda index: -score[index]):
+            anomalies.append(MeterAnomaly(meter_id=history.meter_ids[index], anomaly_type=anomaly_type,
+                                          score=round(float(score[index]), 2),
+                                          consumption=int(np.nan_to_num(consumption[index]))))
+    return anomalies
@@ -13,4 +13,15 @@ class SubsidyType(IntEnum):
 
     NONE = 0
     AMOUNT = 1
-    PERCENTAGE = 2
\ No newline at end of file
+    PERCENTAGE = 2
+
+
+class AnomalyType(IntEnum):
+
+    LEAK = 1        # Consumption far above the meter history
+    STALL = 2       # Zero consumption for months on a consuming meter
+    ROLLOVER = 3    # Rollover from a value far from the meter top limit
+
+# Readings lower than the current one are accepted as a meter rollover only when the
+# current reading is within this amount of the meter `top_limit`.
+ROLLOVER_ALLOWANCE = 300
@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Optional, Union
+from uuid import UUID
+
+import numpy as np
+from arrow import Arrow
+
+
+def as_month(value: Union[Arrow, date, np.datetime64], timezone: str = 'America/Santiago') -> np.datetime64:
+    """The `datetime64[M]` month of a date, arrow values are taken at their local `timezone` date."""
+    if isinstance(value, Arrow):
+        value = value.to(timezone).date()
+    return np.datetime64(value, 'M')
+
+
+def month_range(end: np.datetime64, n: int) -> np.ndarray:
+    """The `n` consecutive months ending (inclusive) at `end`."""
+    return np.arange(end - (n - 1), end + 1, dtype='M8[M]')
+
+
+def month_labels(months: np.ndarray, locale: str = 'es') -> list[str]:
+    """Short month names, as shown on the consumption charts."""
+    return [Arrow.fromdate(month.astype('M8[D]').item()).format('MMM', locale=locale)
+            for month in months]
+
+
+def payload_arrays(last_13: Optional[list[dict[str, int]]]) -> tuple[np.ndarray, list[str]]:
+    """Values and labels of the `last_13` stored on a water charge payload."""
+    items = [next(iter(item.items())) for item in last_13 or []]
+    return np.array([value for _, value in items], dtype=np.int64), [label for label, _ in items]
+
+
+@dataclass
+class ConsumptionSeries:
+    """Monthly consumption (m³) of an account, one position per month, missing months as 0."""
+
+    months: np.ndarray      # datetime64[M]
+    values: np.ndarray      # int64
+
+    def labels(self, locale: str = 'es') -> list[str]:
+        return month_labels(self.months, locale)
+
+    def to_payload(self, locale: str = 'es') -> list[dict[str, int]]:
+        """The `last_13` format of `WaterChargePayload`."""
+        return [{label: int(value)} for label, value in zip(self.labels(locale), self.values)]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+@dataclass
+class ConsumptionMatrix:
+    """Monthly consumption of many accounts, shape `(accounts, months)`, missing months as 0."""
+
+    account_ids: list[UUID]
+    months: np.ndarray      # datetime64[M]
+    values: np.ndarray      # int64
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple[Any, Any, int]], months: np.ndarray,
+                  account_ids: Optional[list[UUID]] = None) -> 'ConsumptionMatrix':
+        """Builds the matrix from `(account_id, month, value)` rows. Accounts are the given
+        `account_ids` or, by default, the accounts present in `rows` in order of appearance."""
+        if account_ids is None:
+            account_ids = list(dict.fromkeys(row[0] for row in rows))
+        positions = {account_id: index for index, account_id in enumerate(account_ids)}
+
+        values = np.zeros((len(account_ids), len(months)), dtype=np.int64)
+        rows = [row for row in rows if row[0] in positions]
+        if rows:
+            row_index = np.array([positions[row[0]] for row in rows], dtype=np.int64)
+            column_index = (np.array([row[1] for row in rows], dtype='M8[M]') - months[0]).astype(np.int64)
+            inside = (column_index >= 0) & (column_index < len(months))
+            values[row_index[inside], column_index[inside]] = \
+                np.array([row[2] for row in rows], dtype=np.int64)[inside]
+
+        return cls(account_ids=account_ids, months=months, values=values)
+
+    def series(self, account_id: UUID) -> ConsumptionSeries:
+        return ConsumptionSeries(self.months, self.values[self.account_ids.index(account_id)])
+
+    def __len__(self) -> int:
+        return len(self.account_ids)
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Optional, Iterator
 from uuid import UUID
 
@@ -13,6 +14,23 @@ from ..constants import SubsidyType, AccountState
 from .water_meter import WaterMeterMixin
 
 
+@dataclass(frozen=True)
+class AccountDebt:
+    """Aggregated debt of an account, see `AccountMixin.debt` and `AccountMixin.current_debt`."""
+
+    charges: int = 0
+    renegotiations: int = 0
+    expired_installments: int = 0
+
+    @property
+    def debt(self) -> int:
+        return self.charges + self.renegotiations
+
+    @property
+    def current_debt(self) -> int:
+        return self.charges + self.expired_installments
+
+
 class AccountMixin(BaseMixin):
 
     user_id: UUID
@@ -114,6 +132,15 @@ class AccountMixin(BaseMixin):
         yield from filter(lambda charge: charge.service.service_type.is_water_service and \
                           not charge.nulled, self.charges)
 
+    def has_water_charge_for_reading(self, reading_id: UUID) -> bool:
+        """Checks if a not nulled water charge was already issued for the given reading.
+        Persistence layers should override it with an indexed query."""
+        for charge in self.get_water_charges():
+            if charge.payload['current_reading_id'] == str(reading_id):
+                return True
+
+        return False
+
     def water_charge_available(self) -> bool:
         '''Checks if the account needs a water Charge'''
         if not self.current_water_meter:
@@ -128,11 +155,7 @@ class AccountMixin(BaseMixin):
         if not self.charges:
             return True
 
-        for charge in self.get_water_charges():
-            if self.current_water_meter.current_reading.id == UUID(charge.payload['current_reading_id']):
-                return False
-
-        return True
+        return not self.has_water_charge_for_reading(self.current_water_meter.current_reading.id)
 
     def installation_charge_available(self) -> bool:
 
@@ -148,12 +171,7 @@ class AccountMixin(BaseMixin):
         if not self.charges:
             return True
 
-        for charge in self.get_water_charges():
-            if charge.payload['current_reading_id'] == \
-               str(self.current_water_meter.current_reading.id):
-                return False
-
-        return True
+        return not self.has_water_charge_for_reading(self.current_water_meter.current_reading.id)
 
     def last_charge_of_service_type(self, service_type: ServiceTypeMixin) -> Optional[ChargeMixin]:
         '''Returns the last inserted Charge for the given service_type object'''
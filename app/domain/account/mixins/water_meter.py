@@ -1,10 +1,12 @@
 from typing import Optional, List
 from uuid import UUID
-from arrow import Arrow, utcnow
+from arrow import Arrow
 
 from ...shared.mixins.base import BaseMixin
 from ...shared.mixins.activable import ActivableMixin
+from ..constants import ROLLOVER_ALLOWANCE
 from ..exceptions import ReadingInsertionError
+from ....utils.clock import now
 
 
 class ReadingMixin(BaseMixin):
@@ -45,7 +47,7 @@ class WaterMeterMixin(ActivableMixin):
 
     def needs_reading(self) -> bool:
         if self.current_reading:
-            return self.current_reading.date.shift(months=1) <= utcnow().to('America/Santiago')
+            return self.current_reading.date.shift(months=1) <= now()
         return False
 
     def __reading_sanity_checks(self, reading: ReadingMixin) -> None:
@@ -63,7 +65,7 @@ class WaterMeterMixin(ActivableMixin):
 
         # Verifying Measure Value is Valid -------------------------------------
         if self.current_reading > reading and \
-            self.current_reading.value < self.top_limit - 300: #TODO Extraer esta variable
+            self.current_reading.value < self.top_limit - ROLLOVER_ALLOWANCE:
             raise ReadingInsertionError('Valor de lectura invalido',
                 f'''El valor de la lectura debe ser mayor al de la ultima lectura ingresada; 
                 valor lectura anterior: {self.current_reading.value!r}, 
@@ -0,0 +1,120 @@
+import csv
+from dataclasses import dataclass, field
+from typing import IO, Iterator, Optional
+
+import arrow
+import numpy as np
+
+from .constants import ROLLOVER_ALLOWANCE
+
+
+# Columns of the route readings file
+CSV_FIELDS = ('account', 'value', 'date')
+DATE_FORMATS = ['YYYY-MM-DD', 'DD/MM/YYYY', 'DD-MM-YYYY']
+
+
+@dataclass
+class ReadingRow:
+    """A parsed line of a readings file."""
+
+    line: int
+    account: str
+    value: int
+    date: np.datetime64
+
+
+@dataclass
+class ReadingError:
+    """A rejected line of a readings file."""
+
+    line: int
+    title: str
+    message: str = ''
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a readings import."""
+
+    total: int = 0
+    imported: int = 0
+    errors: list[ReadingError] = field(default_factory=list)
+
+    @property
+    def rejected(self) -> int:
+        return len(self.errors)
+
+
+def parse_readings_csv(stream: IO[str], timezone: str = 'America/Santiago',
+                       errors: Optional[list[ReadingError]] = None) -> Iterator[ReadingRow]:
+    """Streams the rows of a route readings file with `account` (public id), `value` and
+    `date` columns. Lines that can not be parsed are appended to `errors` and skipped.
+
+    Args:
+        stream (IO[str]): The CSV file, `;` or `,` separated, with header.
+        timezone (str, optional): Timezone of the reading dates. Defaults to 'America/Santiago'.
+        errors (Optional[list[ReadingError]], optional): Receives the parsing errors. Defaults to `None`.
+
+    Yields:
+        Iterator[ReadingRow]: The parsed rows, dates as UTC `datetime64[s]`
+    """
+    errors = [] if errors is None else errors
+    sample = stream.read(1024)
+    stream.seek(0)
+    dialect = csv.Sniffer().sniff(sample, delimiters=';,') if sample else csv.excel
+
+    for line, row in enumerate(csv.DictReader(stream, dialect=dialect), start=2):
+        try:
+            account = row['account'].strip()
+            value = int(row['value'])
+            date = arrow.get(row['date'].strip(), DATE_FORMATS, tzinfo=timezone).to('UTC')
+        except (KeyError, TypeError, ValueError, arrow.parser.ParserError) as e:
+            errors.append(ReadingError(line, 'Linea invalida', f'No se pudo leer la linea: {e}'))
+            continue
+
+        yield ReadingRow(line, account, value, np.datetime64(date.naive, 's'))
+
+
+def shift_months(dates: np.ndarray, months: int = 1) -> np.ndarray:
+    """Vectorized `Arrow.shift(months=...)` of `datetime64[s]` values, days past the end of
+    the target month are clipped to its last day."""
+    days = dates.astype('M8[D]')
+    month = days.astype('M8[M]')
+    day_of_month = (days - month.astype('M8[D]')).astype(np.int64)
+
+    target = (month + months).astype('M8[D]')
+    target_length = ((month + months + 1).astype('M8[D]') - target).astype(np.int64)
+
+    return target + np.minimum(day_of_month, target_length - 1) + (dates - days)
+
+
+def validate_readings(values: np.ndarray, dates: np.ndarray, current_values: np.ndarray,
+                      current_dates: np.ndarray, top_limits: np.ndarray) -> np.ndarray:
+    """Vectorized `WaterMeterMixin.__reading_sanity_checks`, meters without a current reading
+    have a negative `current_values`.
+
+    Args:
+        values (np.ndarray): New readings values.
+        dates (np.ndarray): New readings dates, `datetime64[s]`.
+        current_values (np.ndarray): Current reading value of each meter, -1 if none.
+        current_dates (np.ndarray): Current reading date of each meter, `datetime64[s]`.
+        top_limits (np.ndarray): Meters top limit.
+
+    Returns:
+        np.ndarray: Error code by reading, 0 when valid. 1 out of range, 2 lower than the current
+        reading (not a rollover), 3 less than a month after the current reading.
+    """
+    has_current = current_values >= 0
+    out_of_range = (values < 0) | (values > top_limits)
+    decreasing = has_current & (current_values > values) & \
+        (current_values < top_limits - ROLLOVER_ALLOWANCE)
+    too_soon = has_current & (dates < shift_months(current_dates, 1))
+
+    return np.select([out_of_range, decreasing, too_soon], [1, 2, 3], default=0)
+
+
+def first_occurrences(keys: np.ndarray) -> np.ndarray:
+    """Mask of the first occurrence of every key, later ones are duplicates."""
+    mask = np.zeros(len(keys), dtype=bool)
+    mask[np.unique(keys, return_index=True)[1]] = True
+    return mask
@@ -0,0 +1,7 @@
+from enum import IntEnum
+
+
+class OutboxState(IntEnum):
+    PENDING = 0
+    SENT = 1
+    FAILED = 2
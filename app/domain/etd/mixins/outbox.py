@@ -0,0 +1,92 @@
+from hashlib import sha256
+from random import uniform
+from typing import Any, Optional
+
+from arrow import Arrow, utcnow
+
+from ...shared.mixins.base import BaseMixin
+from ..constants.document import DocSetType
+from ..constants.outbox import OutboxState
+from ..sender.constants import ETD_SERVERS, VOUCHER_SENDING_SERVERS
+
+
+class OutboxMixin(BaseMixin):
+    """A signed `EnvioDTE`/`EnvioBOLETA` waiting to be uploaded to SII."""
+
+    doc_set_type: DocSetType
+    development: bool = True
+    rut_issuer: str
+    rut_sender: str
+    xml_data: bytes
+    content_hash: str
+
+    state: OutboxState = OutboxState.PENDING
+    attempts: int = 0
+    next_attempt_at: Optional[Arrow] = None
+    trackid: Optional[str] = None
+    last_error: Optional[str] = None
+    response: Optional[dict[str, Any]] = None
+
+    @property
+    def server(self) -> str:
+        """The SII host this entry is uploaded to."""
+        if self.doc_set_type == DocSetType.VOUCHER:
+            return VOUCHER_SENDING_SERVERS[self.development]
+        return ETD_SERVERS[self.development]
+
+    @property
+    def is_pending(self) -> bool:
+        return self.state == OutboxState.PENDING
+
+    def mark_sent(self, response: dict[str, Any]) -> None:
+        """Stores the SII response and its track id, leaving the outbox.
+
+        Args:
+            response (dict[str, Any]): The upload response dict including track id.
+        """
+        self.response = response
+        self.trackid = str(response['trackid'])
+        self.last_error = None
+        self.state = OutboxState.SENT
+
+    def schedule_retry(self, error: str, base_delay: float = 60, max_delay: float = 3600,
+                       max_attempts: int = 10) -> None:
+        """Registers a failed attempt and schedules the next one using an exponential
+        backoff with jitter. After `max_attempts` the entry is marked as `FAILED`.
+
+        Args:
+            error (str): Error description of the failed attempt.
+            base_delay (float, optional): Seconds to wait after the first failure. Defaults to 60.
+            max_delay (float, optional): Upper bound of the wait in seconds. Defaults to 3600.
+            max_attempts (int, optional): Attempts before giving up. Defaults to 10.
+        """
+        self.attempts = (self.attempts or 0) + 1
+        self.last_error = error[:300]
+
+        if self.attempts >= max_attempts:
+            self.state = OutboxState.FAILED
+            return
+
+        delay = min(base_delay * 2 ** (self.attempts - 1), max_delay)
+        self.next_attempt_at = utcnow().shift(seconds=uniform(delay / 2, delay))
+
+    def postpone(self, seconds: float) -> None:
+        """Moves the next attempt `seconds` ahead without counting a failed attempt, ie:
+        while the host circuit is open.
+
+        Args:
+            seconds (float): Seconds to wait before the next attempt.
+        """
+        self.next_attempt_at = utcnow().shift(seconds=seconds)
+
+    def retry(self) -> None:
+        """Puts a `FAILED` entry back into the outbox."""
+        assert self.state == OutboxState.FAILED
+        self.state = OutboxState.PENDING
+        self.attempts = 0
+        self.next_attempt_at = utcnow()
+
+    @staticmethod
+    def hash_content(xml_data: bytes) -> str:
+        """Hex sha256 digest used to keep uploads idempotent."""
+        return sha256(xml_data).hexdigest()
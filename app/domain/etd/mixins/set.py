@@ -172,6 +172,7 @@ class FolioUsageMixin(BaseMixin, SignableMixin):
 
     doc_set: Optional[DocSetMixin] = field(repr=False, default=None)
     xml_data: Optional[bytes] = field(repr=False, default=None)
+    usage_info: Optional[dict[str, Any]] = field(repr=False, default=None)
 
     @property
     def reference_uri(self) -> str:
@@ -205,7 +206,7 @@ class FolioUsageMixin(BaseMixin, SignableMixin):
 
     def __get_summary(self) -> ET.Element:
 
-        info = self.__get_info()
+        info = self.usage_info or self.__get_info()
 
         root = ET.Element('DocumentoConsumoFolios', attrib={
                           'ID': self.reference_uri})
@@ -14,6 +14,7 @@ from app.models.config import Config
 from ....lib.formaters import _R, _M
 from ...account.constants.service_account import AccountState
 from ...account.mixins.service_account import ServiceAccountMixin
+from ...account.consumption import payload_arrays
 from ...etd.mixins.document import DocumentMixin
 from ...etd.mixins.document.header import IssuerMixin, ReceptorMixin, TotalsMixin
 from ...etd.mixins.document.detail import DetailMixin
@@ -235,12 +236,12 @@ def table_details(details: list[DetailMixin], total_amount: int, units: tuple[fl
     details_table.setStyle(datails_style)
     return details_table
 
-def table_last_13(last_13: dict, units: tuple[float],  htitle: float = 5*mm) -> Table:
+def table_last_13(last_13: list[dict[str, int]], units: tuple[float],  htitle: float = 5*mm) -> Table:
     # Height 14 
     
     wunit, hunit= units
      
-    last_13_chart = consumption_chart(wunit, last_13)
+    last_13_chart = consumption_chart(wunit, *payload_arrays(last_13))
     data = [
         ['Consumo últimos 13 meses'],
         [last_13_chart]
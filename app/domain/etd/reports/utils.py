@@ -1,4 +1,7 @@
 from io import BytesIO
+from typing import Sequence
+
+import numpy as np
 
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 from reportlab.graphics.shapes import Drawing
@@ -11,14 +14,13 @@ from pdf417 import encode, render_image
 from .constants import LOGO_DIR, COLOR_BLACK
 
 
-def consumption_chart(unit, data: list = None):
+def consumption_chart(unit, values: Sequence[int], labels: Sequence[str]):
+    """Monthly consumption bar chart, `values` and `labels` by month, padded to 13 bars."""
     drawing = Drawing(13*unit, 4*unit)
-    data_values = [[list(info.values())[0] for info in data]]
-
-    while len(data_values[0]) < 13:
-        data_values[0].append(0)
+    values = np.asarray(values, dtype=np.int64)
+    data_values = [np.pad(values, (0, max(13 - len(values), 0))).tolist()]
 
-    data_months = [list(info.keys())[0].title() for info in data]
+    data_months = [label.title() for label in labels]
 
     bc = VerticalBarChart()
     bc.x = unit
@@ -34,7 +36,7 @@ def consumption_chart(unit, data: list = None):
     bc.valueAxis.labels.fontName = 'Roboto'
     bc.valueAxis.valueMin = 0
     bc.valueAxis.strokeWidth = .25
-    bc.valueAxis.valueMax = max(data_values[0]) if max(data_values[0]) > 0 else 10
+    bc.valueAxis.valueMax = int(values.max()) if values.size and values.max() > 0 else 10
     bc.valueAxis.labels.fontSize = 5
     bc.valueAxis.labels.dx = -8
     bc.categoryAxis.strokeWidth = .3
@@ -46,8 +48,7 @@ def consumption_chart(unit, data: list = None):
     bc.categoryAxis.categoryNames = data_months
     drawing.add(bc)
 
-    for i in range(len(data[0])):
-        bc.bars[i].fillColor = COLOR_BLACK
+    bc.bars[0].fillColor = COLOR_BLACK
 
     return drawing
 
@@ -1,3 +1,6 @@
+import os
+from typing import Optional
+
 PREFIX = '{' + 'http://www.sii.cl/XMLSchema' + '}'
 
 ETD_SERVERS = {
@@ -13,4 +16,43 @@ VOUCHER_TOKEN_SERVERS = {
 VOUCHER_SENDING_SERVERS = {
     False: 'https://rahue.sii.cl',
     True: 'https://pangal.sii.cl'
-}
\ No newline at end of file
+}
+
+# Base url of a local SII stand-in (see `stand_in.py`), when set every request goes there.
+STAND_IN_SERVER = os.environ.get('SII_STAND_IN_SERVER')
+
+__SII_SERVERS = [
+    (servers, dict(servers)) for servers in (ETD_SERVERS, VOUCHER_TOKEN_SERVERS, VOUCHER_SENDING_SERVERS)
+]
+
+
+def use_stand_in(server: Optional[str]) -> None:
+    """Points every SII server to the given stand-in base url, or back to SII if `None`.
+
+    Args:
+        server (Optional[str]): Stand-in base url, eg: `http://127.0.0.1:8080`.
+    """
+    for servers, sii_servers in __SII_SERVERS:
+        servers.update({development: server or sii_server 
+                        for development, sii_server in sii_servers.items()})
+
+
+if STAND_IN_SERVER:
+    use_stand_in(STAND_IN_SERVER)
+
+# Seconds to wait for SII before giving up on an upload.
+REQUEST_TIMEOUT = 30
+
+# Upload states after which SII will not change the shipment anymore.
+UPLOAD_FINAL_STATES = frozenset({
+    'EPR',  # Envio procesado
+    'RPR',  # Aceptado con reparos
+    'RLV',  # Aceptado con reparos leves
+    'RCH',  # Rechazado
+    'RCT',  # Rechazado por error en caratula
+    'RFR',  # Rechazado por error en firma
+    'RSC',  # Rechazado por error en schema
+    'RCS',  # Rechazado por error en schema
+    'RDC',  # Rechazado por datos de caratula
+    'RPT',  # Repetido
+})
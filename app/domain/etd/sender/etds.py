@@ -8,7 +8,7 @@ from ..constants.document import DocSetType
 from ..mixins.set import DocSetMixin, FolioUsageMixin, SIIShipmentMixin
 from ..mixins.signer import SignerMixin
 
-from .constants import ETD_SERVERS, PREFIX
+from .constants import ETD_SERVERS, PREFIX, REQUEST_TIMEOUT
 from .exceptions import ETDSendingError
 
 
@@ -42,19 +42,26 @@ def send_etd_set(doc_set: Union[DocSetMixin, FolioUsageMixin], token: str,
     '''Returns the response dict including track id '''
     assert doc_set.type == DocSetType.ETD
 
+    return upload_etd_data(doc_set.xml_data, doc_set.cover_data.rut_sender,
+                           doc_set.cover_data.rut_issuer, token, development)
 
-    rut_company, dv_company = doc_set.cover_data.rut_issuer.split('-')
-    rut_sender, dv_sender = doc_set.cover_data.rut_sender.split('-')
+
+def upload_etd_data(xml_data: bytes, rut_sender: str, rut_issuer: str, token: str,
+                    development: bool = True, timeout: float = REQUEST_TIMEOUT) -> dict[str, str]:
+    '''Uploads an already signed `EnvioDTE` and returns the response dict including track id '''
+
+    rut_company, dv_company = rut_issuer.split('-')
+    rut_sender, dv_sender = rut_sender.split('-')
     
     server = ETD_SERVERS[development]
-    url = server + ':443/cgi_dte/UPL/DTEUpload'
+    url = server + '/cgi_dte/UPL/DTEUpload'
     cookies = dict(TOKEN=token)
     data = dict(rutSender=rut_sender, dvSender=dv_sender, rutCompany=rut_company, dvCompany=dv_company)
-    files = {'file': doc_set.xml_data}
+    files = {'file': xml_data}
     headers = {'User-Agent': 'Mozilla/4.0 (compatible; PROG 1.0; Windows NT 5.0; YComp 5.0.2.4)^M'}
     
     s = requests.Session()
-    response = s.post(url=url, data=data, cookies=cookies, files=files, headers=headers)
+    response = s.post(url=url, data=data, cookies=cookies, files=files, headers=headers, timeout=timeout)
     response_element = ET.fromstring(response.content)
 
     if response_element.find('TRACKID') is not None:
@@ -82,3 +89,20 @@ def get_etd_upload_state(shipment: SIIShipmentMixin, token: str, development: bo
     response = bytes(client.service.getEstUp(rut_sender, dv_sender, track_id, token), encoding='utf-8')
     response_element = ET.fromstring(response)
     return response
+
+
+def parse_etd_upload_state(response: bytes) -> str:
+    """Extracts the `ESTADO` code from a `getEstUp` response.
+
+    Args:
+        response (bytes): Raw response returned by `get_etd_upload_state`.
+
+    Returns:
+        str: The shipment state code, eg: `EPR`.
+    """
+    response_element = ET.fromstring(response)
+    state = response_element.find(f'.//{PREFIX}ESTADO')
+    if state is None:
+        state = response_element.find('.//ESTADO')
+
+    return state.text.strip()
@@ -0,0 +1,167 @@
+import logging
+from threading import Event
+from time import monotonic
+from typing import Callable, Optional, Protocol
+
+from ..constants.document import DocSetType
+from ..mixins.outbox import OutboxMixin
+
+from .etds import upload_etd_data
+from .exceptions import ETDSendingError
+from .vouchers import upload_voucher_data
+
+
+class OutboxStore(Protocol):
+    """What the worker needs from the outbox persistence, ie: the `SIIOutbox` model."""
+
+    def due(self, limit: int) -> list[OutboxMixin]: ...
+
+
+class CircuitBreaker:
+    """Stops calling a SII host after `failure_threshold` consecutive failures.
+
+    Once `reset_timeout` seconds have passed the circuit is half open and `allow()` lets
+    attempts through until one finishes: a success closes the circuit, a failure opens it
+    for another `reset_timeout`. It does not limit concurrent attempts, `OutboxWorker`
+    processes entries one at a time so it makes a single trial attempt.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        return self.state != self.OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets an attempt through, 0 if it already does."""
+        if self.opened_at is None:
+            return 0
+        return max(self.reset_timeout - (monotonic() - self.opened_at), 0)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = monotonic()
+
+
+class OutboxWorker:
+    """Drains the SII outbox, retrying failed uploads with jittered exponential backoff.
+
+    Meant to run outside of request threads, eg: a background thread or a scheduled job.
+
+    Example:
+        >>> worker = OutboxWorker(SIIOutbox, lambda doc_set_type, development: token)
+        >>> worker.drain()
+    """
+
+    def __init__(self, outbox: OutboxStore, token_getter: Callable[[DocSetType, bool], str],
+                 batch_size: int = 50, base_delay: float = 60, max_delay: float = 3600,
+                 max_attempts: int = 10, failure_threshold: int = 5, reset_timeout: float = 300) -> None:
+        """
+        Args:
+            outbox (OutboxStore): Source of due entries, entries must provide `save()`.
+            token_getter (Callable[[DocSetType, bool], str]): Returns a valid SII token for
+                                                              the set type and environment.
+            batch_size (int, optional): Max entries processed per drain. Defaults to 50.
+            base_delay (float, optional): Seconds before the first retry. Defaults to 60.
+            max_delay (float, optional): Upper bound between retries in seconds. Defaults to 3600.
+            max_attempts (int, optional): Attempts before an entry is marked as failed. Defaults to 10.
+            failure_threshold (int, optional): Consecutive failures that open a host circuit. Defaults to 5.
+            reset_timeout (float, optional): Seconds an open circuit waits before a new attempt. Defaults to 300.
+        """
+        self.outbox = outbox
+        self.token_getter = token_getter
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, server: str) -> CircuitBreaker:
+        if server not in self.breakers:
+            self.breakers[server] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[server]
+
+    def upload(self, entry: OutboxMixin) -> dict:
+        token = self.token_getter(entry.doc_set_type, entry.development)
+
+        if entry.doc_set_type == DocSetType.VOUCHER:
+            response = upload_voucher_data(entry.xml_data, entry.rut_sender, entry.rut_issuer,
+                                           token, entry.development)
+        else:
+            response = upload_etd_data(entry.xml_data, entry.rut_sender, entry.rut_issuer,
+                                       token, entry.development)
+
+        if not response.get('trackid'):
+            raise ETDSendingError(f'SII response without track id: {response}')
+
+        return response
+
+    def process(self, entry: OutboxMixin) -> bool:
+        """Attempts a single upload, saving the entry whatever the result.
+
+        Entries of a host whose circuit is open are postponed until the circuit lets an
+        attempt through, so they leave the due batches to the entries of the other hosts.
+
+        Returns:
+            bool: `True` if the entry was sent, `False` if skipped or rescheduled.
+        """
+        if not entry.is_pending:
+            return False
+
+        breaker = self.breaker(entry.server)
+        if not breaker.allow():
+            entry.postpone(breaker.retry_after())
+            entry.save()
+            return False
+
+        try:
+            response = self.upload(entry)
+        except Exception as e:
+            breaker.record_failure()
+            logging.warning(f'Outbox upload {entry.content_hash} failed on attempt {entry.attempts + 1}: {e}')
+            entry.schedule_retry(str(e) or e.__class__.__name__, self.base_delay,
+                                 self.max_delay, self.max_attempts)
+            entry.save()
+            return False
+
+        breaker.record_success()
+        entry.mark_sent(response)
+        entry.save()
+        return True
+
+    def drain(self) -> int:
+        """Processes one batch of due entries.
+
+        Returns:
+            int: Amount of entries sent.
+        """
+        return sum(self.process(entry) for entry in self.outbox.due(self.batch_size))
+
+    def run(self, stop: Event, interval: float = 30) -> None:
+        """Drains the outbox every `interval` seconds until `stop` is set."""
+        while not stop.is_set():
+            sent = self.drain()
+            if not sent:
+                stop.wait(interval)
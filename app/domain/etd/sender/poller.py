@@ -0,0 +1,167 @@
+import heapq
+import logging
+from dataclasses import dataclass, field
+from itertools import count
+from threading import Event
+from time import monotonic
+from typing import Callable, Optional
+
+from ..constants.document import SIIShipmentType
+from ..mixins.set import SIIShipmentMixin
+
+from .constants import UPLOAD_FINAL_STATES
+from .etds import get_etd_upload_state, parse_etd_upload_state
+from .vouchers import get_voucher_upload_state, parse_voucher_upload_state
+
+
+@dataclass(order=True)
+class PendingShipment:
+    """Priority queue entry, ordered by the time its shipment must be checked again."""
+
+    next_check: float
+    sequence: int
+    shipment: SIIShipmentMixin = field(compare=False)
+    interval: float = field(compare=False)
+    checks: int = field(compare=False, default=0)
+
+
+class ShipmentPoller:
+    """Keeps track of the pending SII shipments and polls their upload state in batches.
+
+    Every shipment is checked again after its own interval, which grows by `factor` each
+    time SII answers with the same state and goes back to `min_interval` when the state
+    changes. Shipments reaching one of the `UPLOAD_FINAL_STATES` leave the queue.
+
+    Example:
+        >>> poller = ShipmentPoller(lambda shipment_type: tokens[shipment_type],
+        ...                         on_update=lambda shipments: db.session.commit())
+        >>> poller.track(shipment)
+        >>> poller.poll()
+    """
+
+    def __init__(self, token_getter: Callable[[SIIShipmentType], str], development: bool = True,
+                 batch_size: int = 20, min_interval: float = 30, max_interval: float = 6 * 3600,
+                 factor: float = 2.0,
+                 on_update: Optional[Callable[[list[SIIShipmentMixin]], None]] = None) -> None:
+        """
+        Args:
+            token_getter (Callable[[SIIShipmentType], str]): Returns a valid SII token for the
+                                                             given shipment type.
+            development (bool, optional): Uses SII certification servers. Defaults to `True`.
+            batch_size (int, optional): Max amount of shipments checked per poll. Defaults to 20.
+            min_interval (float, optional): Seconds between checks after a state change. Defaults to 30.
+            max_interval (float, optional): Upper bound in seconds of the backoff. Defaults to 6 hours.
+            factor (float, optional): Backoff multiplier for unchanged states. Defaults to 2.0.
+            on_update (Optional[Callable[[list[SIIShipmentMixin]], None]], optional): Called once
+                per poll with the shipments whose status changed, so they can be persisted.
+                Defaults to `None`.
+        """
+        assert 0 < min_interval <= max_interval and factor >= 1 and batch_size > 0
+
+        self.token_getter = token_getter
+        self.development = development
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.on_update = on_update
+
+        self.__queue: list[PendingShipment] = []
+        self.__sequence = count()
+
+    def __len__(self) -> int:
+        return len(self.__queue)
+
+    def track(self, shipment: SIIShipmentMixin, delay: Optional[float] = None,
+              now: Optional[float] = None) -> None:
+        """Adds a shipment to the queue unless its status is already final.
+
+        Args:
+            shipment (SIIShipmentMixin): The shipment to follow, must have a `trackid`.
+            delay (Optional[float], optional): Seconds until its first check. Defaults to `min_interval`.
+            now (Optional[float], optional): Monotonic reference time. Defaults to `monotonic()`.
+        """
+        assert shipment.trackid
+
+        if getattr(shipment, 'status', None) in UPLOAD_FINAL_STATES:
+            return
+
+        now = monotonic() if now is None else now
+        delay = self.min_interval if delay is None else delay
+        heapq.heappush(self.__queue, PendingShipment(now + delay, next(self.__sequence),
+                                                     shipment, self.min_interval))
+
+    def seconds_to_next_check(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds left until the next shipment is due, `None` if the queue is empty."""
+        if not self.__queue:
+            return None
+
+        now = monotonic() if now is None else now
+        return max(self.__queue[0].next_check - now, 0)
+
+    def fetch_state(self, shipment: SIIShipmentMixin) -> str:
+        """Queries SII for the current upload state of the given shipment."""
+        token = self.token_getter(shipment.type)
+
+        if shipment.type == SIIShipmentType.VOUCHER:
+            response = get_voucher_upload_state(shipment, token, self.development)
+            return parse_voucher_upload_state(response)
+
+        response = get_etd_upload_state(shipment, token, self.development)
+        return parse_etd_upload_state(response)
+
+    def poll(self, now: Optional[float] = None) -> list[SIIShipmentMixin]:
+        """Checks up to `batch_size` due shipments and reschedules the ones still pending.
+
+        Args:
+            now (Optional[float], optional): Monotonic reference time. Defaults to `monotonic()`.
+
+        Returns:
+            list[SIIShipmentMixin]: Shipments whose status changed during this poll.
+        """
+        now = monotonic() if now is None else now
+        due: list[PendingShipment] = []
+
+        while self.__queue and self.__queue[0].next_check <= now and len(due) < self.batch_size:
+            due.append(heapq.heappop(self.__queue))
+
+        updated = []
+        for pending in due:
+            shipment = pending.shipment
+            pending.checks += 1
+
+            try:
+                state = self.fetch_state(shipment)
+            except Exception as e:
+                logging.warning(f'Upload state of shipment {shipment.trackid} unavailable: {e}')
+                state = None
+
+            if state and state != getattr(shipment, 'status', None):
+                shipment.status = state
+                updated.append(shipment)
+                pending.interval = self.min_interval
+            else:
+                pending.interval = min(pending.interval * self.factor, self.max_interval)
+
+            if getattr(shipment, 'status', None) in UPLOAD_FINAL_STATES:
+                continue
+
+            pending.next_check = now + pending.interval
+            heapq.heappush(self.__queue, pending)
+
+        if updated and self.on_update:
+            self.on_update(updated)
+
+        return updated
+
+    def run(self, stop: Event, idle_wait: float = 60) -> None:
+        """Polls until `stop` is set, sleeping until the next shipment is due.
+
+        Args:
+            stop (Event): Event that ends the loop.
+            idle_wait (float, optional): Seconds to wait while the queue is empty. Defaults to 60.
+        """
+        while not stop.is_set():
+            self.poll()
+            wait = self.seconds_to_next_check()
+            stop.wait(idle_wait if wait is None else wait)
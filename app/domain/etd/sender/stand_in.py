@@ -0,0 +1,351 @@
+"""Local stand-in for the SII web services used by the sender modules.
+
+Implements the seed, token, `DTEUpload`, voucher envio and upload state endpoints with
+configurable latency, error rate and payload size limit, so the whole signing and
+uploading path can be benchmarked without network access.
+
+In-process usage:
+
+    >>> stand_in = SIIStandIn(StandInConfig(latency=0.2, error_rate=0.05)).start()
+    >>> use_stand_in(stand_in.url)
+    >>> ...  # send sets as usual
+    >>> stand_in.stats
+    >>> stand_in.stop(); use_stand_in(None)
+
+As a subprocess, exporting `SII_STAND_IN_SERVER` to the process doing the uploads:
+
+    $ python -m app.domain.etd.sender.stand_in --port 8080 --latency 0.2 --error-rate 0.05
+"""
+import json
+import random
+import re
+from argparse import ArgumentParser
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from threading import Lock, Thread
+from time import sleep
+from typing import Optional
+from xml.sax.saxutils import escape
+
+from arrow import utcnow
+import lxml.etree as ET
+
+
+SOAP_SERVICES = {
+    'CrSeed': ('getSeed', []),
+    'GetTokenFromSeed': ('getToken', ['pszXml']),
+    'QueryEstUp': ('getEstUp', ['RutCompania', 'DvCompania', 'TrackId', 'Token']),
+}
+
+WSDL_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<wsdl:definitions targetNamespace="{url}" xmlns:impl="{url}"
+    xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/"
+    xmlns:wsdlsoap="http://schemas.xmlsoap.org/wsdl/soap/"
+    xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+  <wsdl:message name="{operation}Request">{parts}</wsdl:message>
+  <wsdl:message name="{operation}Response">
+    <wsdl:part name="{operation}Return" type="xsd:string"/>
+  </wsdl:message>
+  <wsdl:portType name="{service}">
+    <wsdl:operation name="{operation}">
+      <wsdl:input message="impl:{operation}Request" name="{operation}Request"/>
+      <wsdl:output message="impl:{operation}Response" name="{operation}Response"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="{service}SoapBinding" type="impl:{service}">
+    <wsdlsoap:binding style="rpc" transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="{operation}">
+      <wsdlsoap:operation soapAction=""/>
+      <wsdl:input name="{operation}Request">
+        <wsdlsoap:body encodingStyle="http://schemas.xmlsoap.org/soap/encoding/" namespace="{url}" use="encoded"/>
+      </wsdl:input>
+      <wsdl:output name="{operation}Response">
+        <wsdlsoap:body encodingStyle="http://schemas.xmlsoap.org/soap/encoding/" namespace="{url}" use="encoded"/>
+      </wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="{service}Service">
+    <wsdl:port binding="impl:{service}SoapBinding" name="{service}">
+      <wsdlsoap:address location="{url}"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>'''
+
+SOAP_RESPONSE_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <soapenv:Body>
+    <ns1:{operation}Response soapenv:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/" xmlns:ns1="{url}">
+      <{operation}Return xsi:type="xsd:string">{content}</{operation}Return>
+    </ns1:{operation}Response>
+  </soapenv:Body>
+</soapenv:Envelope>'''
+
+SII_RESPONSE_TEMPLATE = '<SII:RESPUESTA xmlns:SII="http://www.sii.cl/XMLSchema">{content}</SII:RESPUESTA>'
+
+VOUCHER_STATE_PATH = re.compile(r'^/recursos/v1/boleta\.electronica\.envio/(\d+)-([\dkK])-(\d+)$')
+
+
+@dataclass
+class StandInConfig:
+    """Behaviour of the stand-in server.
+
+    Attributes:
+        latency (float): Seconds added to every response.
+        jitter (float): Extra random latency, between 0 and `jitter` seconds.
+        error_rate (float): Fraction of requests answered with a `503` error.
+        max_payload (int): Uploads bigger than this amount of bytes are answered with `413`.
+        checks_to_final (int): State queries answered with `REC` before `final_state`.
+        final_state (str): Upload state reported once a shipment is processed.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    max_payload: int = 10 * 1024 * 1024
+    checks_to_final: int = 1
+    final_state: str = 'EPR'
+
+
+@dataclass
+class StandInStats:
+
+    requests: int = 0
+    errors: int = 0
+    rejected: int = 0
+    uploads: int = 0
+    upload_bytes: int = 0
+    lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+
+    def add(self, **amounts: int) -> None:
+        with self.lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return {'requests': self.requests, 'errors': self.errors, 'rejected': self.rejected,
+                    'uploads': self.uploads, 'upload_bytes': self.upload_bytes}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    server: 'StandInServer'
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.headers.get("Host", "%s:%s" % self.server.server_address[:2])}'
+
+    def do_GET(self) -> None:
+        self.handle_request('GET')
+
+    def do_POST(self) -> None:
+        self.handle_request('POST')
+
+    def handle_request(self, method: str) -> None:
+        stand_in = self.server.stand_in
+        config = stand_in.config
+        stand_in.stats.add(requests=1)
+
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        sleep(config.latency + random.uniform(0, config.jitter))
+
+        if config.error_rate and random.random() < config.error_rate:
+            stand_in.stats.add(errors=1)
+            return self.respond(503, b'Service Unavailable', 'text/plain')
+
+        path = self.path.split('?')[0]
+        service = path.rsplit('/', 1)[-1].replace('.jws', '')
+
+        if path.startswith('/DTEWS/') and service in SOAP_SERVICES:
+            if method == 'GET':
+                return self.respond(200, self.wsdl(service, path), 'text/xml')
+            return self.soap(service, path, body)
+
+        if path == '/cgi_dte/UPL/DTEUpload' and method == 'POST':
+            return self.upload(body, voucher=False)
+
+        if path == '/recursos/v1/boleta.electronica.semilla' and method == 'GET':
+            content = f'<SII:RESP_BODY><SEMILLA>{stand_in.new_seed()}</SEMILLA></SII:RESP_BODY>' \
+                      '<SII:RESP_HDR><ESTADO>00</ESTADO></SII:RESP_HDR>'
+            return self.respond(200, SII_RESPONSE_TEMPLATE.format(content=content).encode(), 'application/xml')
+
+        if path == '/recursos/v1/boleta.electronica.token' and method == 'POST':
+            content = f'<SII:RESP_BODY><TOKEN>{stand_in.new_token()}</TOKEN></SII:RESP_BODY>' \
+                      '<SII:RESP_HDR><ESTADO>00</ESTADO><GLOSA>Token Creado</GLOSA></SII:RESP_HDR>'
+            return self.respond(200, SII_RESPONSE_TEMPLATE.format(content=content).encode(), 'application/xml')
+
+        if path == '/recursos/v1/boleta.electronica.envio' and method == 'POST':
+            return self.upload(body, voucher=True)
+
+        if match := VOUCHER_STATE_PATH.match(path):
+            rut, dv, trackid = match.groups()
+            response = {'rut_emisor': f'{rut}-{dv}', 'trackid': int(trackid),
+                        'estado': stand_in.check_state(trackid), 'estadistica': []}
+            return self.respond(200, json.dumps(response).encode(), 'application/json')
+
+        return self.respond(404, b'Not Found', 'text/plain')
+
+    def respond(self, status: int, content: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def wsdl(self, service: str, path: str) -> bytes:
+        operation, params = SOAP_SERVICES[service]
+        parts = ''.join(f'<wsdl:part name="{param}" type="xsd:string"/>' for param in params)
+        return WSDL_TEMPLATE.format(url=self.base_url + path, service=service,
+                                    operation=operation, parts=parts).encode()
+
+    def soap(self, service: str, path: str, body: bytes) -> None:
+        stand_in = self.server.stand_in
+        operation, params = SOAP_SERVICES[service]
+
+        element = ET.fromstring(body).find(f'.//{{*}}{operation}')
+        args = {child.tag.split('}')[-1]: child.text for child in element} if element is not None else {}
+
+        if operation == 'getSeed':
+            content = f'<SII:RESP_BODY><SEMILLA>{stand_in.new_seed()}</SEMILLA></SII:RESP_BODY>' \
+                      '<SII:RESP_HDR><ESTADO>00</ESTADO></SII:RESP_HDR>'
+        elif operation == 'getToken':
+            content = f'<SII:RESP_BODY><TOKEN>{stand_in.new_token()}</TOKEN></SII:RESP_BODY>' \
+                      '<SII:RESP_HDR><ESTADO>00</ESTADO><GLOSA>Token Creado</GLOSA></SII:RESP_HDR>'
+        else:
+            trackid = args.get('TrackId')
+            content = f'<SII:RESP_HDR><SII:TRACKID>{trackid}</SII:TRACKID>' \
+                      f'<SII:ESTADO>{stand_in.check_state(trackid)}</SII:ESTADO></SII:RESP_HDR>'
+
+        response = SOAP_RESPONSE_TEMPLATE.format(url=self.base_url + path, operation=operation,
+                                                 content=escape(SII_RESPONSE_TEMPLATE.format(content=content)))
+        self.respond(200, response.encode(), 'text/xml')
+
+    def upload(self, body: bytes, voucher: bool) -> None:
+        stand_in = self.server.stand_in
+
+        if len(body) > stand_in.config.max_payload:
+            stand_in.stats.add(rejected=1)
+            return self.respond(413, b'Payload Too Large', 'text/plain')
+
+        fields = self.multipart_fields(body)
+        trackid = stand_in.new_trackid()
+        stand_in.stats.add(uploads=1, upload_bytes=len(fields.get('file', b'')))
+
+        rut_sender = f'{fields.get("rutSender", b"").decode()}-{fields.get("dvSender", b"").decode()}'
+        rut_company = f'{fields.get("rutCompany", b"").decode()}-{fields.get("dvCompany", b"").decode()}'
+        timestamp = utcnow().format('YYYY-MM-DD HH:mm:ss')
+
+        if voucher:
+            response = {'rut_emisor': rut_company, 'rut_envia': rut_sender, 'trackid': trackid,
+                        'fecha_recepcion': timestamp, 'estado': 'REC', 'file': 'envio.xml'}
+            return self.respond(200, json.dumps(response).encode(), 'application/json')
+
+        response = f'<?xml version="1.0"?><RECEPCIONDTE><RUTSENDER>{rut_sender}</RUTSENDER>' \
+                   f'<RUTCOMPANY>{rut_company}</RUTCOMPANY><FILE>envio.xml</FILE>' \
+                   f'<TIMESTAMP>{timestamp}</TIMESTAMP><STATUS>0</STATUS>' \
+                   f'<TRACKID>{trackid}</TRACKID></RECEPCIONDTE>'
+        self.respond(200, response.encode(), 'text/html')
+
+    def multipart_fields(self, body: bytes) -> dict[str, bytes]:
+        content_type = self.headers.get('Content-Type', '')
+        message = BytesParser(policy=HTTP).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+
+        if not message.is_multipart():
+            return {}
+
+        return {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+                for part in message.iter_parts()}
+
+
+class StandInServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    stand_in: 'SIIStandIn'
+
+
+class SIIStandIn:
+    """Local SII stand-in server, see module docstring for usage."""
+
+    def __init__(self, config: Optional[StandInConfig] = None, host: str = '127.0.0.1',
+                 port: int = 0) -> None:
+        """
+        Args:
+            config (Optional[StandInConfig], optional): Server behaviour. Defaults to `StandInConfig()`.
+            host (str, optional): Interface to bind. Defaults to '127.0.0.1'.
+            port (int, optional): Port to bind, 0 picks a free one. Defaults to 0.
+        """
+        self.config = config or StandInConfig()
+        self.stats = StandInStats()
+        self.httpd = StandInServer((host, port), StandInHandler)
+        self.httpd.stand_in = self
+        self.thread: Optional[Thread] = None
+
+        self.__ids = count(1)
+        self.__checks: dict[str, int] = {}
+        self.__lock = Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def new_seed(self) -> str:
+        return str(next(self.__ids)).rjust(12, '0')
+
+    def new_token(self) -> str:
+        return f'STANDIN{next(self.__ids)}'
+
+    def new_trackid(self) -> int:
+        return next(self.__ids)
+
+    def check_state(self, trackid: str) -> str:
+        """Returns `REC` for the first `checks_to_final` queries of a track id, then `final_state`."""
+        with self.__lock:
+            checks = self.__checks[trackid] = self.__checks.get(trackid, 0) + 1
+
+        return self.config.final_state if checks > self.config.checks_to_final else 'REC'
+
+    def start(self) -> 'SIIStandIn':
+        """Serves requests from a background thread."""
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Local SII stand-in server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-payload', type=int, default=10 * 1024 * 1024)
+    parser.add_argument('--checks-to-final', type=int, default=1)
+    parser.add_argument('--final-state', default='EPR')
+    args = parser.parse_args()
+
+    stand_in = SIIStandIn(StandInConfig(args.latency, args.jitter, args.error_rate, args.max_payload,
+                                        args.checks_to_final, args.final_state), args.host, args.port)
+    print(f'SII stand-in listening on {stand_in.url}')
+    try:
+        stand_in.serve_forever()
+    except KeyboardInterrupt:
+        stand_in.httpd.server_close()
@@ -9,7 +9,7 @@ from ..mixins.set import DocSetMixin, SIIShipmentMixin
 from ..mixins.signer import SignerMixin
 
 from .exceptions import ETDSendingError
-from .constants import VOUCHER_TOKEN_SERVERS, VOUCHER_SENDING_SERVERS
+from .constants import VOUCHER_TOKEN_SERVERS, VOUCHER_SENDING_SERVERS, REQUEST_TIMEOUT
 
 
 def get_voucher_signed_seed(signer: SignerMixin, server: str) -> bytes:
@@ -49,18 +49,26 @@ def send_voucher_set(doc_set: DocSetMixin, token: str,
                      development: bool = True) -> Union[SIIShipmentMixin, ETDSendingError]:
     assert doc_set.type == DocSetType.VOUCHER
 
-    rut_sender, dv_sender = doc_set.cover_data.rut_sender.split('-')
-    rut_company, dv_company = doc_set.cover_data.rut_issuer.split('-')
+    return upload_voucher_data(doc_set.xml_data, doc_set.cover_data.rut_sender,
+                               doc_set.cover_data.rut_issuer, token, development)
+
+
+def upload_voucher_data(xml_data: bytes, rut_sender: str, rut_issuer: str, token: str,
+                        development: bool = True, timeout: float = REQUEST_TIMEOUT) -> dict[str, Any]:
+    '''Uploads an already signed `EnvioBOLETA` and returns the response dict including track id '''
+
+    rut_sender, dv_sender = rut_sender.split('-')
+    rut_company, dv_company = rut_issuer.split('-')
 
     server = VOUCHER_SENDING_SERVERS[development]
     url = server + '/recursos/v1/boleta.electronica.envio'
     cookies = dict(TOKEN=token)
     data = dict(rutSender=rut_sender, dvSender=dv_sender, rutCompany=rut_company, dvCompany=dv_company)
-    files = {'file': doc_set.xml_data}
+    files = {'file': xml_data}
     headers = {'User-Agent': 'Mozilla/4.0 (compatible; PROG 1.0; Windows NT 5.0; YComp 5.0.2.4)^M'}
 
     s = requests.Session()
-    response = s.post(url=url, data=data, cookies=cookies, files=files, headers=headers)
+    response = s.post(url=url, data=data, cookies=cookies, files=files, headers=headers, timeout=timeout)
 
     try:
         return json.loads(response.content)
@@ -86,3 +94,15 @@ def get_voucher_upload_state(shipment: SIIShipmentMixin, token: str, development
     response = s.get(url=url, headers=headers, cookies=cookies)
 
     return json.loads(response.content)
+
+
+def parse_voucher_upload_state(response: dict[str, Any]) -> str:
+    """Extracts the `estado` code from a voucher upload state response.
+
+    Args:
+        response (dict[str, Any]): Response returned by `get_voucher_upload_state`.
+
+    Returns:
+        str: The shipment state code, eg: `EPR`.
+    """
+    return response['estado']
@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Sequence
+from uuid import UUID
+
+import numpy as np
+
+from ..account.constants import SubsidyType
+from ..etd.constants.document import ExemptionIndex, MeasurementType, MovementType, ValueType
+from ..etd.mixins.document.detail import DetailMixin
+from ..etd.mixins.document.glob_dsc_sur import GlobalDiscountSurchargeMixin
+from ..service.tariff import Tariff
+
+
+@dataclass
+class BillingInput:
+    """Billing information of many accounts, one array position per account."""
+
+    account_ids: list[UUID]
+    current_values: np.ndarray
+    previous_values: np.ndarray     # -1 when the meter has a single reading
+    top_limits: np.ndarray
+    subsidy_types: np.ndarray
+    subsidy_amounts: np.ndarray
+    fixed_charge_exent: np.ndarray
+    fst_leg_exent: np.ndarray
+    exempt_from_payment: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> 'BillingInput':
+        """Builds the arrays from rows of `(account_id, current_value, previous_value, top_limit,
+        subsidy_type, subsidy_amount, fixed_charge_exent, fst_leg_exent, exempt_from_payment)`,
+        `None` values are taken as their defaults.
+        """
+        columns = list(zip(*rows)) if rows else [()] * 9
+
+        def array(values, default, dtype) -> np.ndarray:
+            return np.array([default if value is None else value for value in values], dtype=dtype)
+
+        return cls(account_ids=list(columns[0]),
+                   current_values=array(columns[1], 0, np.int64),
+                   previous_values=array(columns[2], -1, np.int64),
+                   top_limits=array(columns[3], 9999, np.int64),
+                   subsidy_types=array(columns[4], SubsidyType.NONE, np.int8),
+                   subsidy_amounts=array(columns[5], 0, np.int64),
+                   fixed_charge_exent=array(columns[6], False, bool),
+                   fst_leg_exent=array(columns[7], False, bool),
+                   exempt_from_payment=array(columns[8], False, bool))
+
+    def __len__(self) -> int:
+        return len(self.account_ids)
+
+
+@dataclass
+class BillingResult:
+    """Amounts of a billing run, one array position per account."""
+
+    tariff: Tariff
+    account_ids: list[UUID]
+    consumptions: np.ndarray
+    fixed_amounts: np.ndarray
+    tier_quantities: np.ndarray
+    tier_amounts: np.ndarray
+    discounts: np.ndarray
+    billable: np.ndarray            # bool, see `AccountMixin.water_charge_available`
+    totals: np.ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.totals = self.fixed_amounts + self.tier_amounts.sum(axis=1) - self.discounts
+
+    def rows(self) -> Iterator[dict[str, Any]]:
+        """Per account amounts of the billable accounts, ready for bulk inserts or charge creation."""
+        for index in np.flatnonzero(self.billable):
+            account_id = self.account_ids[index]
+            yield {
+                'account_id': account_id,
+                'consumption': int(self.consumptions[index]),
+                'fixed_amount': int(self.fixed_amounts[index]),
+                'consumption_amount': int(self.tier_amounts[index].sum()),
+                'discount': int(self.discounts[index]),
+                'amount': int(self.totals[index]),
+            }
+
+    def details(self, index: int) -> tuple[list[DetailMixin], list[GlobalDiscountSurchargeMixin]]:
+        """Document details and global discounts (subsidy) of the account at `index`,
+        see `DocumentMixin.calculate_totals`."""
+        exemption_index = ExemptionIndex.NO_AFECTO if self.tariff.exempt else None
+        details = [DetailMixin(line=1, item_name='Cargo fijo', item_quantity=1,
+                               item_unit_price=int(self.fixed_amounts[index]),
+                               exemption_index=exemption_index)]
+
+        for tier, quantity in enumerate(self.tier_quantities[index]):
+            if not quantity:
+                continue
+            unit_price = int(self.tier_amounts[index, tier] // quantity)
+            details.append(DetailMixin(line=len(details) + 1, item_name=f'Consumo tramo {tier + 1}',
+                                       item_quantity=int(quantity), item_unit_price=unit_price,
+                                       item_measurement=MeasurementType.METRO_CUBICO,
+                                       exemption_index=exemption_index))
+
+        discounts = []
+        if self.discounts[index]:
+            discounts.append(GlobalDiscountSurchargeMixin(line=1, value_type=ValueType.MONTO,
+                                                          movement_type=MovementType.DESCUENTO,
+                                                          value=int(self.discounts[index]),
+                                                          comment='Subsidio',
+                                                          exemption_index=exemption_index))
+        return details, discounts
+
+
+def consumptions(current: np.ndarray, previous: np.ndarray, top_limits: np.ndarray) -> np.ndarray:
+    """Vectorized `WaterMeterMixin.last_consumption`: 0 without previous reading, and the meter
+    rollover is considered when the current value is lower than the previous one."""
+    rolled_over = top_limits - (previous - current)
+    return np.where(previous < 0, 0, np.where(current < previous, rolled_over, current - previous))
+
+
+def bill(data: BillingInput, tariff: Tariff) -> BillingResult:
+    """Computes the water charges of all accounts in `data` at once.
+
+    Fixed charge is not billed to `fixed_charge_exent` accounts, the first tier is free for
+    `fst_leg_exent` accounts, the subsidy (amount, or percentage of the fixed charge and the
+    consumption up to the tariff `subsidy_limit`) is discounted from the billed amount and
+    `exempt_from_payment` accounts are discounted their whole amount.
+
+    As in `AccountMixin.water_charge_available`, meters with a single reading and
+    `fixed_charge_exent` accounts without consumption are not billable.
+
+    Args:
+        data (BillingInput): Accounts readings & subsidy information.
+        tariff (Tariff): Water service prices, see `Service.tariff`.
+
+    Returns:
+        BillingResult: The per account amounts
+    """
+    consumption = consumptions(data.current_values, data.previous_values, data.top_limits)
+
+    quantities = tariff.tier_quantities(consumption)
+    tier_amounts = tariff.tier_amounts(consumption)
+    tier_amounts[:, 0] = np.where(data.fst_leg_exent, 0, tier_amounts[:, 0])
+
+    fixed_amounts = np.where(data.fixed_charge_exent, 0, tariff.fixed_charge).astype(np.int64)
+    billed = fixed_amounts + tier_amounts.sum(axis=1)
+    subsidized = np.minimum(fixed_amounts + tariff.subsidized_amounts(consumption, data.fst_leg_exent), billed)
+
+    discounts = np.select(
+        [data.subsidy_types == SubsidyType.AMOUNT, data.subsidy_types == SubsidyType.PERCENTAGE],
+        [data.subsidy_amounts, np.rint(subsidized * data.subsidy_amounts / 100)],
+        default=0).astype(np.int64)
+    discounts = np.where(data.exempt_from_payment, billed, np.minimum(discounts, billed))
+
+    billable = (data.previous_values >= 0) & ~(data.fixed_charge_exent & (consumption == 0))
+
+    return BillingResult(tariff=tariff, account_ids=data.account_ids, consumptions=consumption,
+                         fixed_amounts=fixed_amounts, tier_quantities=quantities,
+                         tier_amounts=tier_amounts, discounts=discounts, billable=billable)
@@ -0,0 +1,7 @@
+class BalanceError(Exception):
+    """Balance Exception"""
+
+    def __init__(self, title: str, message: str = ""):
+        self.title = title
+        self.message = message
+        super().__init__(self.message)
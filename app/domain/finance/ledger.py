@@ -0,0 +1,71 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from arrow import Arrow
+
+from ...utils.clock import now
+
+
+LEDGER_TIMEZONE = 'America/Santiago'
+Period = tuple[int, int]    # (year, month)
+
+
+def period_of(at: Optional[Arrow] = None, timezone: str = LEDGER_TIMEZONE) -> Period:
+    """The (year, month) balance period of the local date of `at`, defaults to the request clock."""
+    local = now(at).to(timezone)
+    return local.year, local.month
+
+
+def period_bounds(year: int, month: int, timezone: str = LEDGER_TIMEZONE) -> tuple[Arrow, Arrow]:
+    """UTC start of the period and of the next one, `[start, end)`."""
+    start = Arrow(year, month, 1, tzinfo=timezone)
+    return start.to('UTC'), start.shift(months=1).to('UTC')
+
+
+def outstanding(amount: Optional[int], paid_amount: Optional[int], completed: Optional[bool],
+                nulled: Optional[bool], renegotiated: Optional[bool]) -> int:
+    """Debt of a charge as counted by the ledger, nulled, renegotiated and completed
+    charges owe nothing."""
+    if completed or nulled or renegotiated:
+        return 0
+    return (amount or 0) - (paid_amount or 0)
+
+
+class LedgerDeltas:
+    """Pending changes of the balance aggregates, by period and amount column."""
+
+    def __init__(self) -> None:
+        self.__deltas: dict[Period, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, period: Period, column: str, amount: int) -> None:
+        if amount:
+            self.__deltas[period][column] += amount
+
+    def items(self) -> Iterator[tuple[Period, dict[str, int]]]:
+        for period, columns in self.__deltas.items():
+            columns = {column: amount for column, amount in columns.items() if amount}
+            if columns:
+                yield period, columns
+
+    def clear(self) -> None:
+        self.__deltas.clear()
+
+    def __bool__(self) -> bool:
+        return any(True for _ in self.items())
+
+
+@dataclass
+class PeriodClosing:
+    """Outcome of closing a balance period."""
+
+    year: int
+    month: int
+    assigned: dict[str, int] = field(default_factory=dict)   # Rows assigned by table
+    totals: dict[str, int] = field(default_factory=dict)     # Final balance amounts
+    carried: int = 0                                         # Next period `amount_base`
+    timings: dict[str, float] = field(default_factory=dict)  # Seconds by step
+
+    @property
+    def elapsed(self) -> float:
+        return sum(self.timings.values())
@@ -1,10 +1,11 @@
 from typing import List
-from arrow import Arrow, utcnow
+from arrow import Arrow
 
 from ...shared.mixins.base import BaseMixin
 from .extras import EntryMixin, ExpenseMixin
 from .transaction import TransactionMixin
 from .charge import ChargeMixin
+from ....utils.clock import clock
 
 class BalanceMixin(BaseMixin):
 
@@ -40,7 +41,7 @@ class BalanceMixin(BaseMixin):
     def closeable(self) -> bool:
         if self.closed:
             return False
-        return self.date_to.to('utc').date() <= utcnow().date()
+        return self.date_to.to('utc').date() <= clock().utc_today
 
     @property
     def date_from(self) -> Arrow:
@@ -1,7 +1,8 @@
-from typing import Optional, List, Any
+from dataclasses import dataclass, field, asdict, fields
+from typing import Optional, List, Any, Union
 from uuid import UUID
 
-from arrow import Arrow, utcnow
+from arrow import Arrow
 
 from ...service.mixins.service import ServiceMixin
 
@@ -9,7 +10,84 @@ from .transaction import TransactionMixin
 from ..constants import ChargeState
 from ...shared.mixins.base import BaseMixin
 from ...etd.mixins.etd import ETDMixin
+from ...account.mixins.water_meter import WaterMeterMixin
+from ...account.consumption import ConsumptionSeries
+from ....utils.clock import clock, local_today, now
+
+
+def expiration_limit(at: Optional[Arrow] = None) -> Arrow:
+    """Documents expiring before the returned time are overdue at `at`, that is, their
+    expiration date is before the local (America/Santiago) date of `at`.
+
+    Args:
+        at (Optional[Arrow], optional): Reference time. Defaults to the request clock.
+
+    Returns:
+        Arrow: Start (UTC) of the local date of `at`
+    """
+    return Arrow.fromdate(clock(at).today)
+
+
+@dataclass
+class WaterChargePayload:
+    """Schema of the JSON `payload` of water service charges. Dates are ISO formatted
+    strings and `last_13` is the list of `{month: consumption}` shown on the charge PDF.
+    """
+
+    current_reading_id: str
+    current_reading_value: int
+    current_date: str
+    consumption: int
+    month: str
+    next_date: str
+    previous_reading_id: Optional[str] = None
+    previous_reading_value: int = 0
+    previous_date: Optional[str] = None
+    last_13: list[dict[str, int]] = field(default_factory=list)
+
+    @classmethod
+    def from_water_meter(cls, water_meter: WaterMeterMixin, month: Arrow, next_date: Arrow,
+                         last_13: Optional[Union[ConsumptionSeries, dict[Union[Arrow, str], int]]] = None
+                         ) -> 'WaterChargePayload':
+        """Builds the payload of the water charge for the current reading of `water_meter`.
 
+        Args:
+            water_meter (WaterMeterMixin): Water meter with, at least, a current reading.
+            month (Arrow): Charged consumption month.
+            next_date (Arrow): Date of the next reading.
+            last_13 (Optional[Union[ConsumptionSeries, dict[Union[Arrow, str], int]]], optional): Account
+                consumption by month, see `Account.consumption_series`. Defaults to `None`.
+
+        Returns:
+            WaterChargePayload: The payload
+        """
+        current, previous = water_meter.current_reading, water_meter.previous_reading
+        assert current is not None
+
+        if isinstance(last_13, ConsumptionSeries):
+            last_13_payload = last_13.to_payload()
+        else:
+            last_13_payload = [{key.format('MMM', locale='es') if isinstance(key, Arrow) else str(key): value}
+                               for key, value in (last_13 or {}).items()]
+
+        return cls(current_reading_id=str(current.id), current_reading_value=current.value,
+                   current_date=current.date.date().isoformat(),
+                   consumption=water_meter.last_consumption(),
+                   month=month.format('MMMM YYYY', locale='es').title(),
+                   next_date=next_date.date().isoformat(),
+                   previous_reading_id=str(previous.id) if previous else None,
+                   previous_reading_value=previous.value if previous else 0,
+                   previous_date=previous.date.date().isoformat() if previous else None,
+                   last_13=last_13_payload)
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> 'WaterChargePayload':
+        """Builds the schema from a stored payload, ignoring unknown keys."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in payload.items() if key in names})
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
 
 
 class ChargeMixin(BaseMixin):
@@ -33,13 +111,20 @@ class ChargeMixin(BaseMixin):
 
     balance_id: Optional[UUID] = None
 
+    @property
+    def water_payload(self) -> Optional[WaterChargePayload]:
+        """The typed `payload` of water charges, `None` for other charges."""
+        if not self.payload or 'current_reading_id' not in self.payload:
+            return None
+        return WaterChargePayload.from_dict(self.payload)
+
     @property
     def etd_sent(self) -> bool:
         return self.etd.sii_sent
 
     @property
     def is_deletable(self) -> bool:
-        return self.amount_to_be_paid() == self.amount and not self.etd_sent and not self.renegotiated
+        return self.debt() == self.amount and not self.etd_sent and not self.renegotiated
 
     @property
     def is_nullable(self) -> bool:
@@ -54,13 +139,13 @@ class ChargeMixin(BaseMixin):
         if self.completed:
             return ChargeState.COMPLETED
         
-        if self.is_nulled:
+        if self.nulled:
             return ChargeState.NULLED
 
         if self.renegotiated:
             return ChargeState.RENEGOTIATED
         
-        if self.expires_at.date() < utcnow().to('America/Santiago').date():
+        if self.expires_at and self.expires_at.date() < local_today():
             return ChargeState.OVERDUE
         
         return ChargeState.PENDING
@@ -81,17 +166,17 @@ class ChargeMixin(BaseMixin):
             ValueError: When transaction exceeds the amount to be paid.
         """
 
-        if self.completed or not (0 < transaction.amount <= self.amount_to_be_paid()):
+        if self.completed or not (0 < transaction.amount <= self.debt()):
             raise ValueError('Transaction object invalid amount or charge already completed')
 
-        self.paid_amount += transaction.amount
+        self.paid_amount = (self.paid_amount or 0) + transaction.amount
         self.transactions.append(transaction)
-        self.completed = (self.amount_to_be_paid() == 0)
+        self.completed = (self.debt() == 0)
 
     def days_to_expiration(self) -> int:
         """Returns the amount of days left for this charge to be expired.
         """
-        return (self.expires_at - utcnow()).days
+        return (self.expires_at - now()).days
 
     def has_expired_over(self, months:int = 0, days: int = 0) -> bool:
         """Verifies if the current Charge object has expired over the given time
@@ -106,7 +191,7 @@ class ChargeMixin(BaseMixin):
         if self.completed or not self.expires_at:
             return False
 
-        return self.expires_at.shift(months=months, days=days) < utcnow()
+        return self.expires_at.shift(months=months, days=days) < now()
 
       
 
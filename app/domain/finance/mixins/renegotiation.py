@@ -1,12 +1,13 @@
-from typing import List, Iterator
+from typing import List, Iterator, Optional
 from uuid import UUID
 
-from arrow import Arrow, utcnow
+from arrow import Arrow
 
 from .charge import ChargeMixin
 from .transaction import TransactionMixin
 from ...shared.mixins.base import BaseMixin
 from ..constants import InstallmentState, RenegotiationState
+from ....utils.clock import clock, local_today, now
 
 class InstallmentMixin(BaseMixin):
 
@@ -27,7 +28,7 @@ class InstallmentMixin(BaseMixin):
         if self.completed:
             return InstallmentState.COMPLETED
 
-        if self.expires_at.date() < utcnow().to('America/Santiago').date():
+        if self.expires_at and self.expires_at.date() < local_today():
             return InstallmentState.EXPIRED
 
         return InstallmentState.PENDING
@@ -44,12 +45,13 @@ class InstallmentMixin(BaseMixin):
         Returns:
             int: Days
         """
-        return (self.expires_at.date() - utcnow().date()).days
+        return (self.expires_at.date() - clock().utc_today).days
 
 
 class RenegotiationMixin(BaseMixin):
 
     user_id: UUID
+    account_id: Optional[UUID]
     public_id: str
     amount: int
     paid_amount: int = 0
@@ -95,7 +97,8 @@ class RenegotiationMixin(BaseMixin):
         Yields:
             Iterator[InstallmentMixin]: Installment expired
         """
-        yield from filter(lambda installment: installment.expires_at <= utcnow().to('America/Santiago'), self.installments_left())
+        at = now()
+        yield from filter(lambda installment: installment.expires_at <= at, self.installments_left())
 
     def debt(self) -> int:
         """Shortcut for `self.amount - self.paid_amount`
@@ -120,7 +123,7 @@ class RenegotiationMixin(BaseMixin):
 
         expires_at = next(self.installments_left())[0].expires_at
 
-        return expires_at.shift(months=months, days=days) < utcnow()
+        return expires_at.shift(months=months, days=days) < now()
 
     def accept_transaction(self, transaction: TransactionMixin) -> None:
         """Safely inserts the given transaction into the objects transaction list
@@ -132,21 +135,23 @@ class RenegotiationMixin(BaseMixin):
         Raises:
             ValueError: When transaction exceeds the amount to be paid or already completed.
         """
-        if self.completed or not (0 < transaction.amount <= self.amount_to_be_paid()):
+        if self.completed or not (0 < transaction.amount <= self.debt()):
             raise ValueError('Transaction object invalid amount or charge already completed')
         
         transaction_amount = transaction.amount
         
         for installment in self.installments_left():
-            if 0 < transaction_amount < installment.amount_to_be_paid():
+            if transaction_amount < installment.debt():
                 installment.paid_amount += transaction_amount
+                break
 
-            elif transaction_amount >= installment.amount_to_be_paid():
-                transaction_amount -= installment.amount_to_be_paid()
-                installment.paid_amount = installment.amount
-                installment.completed = True
+            transaction_amount -= installment.debt()
+            installment.paid_amount = installment.amount
+            installment.completed = True
+
+            if transaction_amount == 0:
+                break
         
+        self.paid_amount = (self.paid_amount or 0) + transaction.amount
         self.transactions.append(transaction)
-        self.completed = (self.amount_to_be_paid() == 0)
-    
-
+        self.completed = (self.debt() == 0)
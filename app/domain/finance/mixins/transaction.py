@@ -10,3 +10,4 @@ class TransactionMixin(BaseMixin):
     amount: int
     type: TransactionType = TransactionType.CASH
     payload: Optional[dict[str, str]] = None
+    idempotency_key: Optional[str] = None   # External reference, ie: gateway token or statement line
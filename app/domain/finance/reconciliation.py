@@ -0,0 +1,256 @@
+import csv
+import re
+from collections import Counter
+from hashlib import sha1
+from dataclasses import dataclass, field
+from typing import IO, Callable, Collection, Iterable, Iterator, Optional, Union
+
+import arrow
+from arrow import Arrow
+
+from .constants import TransactionType
+from .mixins.charge import ChargeMixin
+from .mixins.renegotiation import RenegotiationMixin
+from .mixins.transaction import TransactionMixin
+
+
+Debt = Union[ChargeMixin, RenegotiationMixin]
+DATE_FORMATS = ['YYYY-MM-DD', 'DD/MM/YYYY', 'DD-MM-YYYY']
+
+
+@dataclass
+class StatementLine:
+    """A transfer of a bank statement."""
+
+    line: int
+    date: Arrow
+    amount: int
+    reference: str = ''     # Charge or renegotiation public id, as written by the payer
+    rut: str = ''           # Normalized payer RUT, see `normalize_rut`
+    key: str = ''           # Stable identifier of the transfer in the statement
+
+    def allocation_key(self, index: int) -> str:
+        """Idempotency key of the `index`-th transaction created from this line."""
+        return f'{self.key}:{index}'
+
+
+@dataclass
+class Allocation:
+    """Amount of a statement line applied to a charge or renegotiation."""
+
+    line: int
+    public_id: str
+    kind: str               # 'charge' | 'renegotiation'
+    amount: int
+    transaction: TransactionMixin
+
+
+@dataclass
+class Rejection:
+    """Amount of a statement line that could not be applied."""
+
+    line: int
+    title: str
+    message: str = ''
+    amount: int = 0
+
+
+@dataclass
+class ReconciliationReport:
+
+    lines: int = 0
+    received: int = 0
+    allocations: list[Allocation] = field(default_factory=list)
+    rejections: list[Rejection] = field(default_factory=list)
+    already_reconciled: list[int] = field(default_factory=list)  # Lines of a previous run
+    dry_run: bool = False
+
+    @property
+    def allocated(self) -> int:
+        return sum(allocation.amount for allocation in self.allocations)
+
+    @property
+    def unallocated(self) -> int:
+        return sum(rejection.amount for rejection in self.rejections)
+
+    @property
+    def transactions(self) -> list[TransactionMixin]:
+        return [allocation.transaction for allocation in self.allocations]
+
+
+def normalize_rut(rut: Optional[str]) -> str:
+    """`12.345.678-k` -> `12345678-K`, empty when there is nothing RUT like."""
+    clean = re.sub(r'[^0-9kK]', '', rut or '').upper()
+    return f'{clean[:-1]}-{clean[-1]}' if len(clean) > 1 else ''
+
+
+def parse_statement(stream: IO[str], rejections: Optional[list[Rejection]] = None) -> Iterator[StatementLine]:
+    """Streams the transfers of a bank statement CSV file with `date`, `amount`, `reference`
+    and `rut` columns. Lines that can not be parsed are appended to `rejections` and skipped.
+
+    Each line key hashes its fields and the number of identical lines before it, so the same
+    statement, or an overlapping one, yields the same keys when imported again.
+
+    Args:
+        stream (IO[str]): The CSV file, `;` or `,` separated, with header.
+        rejections (Optional[list[Rejection]], optional): Receives the parsing errors. Defaults to `None`.
+
+    Yields:
+        Iterator[StatementLine]: The parsed transfers
+    """
+    rejections = [] if rejections is None else rejections
+    sample = stream.read(1024)
+    stream.seek(0)
+    dialect = csv.Sniffer().sniff(sample, delimiters=';,') if sample else csv.excel
+    occurrences = Counter()
+
+    for line, row in enumerate(csv.DictReader(stream, dialect=dialect), start=2):
+        try:
+            amount = int(re.sub(r'[$.\s]', '', row['amount']))
+            date = arrow.get(row['date'].strip(), DATE_FORMATS, tzinfo='America/Santiago')
+        except (KeyError, TypeError, ValueError, arrow.parser.ParserError) as e:
+            rejections.append(Rejection(line, 'Linea invalida', f'No se pudo leer la linea: {e}'))
+            continue
+
+        if amount <= 0:
+            continue  # Debits & reversals are not payments
+
+        reference, rut = (row.get('reference') or '').strip(), normalize_rut(row.get('rut'))
+        fields = (date.date().isoformat(), str(amount), reference, rut)
+        occurrences[fields] += 1
+        digest = sha1('|'.join(fields + (str(occurrences[fields]),)).encode()).hexdigest()
+
+        yield StatementLine(line=line, date=date, amount=amount, reference=reference, rut=rut,
+                            key=f'statement:{digest}')
+
+
+class Reconciler:
+    """Applies bank transfers to the pending charges and renegotiations they pay.
+
+    Debts are indexed in memory by public id and by their user RUT. A line is matched by its
+    reference (a public id, disambiguated by RUT when a charge and a renegotiation share it)
+    and any remaining amount, or the whole amount of lines without a known reference, is
+    applied to the oldest pending debts of the payer RUT. Every applied amount is a new
+    transaction accepted through `accept_transaction`, so charges and installments follow
+    the same rules as payments registered one by one.
+
+    Transactions carry the `StatementLine.allocation_key` of their line as idempotency key,
+    lines whose first key is already stored were reconciled by a previous run and are skipped.
+
+    Args:
+        debts (Iterable[tuple[Debt, str]]): Pending charges & renegotiations with their user RUT.
+        new_transaction (Callable[[int, dict[str, str], str], TransactionMixin]): Transaction
+            factory, receives the amount, the payload and the idempotency key.
+    """
+
+    def __init__(self, debts: Iterable[tuple[Debt, str]],
+                 new_transaction: Callable[[int, dict[str, str], str], TransactionMixin]) -> None:
+        self.new_transaction = new_transaction
+        self.by_public_id: dict[str, list[tuple[Debt, str]]] = {}
+        self.by_rut: dict[str, list[Debt]] = {}
+
+        for debt, rut in debts:
+            rut = normalize_rut(rut)
+            self.by_public_id.setdefault(str(debt.public_id), []).append((debt, rut))
+            self.by_rut.setdefault(rut, []).append(debt)
+
+        for user_debts in self.by_rut.values():
+            user_debts.sort(key=self.__due_date)
+
+    @staticmethod
+    def __due_date(debt: Debt) -> Arrow:
+        if isinstance(debt, RenegotiationMixin):
+            installment = next(debt.installments_left(), None)
+            expires_at = installment.expires_at if installment else None
+        else:
+            expires_at = debt.expires_at
+        return expires_at or arrow.get(0)
+
+    @staticmethod
+    def is_open(debt: Debt) -> bool:
+        if isinstance(debt, RenegotiationMixin):
+            return not debt.completed and debt.debt() > 0
+        return debt.is_pending and debt.debt() > 0
+
+    def match(self, line: StatementLine) -> Optional[Debt]:
+        """The open debt referenced by the line, if any."""
+        candidates = [(debt, rut) for debt, rut in self.by_public_id.get(line.reference.lstrip('#'), [])
+                      if self.is_open(debt)]
+        if len(candidates) > 1 and line.rut:
+            candidates = [(debt, rut) for debt, rut in candidates if rut == line.rut]
+        return candidates[0][0] if len(candidates) == 1 else None
+
+    def apply(self, line: StatementLine, debt: Debt, amount: int, report: ReconciliationReport) -> int:
+        """Applies up to `amount` of `line` to `debt`, returns the applied amount."""
+        amount = min(amount, debt.debt())
+        if amount <= 0:
+            return 0
+
+        index = 0  # Allocations of a line are contiguous
+        while index < len(report.allocations) and report.allocations[-1 - index].line == line.line:
+            index += 1
+        transaction = self.new_transaction(amount, {
+            'line': str(line.line), 'date': line.date.date().isoformat(),
+            'reference': line.reference, 'rut': line.rut,
+        }, line.allocation_key(index))
+        debt.accept_transaction(transaction)
+
+        kind = 'renegotiation' if isinstance(debt, RenegotiationMixin) else 'charge'
+        report.allocations.append(Allocation(line.line, str(debt.public_id), kind, amount, transaction))
+        return amount
+
+    def reconcile(self, lines: Iterable[StatementLine], report: Optional[ReconciliationReport] = None,
+                  stored_keys: Collection[str] = ()) -> ReconciliationReport:
+        """Applies every statement line, see the class documentation.
+
+        Args:
+            lines (Iterable[StatementLine]): Statement transfers, see `parse_statement`.
+            report (Optional[ReconciliationReport], optional): Report to fill. Defaults to a new one.
+            stored_keys (Collection[str], optional): Stored `allocation_key(0)` of the lines.
+                Defaults to none.
+
+        Returns:
+            ReconciliationReport: Applied & rejected amounts by line
+        """
+        report = report or ReconciliationReport()
+
+        for line in lines:
+            report.lines += 1
+            if line.allocation_key(0) in stored_keys:
+                report.already_reconciled.append(line.line)
+                continue
+
+            report.received += line.amount
+            remaining = line.amount
+
+            debt = self.match(line)
+            if debt is not None:
+                remaining -= self.apply(line, debt, remaining, report)
+                rut = next(rut for candidate, rut in self.by_public_id[str(debt.public_id)]
+                           if candidate is debt)
+            else:
+                rut = line.rut
+
+            for debt in self.by_rut.get(rut, []) if rut else []:
+                if not remaining:
+                    break
+                if self.is_open(debt):
+                    remaining -= self.apply(line, debt, remaining, report)
+
+            if remaining == line.amount:
+                report.rejections.append(Rejection(line.line, 'Transferencia sin asignar',
+                    f'No se encontro deuda pendiente para la referencia {line.reference!r} '
+                    f'y RUT {line.rut!r}.', remaining))
+            elif remaining:
+                report.rejections.append(Rejection(line.line, 'Saldo sin asignar',
+                    f'El monto excede la deuda pendiente en {remaining}.', remaining))
+
+        report.rejections.sort(key=lambda rejection: rejection.line)
+        return report
+
+
+def transfer_factory(transaction_class: type) -> Callable[[int, dict[str, str], str], TransactionMixin]:
+    """`Reconciler` factory of bank transfer transactions of the given model class."""
+    def new_transaction(amount: int, payload: dict[str, str], idempotency_key: str) -> TransactionMixin:
+        return transaction_class.new(amount, TransactionType.TRANSFER, payload, idempotency_key)
+    return new_transaction
@@ -0,0 +1,195 @@
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+from arrow import Arrow
+
+from ..account.readings import shift_months
+from .constants import InstallmentState, RenegotiationState
+from ...utils.clock import clock, local_today, now
+
+
+# Share of the remaining amount expected to be collected, by installment state
+COLLECTION_RATES = {InstallmentState.PENDING: 0.9, InstallmentState.EXPIRED: 0.5}
+
+
+@dataclass
+class Schedule:
+    """Installment plans of many renegotiations (or candidate accounts), one row per plan
+    and one column per installment, padded with 0 amounts and `NaT` due dates."""
+
+    ids: list[Any]
+    amounts: np.ndarray     # int64, (plans, installments)
+    paid: np.ndarray        # int64, (plans, installments)
+    due: np.ndarray         # datetime64[s] UTC, (plans, installments)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]]) -> 'Schedule':
+        """Builds the matrices from `(id, amount, paid_amount, expires_at)` installment rows
+        sorted by id and expiration."""
+        ids = list(dict.fromkeys(row[0] for row in rows))
+        positions = {id: index for index, id in enumerate(ids)}
+
+        codes = np.array([positions[row[0]] for row in rows], dtype=np.int64)
+        counts = np.bincount(codes, minlength=len(ids))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        columns = np.arange(len(rows)) - starts[codes] if len(rows) else codes
+
+        shape = (len(ids), counts.max(initial=0))
+        amounts, paid = np.zeros(shape, dtype=np.int64), np.zeros(shape, dtype=np.int64)
+        due = np.full(shape, np.datetime64('NaT'), dtype='M8[s]')
+        amounts[codes, columns] = [row[1] for row in rows]
+        paid[codes, columns] = [row[2] or 0 for row in rows]
+        due[codes, columns] = [np.datetime64(row[3].to('UTC').naive, 's') for row in rows]
+
+        return cls(ids=ids, amounts=amounts, paid=paid, due=due)
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Mask of the real (not padding) installments."""
+        return ~np.isnat(self.due)
+
+    @property
+    def totals(self) -> np.ndarray:
+        return self.amounts.sum(axis=1)
+
+    def installments(self, index: int) -> list[tuple[int, Arrow]]:
+        """`(amount, expires_at)` of the installments of the plan at `index`."""
+        return [(int(amount), Arrow.fromdatetime(due.item(), tzinfo='UTC'))
+                for amount, due in zip(self.amounts[index], self.due[index]) if not np.isnat(due)]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def merge_schedules(*schedules: Schedule) -> Schedule:
+    """Stacks schedules, ie: existing renegotiations and candidate plans for a what-if."""
+    width = max((schedule.amounts.shape[1] for schedule in schedules), default=0)
+
+    def pad(array: np.ndarray, value) -> np.ndarray:
+        return np.pad(array, ((0, 0), (0, width - array.shape[1])), constant_values=value)
+
+    return Schedule(ids=[id for schedule in schedules for id in schedule.ids],
+                    amounts=np.concatenate([pad(schedule.amounts, 0) for schedule in schedules]),
+                    paid=np.concatenate([pad(schedule.paid, 0) for schedule in schedules]),
+                    due=np.concatenate([pad(schedule.due, np.datetime64('NaT')) for schedule in schedules]))
+
+
+@dataclass
+class Cashflow:
+    """Remaining and expected collection by month."""
+
+    months: np.ndarray      # datetime64[M]
+    scheduled: np.ndarray   # Remaining installment amounts due on each month
+    expected: np.ndarray    # `scheduled` weighted by the collection rates
+
+
+def plan_schedules(ids: Sequence[Any], debts: np.ndarray, counts: Union[int, np.ndarray],
+                   first_due: Union[Arrow, np.ndarray]) -> Schedule:
+    """Splits each debt in `counts` monthly installments at once. Installments are equal,
+    the rounding remainder is added to the first one.
+
+    Args:
+        ids (Sequence[Any]): Plan identifiers, ie: account ids.
+        debts (np.ndarray): Amount to renegotiate by plan.
+        counts (Union[int, np.ndarray]): Installments by plan.
+        first_due (Union[Arrow, np.ndarray]): Due date of the first installments, following
+            ones are due the same day of the next months.
+
+    Raises:
+        ValueError: When a debt is negative or a plan has no installments.
+
+    Returns:
+        Schedule: The plans, nothing paid
+    """
+    debts = np.asarray(debts, dtype=np.int64)
+    counts = np.broadcast_to(np.asarray(counts, dtype=np.int64), debts.shape)
+    if (debts < 0).any() or (counts <= 0).any():
+        raise ValueError('Plans need a non negative debt and at least one installment')
+    if isinstance(first_due, Arrow):
+        first_due = np.datetime64(first_due.to('UTC').naive, 's')
+    first_due = np.broadcast_to(np.asarray(first_due, dtype='M8[s]'), debts.shape)
+
+    columns = np.arange(counts.max(initial=0))
+    valid = columns[None, :] < counts[:, None]
+
+    base = debts // counts
+    amounts = np.where(valid, base[:, None], 0)
+    if amounts.shape[1]:
+        amounts[:, 0] += debts - base * counts
+
+    due = np.stack([shift_months(first_due, int(month)) for month in columns], axis=1) \
+        if len(columns) else np.empty((len(debts), 0), dtype='M8[s]')  # No plans
+    due = np.where(valid, due, np.datetime64('NaT'))
+
+    return Schedule(ids=list(ids), amounts=amounts, paid=np.zeros_like(amounts), due=due)
+
+
+def installment_states(schedule: Schedule, at: Optional[Arrow] = None) -> np.ndarray:
+    """`InstallmentMixin.state` of every installment at `at`, -1 on padding."""
+    completed = schedule.paid >= schedule.amounts
+    expired = schedule.due.astype('M8[D]') < np.datetime64(local_today(at), 'D')
+
+    states = np.select([completed, expired], [InstallmentState.COMPLETED, InstallmentState.EXPIRED],
+                       default=InstallmentState.PENDING)
+    return np.where(schedule.valid, states, -1)
+
+
+def renegotiation_states(schedule: Schedule, at: Optional[Arrow] = None) -> np.ndarray:
+    """`RenegotiationMixin.state` of every plan at `at`, decided by its first installment left."""
+    at = now(at)
+    states = installment_states(schedule, at)
+    left = (states != InstallmentState.COMPLETED) & schedule.valid
+
+    has_left = left.any(axis=1)
+    first = np.argmax(left, axis=1)
+    first_state = states[np.arange(len(schedule)), first]
+    days_left = (schedule.due[np.arange(len(schedule)), first].astype('M8[D]') -
+                 np.datetime64(clock(at).utc_today, 'D')).astype(np.int64)
+
+    return np.select([~has_left, first_state == InstallmentState.EXPIRED, days_left > 5],
+                     [RenegotiationState.COMPLETED, RenegotiationState.OVERDUE, RenegotiationState.UP_TO_DATE],
+                     default=RenegotiationState.PENDING)
+
+
+def current_debts(schedule: Schedule, at: Optional[Arrow] = None) -> np.ndarray:
+    """`RenegotiationMixin.current_debt` of every plan: remaining amount of the installments
+    due at `at`."""
+    at = np.datetime64(now(at).naive, 's')
+    remaining = np.where(schedule.valid & (schedule.due <= at), schedule.amounts - schedule.paid, 0)
+    return np.maximum(remaining, 0).sum(axis=1)
+
+
+def project_cashflow(schedule: Schedule, at: Optional[Arrow] = None,
+                     rates: Optional[dict[InstallmentState, float]] = None) -> Cashflow:
+    """Expected monthly collection of the schedule from the month of `at` on. Expired
+    installments are expected on the first month, weighted by their state collection rate.
+
+    Args:
+        schedule (Schedule): Existing and/or planned installments.
+        at (Optional[Arrow], optional): Reference date. Defaults to the request clock.
+        rates (Optional[dict[InstallmentState, float]], optional): Collection rate by state.
+            Defaults to `COLLECTION_RATES`.
+
+    Returns:
+        Cashflow: Remaining and expected amounts by month
+    """
+    rates = {**COLLECTION_RATES, **(rates or {})}
+    at = clock(at)
+    states = installment_states(schedule, at.now)
+    open_ = (states == InstallmentState.PENDING) | (states == InstallmentState.EXPIRED)
+
+    first_month = np.datetime64(at.today, 'M')
+    offsets = (schedule.due.astype('M8[M]') - first_month).astype(np.int64)
+    offsets = np.maximum(np.where(open_, offsets, 0), 0)
+
+    remaining = np.where(open_, schedule.amounts - schedule.paid, 0)
+    weights = np.select([states == InstallmentState.PENDING, states == InstallmentState.EXPIRED],
+                        [rates[InstallmentState.PENDING], rates[InstallmentState.EXPIRED]], default=0.0)
+
+    length = int(offsets.max(initial=0)) + 1
+    scheduled = np.bincount(offsets.ravel(), weights=remaining.ravel(), minlength=length)
+    expected = np.bincount(offsets.ravel(), weights=(remaining * weights).ravel(), minlength=length)
+
+    return Cashflow(months=first_month + np.arange(length), scheduled=np.rint(scheduled).astype(np.int64),
+                    expected=np.rint(expected).astype(np.int64))
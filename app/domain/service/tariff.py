@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+from .exceptions import TariffError
+
+
+@dataclass(frozen=True, eq=False)
+class Tariff:
+    """Water service prices compiled from the `Service.payload` of the water service:
+
+        {
+            "fixed_charge": 3500,                           # Monthly fixed charge
+            "tiers": [[15, 600], [30, 850], [null, 1200]],  # [upper m³ limit (null: no limit), m³ price]
+            "exempt": true,                                 # Items are not taxed, defaults to true
+            "subsidy_limit": 15                             # m³ covered by percentage subsidies,
+        }                                                   # defaults to no limit
+
+    The payload is validated once, tier breakpoints and prices are kept as read only arrays
+    so pricing many accounts is a single array operation. Use `compile_tariff` to get the
+    cached instance of a service.
+    """
+
+    fixed_charge: int
+    limits: tuple[Optional[int], ...]
+    prices: tuple[int, ...]
+    exempt: bool = True
+    subsidy_limit: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        upper = np.array([np.inf if limit is None else limit for limit in self.limits], dtype=float)
+        lower = np.concatenate(([0.0], upper[:-1]))
+        prices = np.array(self.prices, dtype=np.int64)
+        for array in (upper, lower, prices):
+            array.setflags(write=False)
+
+        object.__setattr__(self, '_upper', upper)
+        object.__setattr__(self, '_lower', lower)
+        object.__setattr__(self, '_prices', prices)
+
+    @classmethod
+    def compile(cls, payload: dict[str, Any]) -> 'Tariff':
+        """Validates a service payload into a `Tariff`.
+
+        Raises:
+            TariffError: When the payload does not describe a valid tariff.
+        """
+        try:
+            tiers = [(None if limit is None else int(limit), int(price))
+                     for limit, price in payload.get('tiers') or []]
+            fixed_charge = int(payload.get('fixed_charge', 0))
+            subsidy_limit = payload.get('subsidy_limit')
+            subsidy_limit = None if subsidy_limit is None else int(subsidy_limit)
+        except (TypeError, ValueError) as e:
+            raise TariffError('Tarifa invalida', f'Formato de tarifa invalido: {e}') from e
+
+        if not tiers:
+            raise TariffError('Tarifa invalida', 'La tarifa debe tener al menos un tramo.')
+        if tiers[-1][0] is not None:
+            raise TariffError('Tarifa invalida', 'El ultimo tramo no debe tener limite.')
+
+        limits = [limit for limit, _ in tiers]
+        if any(limit is None for limit in limits[:-1]) or \
+           any(low >= high for low, high in zip([0] + limits[:-2], limits[:-1])):
+            raise TariffError('Tarifa invalida', 'Los limites de los tramos deben ser crecientes.')
+        if fixed_charge < 0 or any(price < 0 for _, price in tiers) or \
+           (subsidy_limit is not None and subsidy_limit < 0):
+            raise TariffError('Tarifa invalida', 'Los valores de la tarifa no pueden ser negativos.')
+
+        return cls(fixed_charge=fixed_charge, limits=tuple(limits),
+                   prices=tuple(price for _, price in tiers),
+                   exempt=bool(payload.get('exempt', True)), subsidy_limit=subsidy_limit)
+
+    def tier_quantities(self, consumptions: np.ndarray) -> np.ndarray:
+        """m³ billed on each tier, shape `(accounts, tiers)`."""
+        consumptions = np.asarray(consumptions)
+        return np.clip(consumptions[:, None] - self._lower[None, :], 0,
+                       self._upper - self._lower).astype(np.int64)
+
+    def tier_amounts(self, consumptions: np.ndarray) -> np.ndarray:
+        """Amount billed on each tier, shape `(accounts, tiers)`."""
+        return self.tier_quantities(consumptions) * self._prices[None, :]
+
+    def price(self, consumptions: np.ndarray, fixed_charge: bool = True) -> np.ndarray:
+        """Amount of the given consumptions, before subsidies.
+
+        Args:
+            consumptions (np.ndarray): m³ consumed by each account.
+            fixed_charge (bool, optional): Adds the fixed charge. Defaults to `True`.
+
+        Returns:
+            np.ndarray: Amount by account
+        """
+        return self.tier_amounts(consumptions).sum(axis=1) + (self.fixed_charge if fixed_charge else 0)
+
+    def subsidized_amounts(self, consumptions: np.ndarray,
+                           first_tier_exempt: Optional[np.ndarray] = None) -> np.ndarray:
+        """Consumption amount covered by percentage subsidies, up to `subsidy_limit` m³.
+
+        Args:
+            consumptions (np.ndarray): m³ consumed by each account.
+            first_tier_exempt (Optional[np.ndarray], optional): Accounts not billed the first
+                tier, it is not subsidized either. Defaults to none.
+
+        Returns:
+            np.ndarray: Amount by account
+        """
+        consumptions = np.asarray(consumptions)
+        if self.subsidy_limit is not None:
+            consumptions = np.minimum(consumptions, self.subsidy_limit)
+        amounts = self.tier_amounts(consumptions)
+        if first_tier_exempt is not None:
+            amounts[:, 0] = np.where(first_tier_exempt, 0, amounts[:, 0])
+        return amounts.sum(axis=1)
+
+
+__cache: dict[Hashable, Tariff] = {}
+__lock = Lock()
+
+
+def compile_tariff(service_id: Hashable, updated_at: Hashable, payload: dict[str, Any]) -> Tariff:
+    """Returns the compiled tariff of a service, compiling it only when the service
+    changed since the last call.
+
+    Args:
+        service_id (Hashable): The service id.
+        updated_at (Hashable): Last update of the service, `None` if never updated.
+        payload (dict[str, Any]): The service payload.
+
+    Returns:
+        Tariff: The compiled tariff
+    """
+    key = (service_id, updated_at)
+    tariff = __cache.get(key)
+    if tariff is None:
+        tariff = Tariff.compile(payload)
+        with __lock:
+            for stale in [cached for cached in __cache if cached[0] == service_id]:
+                del __cache[stale]
+            __cache[key] = tariff
+    return tariff
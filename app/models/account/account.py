@@ -1,14 +1,33 @@
-from typing import Optional
+from typing import IO, Iterable, Optional
+from uuid import UUID
 
+from arrow import Arrow
+
+import numpy as np
+from sqlalchemy import select, func, case, exists, insert, update, delete, bindparam
+from sqlalchemy.orm import aliased, deferred, undefer, defaultload
+from sqlalchemy.sql import Select
 from sqlalchemy_utils import UUIDType
 from sqlalchemy.ext.mutable import MutableDict
 
 from ...db import db
-from ...domain.account.mixins.account import AccountMixin
-from ...domain.account.constants import SubsidyType
+from ...domain.account.mixins.account import AccountMixin, AccountDebt
+from ...domain.account.constants import SubsidyType, AccountState
+from ...domain.account.consumption import ConsumptionSeries
+from ...domain.account.readings import (ImportReport, ReadingError, parse_readings_csv,
+                                        validate_readings, first_occurrences)
+from ...domain.finance.billing import BillingInput, consumptions
+from ..finance.charge import Charge
+from ..finance.renegotiation import Renegotiation, Installment
+from ..secondaries.water_meter import water_meters_current_readings, water_meters_previous_readings
+from .consumption import Consumption
+from .water_meters import WaterMeter, Reading
 from ..secondaries.account import (accounts_addresses, accounts_current_water_meter, 
                                    accounts_installation_charges, accounts_charges)
 from ..shared.base import Model
+from ..shared.sequence import Sequence
+from ...utils.ids import new_id
+from ...utils.clock import now
 
 
 __all__ = ('Account',)
@@ -18,13 +37,15 @@ class Account(Model, AccountMixin):
 
     __tablename__ = 'accounts'
     # --------- AccountMixin information
-    user_id = db.Column(UUIDType, db.ForeignKey('users.id'))
+    user_id = db.Column(UUIDType, db.ForeignKey('users.id'), index=True)
     public_id = db.Column(db.String(20))
     address = db.relationship('Address', secondary=accounts_addresses, uselist=False)
     
     is_active = db.Column(db.Boolean, default=True)
     is_water_cut = db.Column(db.Boolean, default=False)
-    last_13 = db.Column(MutableDict.as_mutable(db.PickleType), default=dict)
+    # Deferred, list queries never unpickle it. See `with_payloads`.
+    # Legacy, superseded by the `consumptions` table. See `consumption_series`.
+    last_13 = deferred(db.Column(MutableDict.as_mutable(db.PickleType), default=dict))
     
     subsidy_type = db.Column(db.Integer, default=SubsidyType.NONE)
     subsidy_amount = db.Column(db.Integer)
@@ -48,15 +69,288 @@ class Account(Model, AccountMixin):
         return cls(public_id=public_id, subsidy_type=subsidy_type, subsidy_amount=subsidy_amount, fst_leg_exent=fst_leg_exent,
                    fixed_charge_exent=fixed_charge_exent,exempt_from_payment=exempt_from_payment,paid_installation=paid_installation)
         
+    def has_water_charge_for_reading(self, reading_id: UUID) -> bool:
+        """Indexed version of `AccountMixin.has_water_charge_for_reading`, charges payloads are
+        not loaded."""
+        stmt = select(Charge.id) \
+               .join(accounts_charges, accounts_charges.c.charge_id == Charge.id) \
+               .where(accounts_charges.c.account_id == self.id,
+                      Charge.payload_text('current_reading_id') == str(reading_id),
+                      Charge.nulled.is_(False)) \
+               .limit(1)
+
+        return db.session.execute(stmt).first() is not None
+
+    def update_last_13(self, month: Arrow, consumption: int) -> None:
+        """Records the consumption of `month` of the current water meter on the `consumptions`
+        table, nothing is recorded without a current meter."""
+        if self.current_water_meter is not None:
+            Consumption.record(self.id, self.current_water_meter.id, month, consumption)
+
+    def consumption_series(self, n: int = 13, until: Optional[Arrow] = None) -> ConsumptionSeries:
+        """The account consumption of the last `n` months, see `Consumption.last_n`."""
+        return Consumption.last_n(self.id, n, until)
+
+    def debt_summary(self, at: Optional[Arrow] = None) -> AccountDebt:
+        """SQL aggregated version of `debt` and `current_debt`, see `debts`."""
+        return self.debts([self.id], at).get(self.id, AccountDebt())
+
     @classmethod
-    def new_public_id(cls, prefix: str, lenght: int) -> str:
+    def debts(cls, ids: Optional[Iterable[UUID]] = None, at: Optional[Arrow] = None) -> dict[UUID, AccountDebt]:
+        """Computes the debt of many accounts in a single query, without loading their charges,
+        renegotiations or installments.
+
+        Charges debt sums the pending charges, renegotiations debt the not completed renegotiations
+        and expired installments debt the installments of those expired at `at`.
+
+        Args:
+            ids (Optional[Iterable[UUID]], optional): Accounts to compute. Defaults to all accounts.
+            at (Optional[Arrow], optional): Reference time for installments expiration. Defaults to the request clock.
+
+        Returns:
+            dict[UUID, AccountDebt]: Debt by account id
+        """
+        at = now(at)
+
+        charges = select(accounts_charges.c.account_id,
+                         func.sum(Charge.amount - Charge.paid_amount).label('debt')) \
+                  .join(Charge, Charge.id == accounts_charges.c.charge_id) \
+                  .where(Charge.completed.is_not(True), Charge.renegotiated.is_not(True),
+                         Charge.nulled.is_not(True)) \
+                  .group_by(accounts_charges.c.account_id).subquery()
+
+        renegotiations = select(Renegotiation.account_id,
+                                func.sum(Renegotiation.amount - Renegotiation.paid_amount).label('debt')) \
+                         .where(Renegotiation.completed.is_not(True)) \
+                         .group_by(Renegotiation.account_id).subquery()
+
+        installments = select(Renegotiation.account_id,
+                              func.sum(Installment.amount - Installment.paid_amount).label('debt')) \
+                       .join(Installment, Installment.renegotiation_id == Renegotiation.id) \
+                       .where(Renegotiation.completed.is_not(True), Installment.completed.is_not(True),
+                              Installment.expires_at <= at) \
+                       .group_by(Renegotiation.account_id).subquery()
+
+        stmt = select(cls.id, func.coalesce(charges.c.debt, 0), func.coalesce(renegotiations.c.debt, 0),
+                      func.coalesce(installments.c.debt, 0)) \
+               .outerjoin(charges, charges.c.account_id == cls.id) \
+               .outerjoin(renegotiations, renegotiations.c.account_id == cls.id) \
+               .outerjoin(installments, installments.c.account_id == cls.id)
+
+        if ids is not None:
+            stmt = stmt.where(cls.id.in_(list(ids)))
+
+        return {account_id: AccountDebt(int(charges_debt), int(renegotiations_debt), int(installments_debt))
+                for account_id, charges_debt, renegotiations_debt, installments_debt in db.session.execute(stmt)}
+
+    @classmethod
+    def states(cls, ids: Optional[Iterable[UUID]] = None, at: Optional[Arrow] = None) -> dict[UUID, AccountState]:
+        """Classifies many accounts in a single query, same rules as `AccountMixin.state`
+        evaluated against one reference time.
+
+        Args:
+            ids (Optional[Iterable[UUID]], optional): Accounts to classify. Defaults to all accounts.
+            at (Optional[Arrow], optional): Reference time. Defaults to the request clock.
+
+        Returns:
+            dict[UUID, AccountState]: State by account id
+        """
+        at = now(at)
+
+        # A pending charge expired over a month ago (`ChargeMixin.has_expired_over(months=1)`)
+        expired_charge = exists(
+            select(accounts_charges.c.charge_id)
+            .join(Charge, Charge.id == accounts_charges.c.charge_id)
+            .where(accounts_charges.c.account_id == cls.id,
+                   Charge.completed.is_not(True), Charge.renegotiated.is_not(True),
+                   Charge.nulled.is_not(True), Charge.expires_at < at.shift(months=-1))
+        )
+
+        state = case((cls.is_active.is_(False), int(AccountState.DISABLED)),
+                     (cls.is_water_cut.is_(True), int(AccountState.WATER_CUT)),
+                     (expired_charge, int(AccountState.CUT_IN_PROCESS)),
+                     else_=int(AccountState.ACTIVE))
+
+        stmt = select(cls.id, state)
+        if ids is not None:
+            stmt = stmt.where(cls.id.in_(list(ids)))
+
+        return {account_id: AccountState(account_state)
+                for account_id, account_state in db.session.execute(stmt)}
+
+    @classmethod
+    def billing_input(cls, ids: Optional[Iterable[UUID]] = None) -> BillingInput:
+        """Loads the readings & subsidy information of the active accounts with a current water
+        meter, as the arrays used by the billing engine. Like `water_charge_available`, meters
+        need a previous reading and accounts already charged for their current reading are left
+        out, checked with a second query on the `current_reading_id` payload index.
 
-        last_serviceaccount = cls.last_added()
-        last_added_int = 0
+        Args:
+            ids (Optional[Iterable[UUID]], optional): Accounts to load. Defaults to all accounts.
 
-        if last_serviceaccount:
+        Returns:
+            BillingInput: Billing information by account
+        """
+        current, previous = aliased(Reading), aliased(Reading)
 
-            last_added_int = int(
-                last_serviceaccount.public_id.split(prefix)[1])
+        stmt = select(current.id, cls.id, current.value, previous.value, WaterMeter.top_limit, cls.subsidy_type,
+                      cls.subsidy_amount, cls.fixed_charge_exent, cls.fst_leg_exent, cls.exempt_from_payment) \
+               .join(accounts_current_water_meter, accounts_current_water_meter.c.account_id == cls.id) \
+               .join(WaterMeter, WaterMeter.id == accounts_current_water_meter.c.water_meter_id) \
+               .join(water_meters_current_readings,
+                     water_meters_current_readings.c.water_meter_id == WaterMeter.id) \
+               .join(current, current.id == water_meters_current_readings.c.reading_id) \
+               .join(water_meters_previous_readings,
+                     water_meters_previous_readings.c.water_meter_id == WaterMeter.id) \
+               .join(previous, previous.id == water_meters_previous_readings.c.reading_id) \
+               .where(cls.is_active.is_not(False)) \
+               .order_by(cls.public_id)
+
+        if ids is not None:
+            stmt = stmt.where(cls.id.in_(list(ids)))
+
+        rows = db.session.execute(stmt).all()
+        reading_id = Charge.payload_text('current_reading_id')
+        charged = set(db.session.execute(
+            select(reading_id).where(reading_id.in_([str(row[0]) for row in rows]), Charge.nulled.is_(False))
+        ).scalars()) if rows else set()
+
+        return BillingInput.from_rows([row[1:] for row in rows if str(row[0]) not in charged])
+
+    @classmethod
+    def import_readings(cls, stream: IO[str], timezone: str = 'America/Santiago') -> ImportReport:
+        """Imports a route readings file (`account` public id, `value`, `date`) into the current
+        water meter of each account.
+
+        The meters state is loaded in one query, all readings are validated at once with the
+        same rules as `WaterMeterMixin.insert_reading` and the valid ones are written with bulk
+        statements: reading rows, current & previous reading links, consumption increments and the
+        monthly `Consumption` of each meter with a previous reading.
+        Rejected lines are reported, nothing is written for them. The session is not committed.
+
+        Args:
+            stream (IO[str]): The CSV file.
+            timezone (str, optional): Timezone of the reading dates. Defaults to 'America/Santiago'.
+
+        Returns:
+            ImportReport: Imported & rejected lines
+        """
+        report = ImportReport()
+        rows = list(parse_readings_csv(stream, timezone, report.errors))
+        report.total = len(rows) + len(report.errors)
+        if not rows:
+            return report
+
+        stmt = select(cls.public_id, cls.id, WaterMeter.id, WaterMeter.top_limit, Reading.id,
+                      Reading.value, Reading.date) \
+               .join(accounts_current_water_meter, accounts_current_water_meter.c.account_id == cls.id) \
+               .join(WaterMeter, WaterMeter.id == accounts_current_water_meter.c.water_meter_id) \
+               .outerjoin(water_meters_current_readings,
+                          water_meters_current_readings.c.water_meter_id == WaterMeter.id) \
+               .outerjoin(Reading, Reading.id == water_meters_current_readings.c.reading_id) \
+               .where(cls.public_id.in_({row.account for row in rows}))
+        loaded = db.session.execute(stmt).all()
+        meters = {row[0]: row[2:] for row in loaded}
+        account_ids = {row[0]: row[1] for row in loaded}
+
+        known = [row for row in rows if row.account in meters]
+        for row in rows:
+            if row.account not in meters:
+                report.errors.append(ReadingError(row.line, 'Cuenta invalida',
+                    f'La cuenta {row.account!r} no existe o no tiene medidor asignado.'))
+
+        unique = first_occurrences(np.array([row.account for row in known], dtype=str))
+        for row in (row for row, first in zip(known, unique) if not first):
+            report.errors.append(ReadingError(row.line, 'Lectura duplicada',
+                f'La cuenta {row.account!r} tiene mas de una lectura en el archivo.'))
+        known = [row for row, first in zip(known, unique) if first]
+        if not known:
+            return report
+
+        states = [meters[row.account] for row in known]
+        values = np.array([row.value for row in known], dtype=np.int64)
+        dates = np.array([row.date for row in known], dtype='M8[s]')
+        top_limits = np.array([state[1] for state in states], dtype=np.int64)
+        current_values = np.array([-1 if state[3] is None else state[3] for state in states], dtype=np.int64)
+        current_dates = np.array([np.datetime64('NaT') if state[4] is None else state[4].naive
+                                  for state in states], dtype='M8[s]')
+
+        codes = validate_readings(values, dates, current_values, current_dates, top_limits)
+        messages = {
+            1: ('Valor de lectura invalido', 'El valor de la lectura debe encontrarse entre 0 y {top}: valor ingresado {value}.'),
+            2: ('Valor de lectura invalido', 'El valor de la lectura debe ser mayor al de la ultima lectura ingresada: {current}, valor ingresado {value}.'),
+            3: ('Fecha de lectura invalido', 'La fecha de lectura no puede ser menor a 1 mes desde la ultima ingresada: {date}.'),
+        }
+        for index in np.flatnonzero(codes):
+            title, message = messages[int(codes[index])]
+            state = states[index]
+            report.errors.append(ReadingError(known[index].line, title, message.format(
+                top=state[1], value=known[index].value, current=state[3],
+                date=state[4].to(timezone).format('DD/MM/YYYY') if state[4] else '')))
+        report.errors.sort(key=lambda error: error.line)
+
+        valid = np.flatnonzero(codes == 0)
+        if not len(valid):
+            return report
+
+        deltas = consumptions(values[valid], current_values[valid], top_limits[valid])
+        readings, previous, links, monthly = [], [], [], []
+        for index, delta in zip(valid, deltas):
+            meter_id, _, current_id = states[index][:3]
+            reading_id = new_id()
+            date = Arrow.fromdatetime(known[index].date.item(), 'UTC')
+            readings.append({'id': reading_id, 'value': int(values[index]), 'water_meter_id': meter_id,
+                             'date': date})
+            links.append({'water_meter_id': meter_id, 'reading_id': reading_id, 'delta': int(delta)})
+            if current_id is not None:
+                previous.append({'water_meter_id': meter_id, 'reading_id': current_id})
+                monthly.append({'account_id': account_ids[known[index].account], 'water_meter_id': meter_id,
+                                'month': date, 'value': int(delta)})
+
+        meter_ids = [link['water_meter_id'] for link in links]
+        db.session.execute(insert(Reading), readings)
+        db.session.execute(delete(water_meters_previous_readings)
+                           .where(water_meters_previous_readings.c.water_meter_id.in_(meter_ids)))
+        if previous:
+            db.session.execute(insert(water_meters_previous_readings), previous)
+        db.session.execute(delete(water_meters_current_readings)
+                           .where(water_meters_current_readings.c.water_meter_id.in_(meter_ids)))
+        db.session.execute(insert(water_meters_current_readings),
+                           [{'water_meter_id': link['water_meter_id'], 'reading_id': link['reading_id']}
+                            for link in links])
+
+        table = WaterMeter.__table__
+        db.session.execute(update(table).where(table.c.id == bindparam('meter_id'))
+                           .values(consumption=func.coalesce(table.c.consumption, 0) + bindparam('delta'))
+                           .execution_options(synchronize_session=False),
+                           [{'meter_id': link['water_meter_id'], 'delta': link['delta']} for link in links])
+        Consumption.record_many(monthly)
+
+        report.imported = len(links)
+        return report
+
+    @classmethod
+    def with_payloads(cls, select_stmt: Optional[Select] = None) -> Select:
+        """Select statement that loads the deferred `last_13` and the `payload` of the account
+        charges. Use it on the billing paths (water charge availability, PDF rendering).
+
+        Args:
+            select_stmt (Optional[Select], optional): Statement to extend. Defaults to `select(Account)`.
+
+        Returns:
+            Select: The statement with the payloads undeferred
+        """
+        return (select(cls) if select_stmt is None else select_stmt) \
+               .options(undefer(cls.last_13), defaultload(cls.charges).undefer(Charge.payload))
+
+    @classmethod
+    def new_public_id(cls, prefix: str, lenght: int) -> str:
+        """Allocates the next public id for the given prefix, ie: `prefix` + `0001`.
+        The sequence is seeded from the greatest public id of the prefix."""
+        def last_public_number() -> int:
+            stmt = select(cls.public_id).where(cls.public_id.startswith(prefix))
+            numbers = [public_id[len(prefix):] for public_id in db.session.execute(stmt).scalars()]
+            return max((int(number) for number in numbers if number.isdigit()), default=0)
 
-        return prefix + str(last_added_int + 1).rjust(lenght, '0')
+        number = Sequence.next_value(f'accounts.public_id.{prefix}', seed=last_public_number)
+        return prefix + str(number).rjust(lenght, '0')
@@ -0,0 +1,119 @@
+from datetime import date
+from typing import Any, Iterable, Optional, Union
+from uuid import UUID
+
+import numpy as np
+from arrow import Arrow
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy_utils import UUIDType
+
+from ...db import db
+from ...domain.account.consumption import (ConsumptionSeries, ConsumptionMatrix, as_month,
+                                           month_range)
+from ..shared.base import Model
+
+
+__all__ = ('Consumption',)
+
+
+class Consumption(Model):
+    """Monthly consumption (m³) measured by a water meter, one narrow row per meter and month.
+
+    Replaces the pickled `Account.last_13`: a new month is a single row insert, and series
+    or facility wide matrices are read with one indexed range scan as numpy arrays. Rows are
+    kept by meter so a replaced meter never mixes its readings with the new one, account
+    series add the meters of each month.
+    """
+
+    __tablename__ = 'consumptions'
+
+    account_id = db.Column(UUIDType, db.ForeignKey('accounts.id'), nullable=False)
+    water_meter_id = db.Column(UUIDType, db.ForeignKey('water_meters.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)     # First day of the month
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('water_meter_id', 'month', name='uq_consumptions_water_meter_id_month'),
+        db.Index('ix_consumptions_account_id_month', 'account_id', 'month'),
+        db.Index('ix_consumptions_month_account_id', 'month', 'account_id'),
+    )
+
+    @classmethod
+    def record(cls, account_id: UUID, water_meter_id: UUID, month: Union[Arrow, np.datetime64],
+               value: int) -> None:
+        """Sets the consumption of a meter month, replacing the previous value if any.
+
+        Args:
+            account_id (UUID): The account id.
+            water_meter_id (UUID): Measuring water meter.
+            month (Union[Arrow, np.datetime64]): Consumption month, arrow values at their local date.
+            value (int): Consumption m³.
+        """
+        cls.record_many([{'account_id': account_id, 'water_meter_id': water_meter_id,
+                          'month': month, 'value': value}])
+
+    @classmethod
+    def record_many(cls, rows: list[dict[str, Any]]) -> None:
+        """Bulk `record`, previous values of the same meter months are replaced. Two
+        statements per distinct month, whatever the number of rows.
+
+        Args:
+            rows (list[dict[str, Any]]): `account_id`, `water_meter_id`, `month` & `value` items.
+        """
+        rows = [{**row, 'month': as_month(row['month']).astype('M8[D]').item()} for row in rows]
+        meters_by_month: dict[date, list[UUID]] = {}
+        for row in rows:
+            meters_by_month.setdefault(row['month'], []).append(row['water_meter_id'])
+
+        for month, meter_ids in meters_by_month.items():
+            db.session.execute(delete(cls).where(cls.month == month, cls.water_meter_id.in_(meter_ids))
+                               .execution_options(synchronize_session=False))
+        if rows:
+            db.session.execute(insert(cls), rows)
+
+    @classmethod
+    def last_n(cls, account_id: UUID, n: int = 13,
+               until: Optional[Union[Arrow, np.datetime64]] = None) -> ConsumptionSeries:
+        """The consumption of the `n` months of an account ending at `until`.
+
+        Args:
+            account_id (UUID): The account id.
+            n (int, optional): Number of months. Defaults to 13.
+            until (Optional[Union[Arrow, np.datetime64]], optional): Last month of the series.
+                Defaults to the last recorded month of the account.
+
+        Returns:
+            ConsumptionSeries: The series, months without record as 0
+        """
+        if until is None:
+            last = db.session.execute(select(func.max(cls.month))
+                                      .where(cls.account_id == account_id)).scalar()
+            if last is None:
+                return ConsumptionSeries(np.array([], dtype='M8[M]'), np.array([], dtype=np.int64))
+            until = np.datetime64(last, 'M')
+
+        return cls.matrix(month_range(as_month(until), n), [account_id]).series(account_id)
+
+    @classmethod
+    def matrix(cls, months: np.ndarray, account_ids: Optional[Iterable[UUID]] = None) -> ConsumptionMatrix:
+        """Loads the `month × account` consumption matrix of consecutive `months`.
+
+        Args:
+            months (np.ndarray): Consecutive `datetime64[M]` months, see `month_range`.
+            account_ids (Optional[Iterable[UUID]], optional): Matrix rows. Defaults to all the
+                accounts with consumption on the months, ordered by id.
+
+        Returns:
+            ConsumptionMatrix: Consumption by account and month, added over the account meters
+        """
+        stmt = select(cls.account_id, cls.month, func.sum(cls.value)) \
+               .where(cls.month >= months[0].astype('M8[D]').item(),
+                      cls.month <= months[-1].astype('M8[D]').item()) \
+               .group_by(cls.account_id, cls.month) \
+               .order_by(cls.account_id, cls.month)
+
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            stmt = stmt.where(cls.account_id.in_(account_ids))
+
+        return ConsumptionMatrix.from_rows(db.session.execute(stmt).all(), months, account_ids)
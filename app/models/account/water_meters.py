@@ -1,8 +1,12 @@
-from typing import Optional
+from typing import Iterable, Optional
+from uuid import UUID
+
 from arrow import utcnow, Arrow
+from sqlalchemy import select
 from sqlalchemy_utils import ArrowType, UUIDType
 
 from ...db import db
+from ...domain.account.anomalies import ReadingHistory, MeterAnomaly, detect_anomalies
 from ...domain.account.mixins.water_meter import WaterMeterMixin, ReadingMixin
 from ..secondaries.water_meter import water_meters_current_readings, water_meters_previous_readings
 from ..shared.base import Model
@@ -20,7 +24,7 @@ class Reading(Model, ReadingMixin):
     date = db.Column(ArrowType, nullable=False, default=utcnow)
 
     # relationships
-    water_meter_id = db.Column(UUIDType, db.ForeignKey('water_meters.id'))
+    water_meter_id = db.Column(UUIDType, db.ForeignKey('water_meters.id'), index=True)
     
     @classmethod
     def new(cls, value: int, date: Optional[Arrow] = None) -> 'Reading':
@@ -53,8 +57,32 @@ class WaterMeter(Model, Activable, WaterMeterMixin):
                                uselist=True, lazy='joined')
 
     # Platform Needs ----------------------------------------------------------
-    account_id = db.Column(UUIDType, db.ForeignKey('accounts.id'))
+    account_id = db.Column(UUIDType, db.ForeignKey('accounts.id'), index=True)
         
     @classmethod
     def new(cls, serial_number: str = None, top_limit: int = 9999) -> 'WaterMeter':
         return cls(serial_number=serial_number, top_limit=top_limit)
+
+    @classmethod
+    def reading_history(cls, ids: Optional[Iterable[UUID]] = None) -> ReadingHistory:
+        """Loads, in one query, the readings of the water meters as a matrix.
+
+        Args:
+            ids (Optional[Iterable[UUID]], optional): Water meters to load. Defaults to all meters.
+
+        Returns:
+            ReadingHistory: Readings by meter, oldest first
+        """
+        stmt = select(Reading.water_meter_id, Reading.value, cls.top_limit) \
+               .join(cls, cls.id == Reading.water_meter_id) \
+               .order_by(Reading.water_meter_id, Reading.date)
+
+        if ids is not None:
+            stmt = stmt.where(cls.id.in_(list(ids)))
+
+        return ReadingHistory.from_rows(db.session.execute(stmt).all())
+
+    @classmethod
+    def scan_anomalies(cls, ids: Optional[Iterable[UUID]] = None, **options) -> list[MeterAnomaly]:
+        """Flags leaking, stalled and suspiciously rolled over meters, see `detect_anomalies`."""
+        return detect_anomalies(cls.reading_history(ids), **options)
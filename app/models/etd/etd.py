@@ -0,0 +1,200 @@
+from typing import Any, Iterable, Optional
+
+from arrow import Arrow
+from sqlalchemy import select, func
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import deferred, undefer, validates
+from sqlalchemy.sql import Select
+from sqlalchemy_utils import ArrowType
+import lxml.etree as ET
+
+from ...db import db
+from ...domain.etd.constants.document import DocumentType
+from ...domain.etd.mixins.document import DocumentMixin
+from ...domain.etd.mixins.etd import ETDMixin
+from ..shared.base import Model
+from ..shared.types import CompressedBinary
+
+
+__all__ = ('ETD',)
+
+
+class ETD(Model, ETDMixin):
+
+    __tablename__ = 'etds'
+    __table_args__ = (
+        db.Index('ix_etds_doc_type_folio', 'doc_type', 'folio', unique=True),
+        db.Index('ix_etds_doc_type_date_emited_folio', 'doc_type', 'date_emited', 'folio'),
+        db.Index('ix_etds_rut_receptor_date_emited', 'rut_receptor', 'date_emited'),
+    )
+    # ---------- Header information
+    doc_type = db.Column(db.Integer, nullable=False)
+    folio = db.Column(db.BigInteger, nullable=False)
+    date_emited = db.Column(ArrowType, nullable=False)
+    rut_receptor = db.Column(db.String(10), nullable=False)
+    net_amount = db.Column(db.BigInteger, default=0)
+    tax_amount = db.Column(db.BigInteger, default=0)
+    exent_amount = db.Column(db.BigInteger, default=0)
+    total_amount = db.Column(db.BigInteger, default=0)
+    # ---------- ETDMixin
+    # Compressed at rest, only loaded and inflated when accessed.
+    xml_data = deferred(db.Column(CompressedBinary()))
+    sii_sent = db.Column(db.Boolean, default=False)
+    trackid = db.Column(db.String(20), index=True)
+
+    # Models compare by identity, not by the ETDMixin dataclass fields.
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    @property
+    def document(self) -> Optional[DocumentMixin]:
+        """The `DocumentMixin` built from `xml_data` on first access."""
+        if getattr(self, '_document', None) is None and self.xml_data:
+            self._document = DocumentMixin.from_xml_element(
+                ET.fromstring(self.xml_data).find('Documento'))
+        return getattr(self, '_document', None)
+
+    @document.setter
+    def document(self, document: DocumentMixin) -> None:
+        self._document = document
+
+    @validates('rut_receptor')
+    def validate_rut_receptor(self, key: str, value: str) -> str:
+        return value.upper().replace('.', '')
+
+    @classmethod
+    def new(cls, etd: ETDMixin, trackid: Optional[str] = None) -> 'ETD':
+        """Creates the persisted version of a signed `etd`, extracting its header fields.
+
+        Args:
+            etd (ETDMixin): The signed ETD, its `xml_data` must be constructed.
+            trackid (Optional[str], optional): SII track id of the shipment that included it. Defaults to `None`.
+
+        Returns:
+            ETD: The new ETD
+        """
+        document = etd.document
+        totals = document.header.totals
+
+        obj = cls(doc_type=document.doc_type, folio=document.folio, date_emited=document.timestamp,
+                  rut_receptor=document.header.receptor.rut, trackid=trackid,
+                  net_amount=totals.net_amount, tax_amount=totals.tax_amount,
+                  exent_amount=totals.exent_amount, total_amount=totals.total_amount,
+                  xml_data=etd.xml_data, sii_sent=etd.sii_sent)
+        obj.document = document
+
+        return obj
+
+    @classmethod
+    def with_xml(cls, select_stmt: Optional[Select] = None) -> Select:
+        """Select statement that loads the deferred `xml_data` along with the documents.
+        Use it on the paths that read it (PDF rendering, XML building)."""
+        return (select(cls) if select_stmt is None else select_stmt).options(undefer(cls.xml_data))
+
+    @classmethod
+    def by_folio(cls, doc_type: DocumentType, folio: int, with_xml: bool = False) -> Optional['ETD']:
+        """Returns the document of the given type and folio, if any. `with_xml` loads its
+        `xml_data` in the same query."""
+        stmt = cls._and_query(dict(doc_type=int(doc_type), folio=folio))
+        if with_xml:
+            stmt = stmt.options(undefer(cls.xml_data))
+        return db.session.execute(stmt).scalars().first()
+
+    @classmethod
+    def of_receptor(cls, rut: str, doc_types: Optional[Iterable[DocumentType]] = None) -> list['ETD']:
+        """Returns the documents emited to the given receptor RUT, newest first.
+
+        Args:
+            rut (str): The receptor RUT, dots are ignored.
+            doc_types (Optional[Iterable[DocumentType]], optional): Only these types. Defaults to `None`.
+
+        Returns:
+            list[ETD]: The receptor documents
+        """
+        stmt = select(cls).where(cls.rut_receptor == rut.upper().replace('.', ''))
+        if doc_types is not None:
+            stmt = stmt.where(cls.doc_type.in_([int(doc_type) for doc_type in doc_types]))
+
+        return db.session.execute(stmt.order_by(cls.date_emited.desc())).scalars().all()
+
+    @classmethod
+    def sales_book(cls, date_from: Arrow, date_to: Arrow,
+                   doc_types: Optional[Iterable[DocumentType]] = None) -> list[Row]:
+        """Header rows of the documents emited between the given days, ordered by type and folio.
+        Only indexed header columns are read, documents XML is never loaded.
+
+        Args:
+            date_from (Arrow): First emission day, included.
+            date_to (Arrow): Last emission day, included.
+            doc_types (Optional[Iterable[DocumentType]], optional): Only these types. Defaults to `None`.
+
+        Returns:
+            list[Row]: Rows with `id`, `doc_type`, `folio`, `date_emited`, `rut_receptor`,
+            `net_amount`, `tax_amount`, `exent_amount`, `total_amount`, `sii_sent` and `trackid`.
+        """
+        stmt = select(cls.id, cls.doc_type, cls.folio, cls.date_emited, cls.rut_receptor,
+                      cls.net_amount, cls.tax_amount, cls.exent_amount, cls.total_amount,
+                      cls.sii_sent, cls.trackid) \
+               .where(cls.date_emited >= date_from.floor('day'), cls.date_emited <= date_to.ceil('day'))
+
+        if doc_types is not None:
+            stmt = stmt.where(cls.doc_type.in_([int(doc_type) for doc_type in doc_types]))
+
+        return db.session.execute(stmt.order_by(cls.doc_type, cls.folio)).all()
+
+    @classmethod
+    def folio_usage(cls, date_from: Arrow, date_to: Arrow,
+                    doc_types: Iterable[DocumentType] = (DocumentType.BOLETA_ELECTRÓNICA,
+                                                         DocumentType.BOLETA_ELECTRÓNICA_EXENTA)
+                    ) -> dict[DocumentType, dict[str, Any]]:
+        """Computes the folio consumption (RCOF) information of the documents emited between
+        the given dates, without loading any document XML.
+
+        Totals are summed by `doc_type` and the used folio ranges are found as islands of
+        contiguous folios (`folio - dense_rank()` is constant along a contiguous range).
+
+        Args:
+            date_from (Arrow): First emission day, included.
+            date_to (Arrow): Last emission day, included.
+            doc_types (Iterable[DocumentType], optional): Document types to summarize. Defaults to vouchers.
+
+        Returns:
+            dict[DocumentType, dict[str, Any]]: Per doc_type information, in the format
+            expected by `FolioUsageMixin.usage_info`.
+        """
+        doc_types = [int(doc_type) for doc_type in doc_types]
+        filters = (cls.doc_type.in_(doc_types),
+                   cls.date_emited >= date_from.floor('day'),
+                   cls.date_emited <= date_to.ceil('day'))
+
+        info = {DocumentType(doc_type): {
+            'ranges': [],
+            'doc_count': 0,
+            'net_amount': 0,
+            'tax_amount': 0,
+            'exe_amount': 0,
+            'total_amount': 0,
+            'tax_pct': 19.0,
+        } for doc_type in doc_types}
+
+        totals_stmt = select(cls.doc_type, func.count(cls.id), func.sum(cls.net_amount), 
+                             func.sum(cls.tax_amount), func.sum(cls.exent_amount), 
+                             func.sum(cls.total_amount)) \
+                      .where(*filters).group_by(cls.doc_type)
+
+        for doc_type, doc_count, net_amount, tax_amount, exe_amount, total_amount in \
+                db.session.execute(totals_stmt):
+            info[DocumentType(doc_type)].update(doc_count=doc_count, net_amount=net_amount or 0,
+                                                tax_amount=tax_amount or 0, exe_amount=exe_amount or 0,
+                                                total_amount=total_amount or 0)
+
+        island = cls.folio - func.dense_rank().over(partition_by=cls.doc_type, order_by=cls.folio)
+        islands = select(cls.doc_type, cls.folio, island.label('island')).where(*filters).subquery()
+        ranges_stmt = select(islands.c.doc_type, func.min(islands.c.folio), func.max(islands.c.folio)) \
+                      .group_by(islands.c.doc_type, islands.c.island) \
+                      .order_by(islands.c.doc_type, func.min(islands.c.folio))
+
+        for doc_type, initial, final in db.session.execute(ranges_stmt):
+            info[DocumentType(doc_type)]['ranges'].append([initial, final])
+
+        return info
@@ -0,0 +1,99 @@
+from typing import Optional
+
+from arrow import Arrow, utcnow
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy_utils import ArrowType
+from sqlalchemy.ext.mutable import MutableDict
+
+from ...db import db
+from ...domain.etd.constants.outbox import OutboxState
+from ...domain.etd.mixins.outbox import OutboxMixin
+from ...domain.etd.mixins.set import DocSetMixin
+from ..shared.base import Model
+from ..shared.types import CompressedBinary
+
+
+__all__ = ('SIIOutbox',)
+
+
+class SIIOutbox(Model, OutboxMixin):
+
+    __tablename__ = 'sii_outbox'
+    __table_args__ = (
+        db.Index('ix_sii_outbox_state_next_attempt_at', 'state', 'next_attempt_at'),
+    )
+    # ---------- OutboxMixin
+    doc_set_type = db.Column(db.Integer, nullable=False)
+    development = db.Column(db.Boolean, default=True)
+    rut_issuer = db.Column(db.String(10), nullable=False)
+    rut_sender = db.Column(db.String(10), nullable=False)
+    xml_data = db.Column(CompressedBinary(), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)
+
+    state = db.Column(db.Integer, default=OutboxState.PENDING)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(ArrowType, default=utcnow)
+    trackid = db.Column(db.String(20), index=True)
+    last_error = db.Column(db.String(300))
+    response = db.Column(MutableDict.as_mutable(db.JSON), default=dict)
+
+    @classmethod
+    def new(cls, doc_set: DocSetMixin, development: bool = True) -> 'SIIOutbox':
+        """Creates a new outbox entry from an already signed `doc_set`.
+
+        Args:
+            doc_set (DocSetMixin): Signed set, its `xml_data` must be constructed.
+            development (bool, optional): Uploads to SII certification servers. Defaults to `True`.
+
+        Returns:
+            SIIOutbox: The new entry
+        """
+        assert doc_set.xml_data
+
+        return cls(doc_set_type=doc_set.type, development=development, 
+                   rut_issuer=doc_set.cover_data.rut_issuer, rut_sender=doc_set.cover_data.rut_sender,
+                   xml_data=doc_set.xml_data, content_hash=cls.hash_content(doc_set.xml_data),
+                   state=OutboxState.PENDING, attempts=0, next_attempt_at=utcnow())
+
+    @classmethod
+    def enqueue(cls, doc_set: DocSetMixin, development: bool = True) -> 'SIIOutbox':
+        """Stores the signed `doc_set` in the outbox and commits it. Enqueuing the same
+        content twice returns the existing entry instead of creating a new upload.
+
+        Args:
+            doc_set (DocSetMixin): Signed set, its `xml_data` must be constructed.
+            development (bool, optional): Uploads to SII certification servers. Defaults to `True`.
+
+        Returns:
+            SIIOutbox: The new or already existing entry
+        """
+        entry = cls.new(doc_set, development)
+        existing = cls.first(content_hash=entry.content_hash)
+        if existing:
+            return existing
+
+        try:
+            entry.save()
+        except IntegrityError:
+            db.session.rollback()
+            return cls.first(content_hash=entry.content_hash)
+
+        return entry
+
+    @classmethod
+    def due(cls, limit: int = 50, now: Optional[Arrow] = None) -> list['SIIOutbox']:
+        """Pending entries whose next attempt is due, oldest first.
+
+        Args:
+            limit (int, optional): Max amount of entries. Defaults to 50.
+            now (Optional[Arrow], optional): Reference time. Defaults to `utcnow()`.
+
+        Returns:
+            list[SIIOutbox]: The due entries
+        """
+        stmt = select(cls).where(cls.state == OutboxState.PENDING, 
+                                 cls.next_attempt_at <= (now or utcnow())) \
+                          .order_by(cls.next_attempt_at).limit(limit)
+
+        return db.session.execute(stmt).scalars().all()
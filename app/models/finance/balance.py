@@ -1,39 +1,317 @@
+import logging
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, Optional
+
 from arrow import Arrow
-from sqlalchemy.orm import composite
+from sqlalchemy import select, update, insert, event, func, literal, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
 
 from ...db import db
+from ...utils.ids import new_id
+from ...utils.clock import now
 from ...domain.finance.mixins.balance import  BalanceMixin
+from ...domain.finance.exceptions import BalanceError
+from ...domain.finance.ledger import (LEDGER_TIMEZONE, LedgerDeltas, Period, PeriodClosing, period_of,
+                                      period_bounds, outstanding)
 from ..shared.base import Model
+from .charge import Charge
+from .extras import Entry, Expense
+from .transaction import Transaction
 
 
 __all__ = ('Balance',)
 
 
+AMOUNT_COLUMNS = ('amount_base', 'amount_expense', 'amount_income', 'amount_debt')
+
+
 class Balance(Model, BalanceMixin):
+    """Monthly balance. While a period is open its income, expense and debt amounts are kept
+    up to date by the ledger listeners below, on the same transaction that writes the
+    entries, expenses, transactions and charges, so reading them is a single row lookup.
+    Closed periods are not modified. `refresh_totals` recomputes them from the source rows.
+    """
 
     __tablename__ = 'balances'
-    
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', name='uq_balances_year_month'),
+    )
+
     month = db.Column(db.Integer, nullable=False)
     year = db.Column(db.Integer, nullable=False)
-    period = composite(Arrow, year, month)
 
-    amount_base = db.Column(db.BigInteger)
-    amount_expense = db.Column(db.BigInteger)
-    amount_income = db.Column(db.BigInteger)
-    amount_debt = db.Column(db.BigInteger)
+    amount_base = db.Column(db.BigInteger, default=0)
+    amount_expense = db.Column(db.BigInteger, default=0)
+    amount_income = db.Column(db.BigInteger, default=0)
+    amount_debt = db.Column(db.BigInteger, default=0)
 
     closed = db.Column(db.Boolean, default=False)
 
-    # --------- SQLAlchemy relationships 
+    # --------- SQLAlchemy relationships
     charges = db.relationship('Charge', backref='balance', uselist=True)
     entries = db.relationship('Entry', backref='balance', uselist=True)
     expenses = db.relationship('Expense', backref='balance', uselist=True)
     transactions = db.relationship('Transaction', backref='balance', uselist=True)
 
+    @property
+    def period(self) -> Arrow:
+        return Arrow(self.year, self.month, 1, tzinfo=LEDGER_TIMEZONE)
+
     @classmethod
     def new(cls, month: int, year: int, amount_base: int, amount_expense: int,
             amount_income: int, amount_debt: int) -> 'Balance':
-        
-        return cls(month=month, year=year, amount_base=amount_base, 
+
+        return cls(month=month, year=year, amount_base=amount_base,
                    amount_expense=amount_expense, amount_income=amount_income,
-                   amount_debt=amount_debt)
\ No newline at end of file
+                   amount_debt=amount_debt)
+
+    @classmethod
+    def of_period(cls, year: int, month: int) -> Optional['Balance']:
+        """The balance of a period, `None` if nothing was registered on it yet."""
+        return db.session.execute(select(cls).where(cls.year == year, cls.month == month)).scalar()
+
+    @classmethod
+    def current(cls, at: Optional[Arrow] = None) -> Optional['Balance']:
+        """The balance of the period of `at`, defaults to now."""
+        return cls.of_period(*period_of(at))
+
+    @classmethod
+    def apply_deltas(cls, connection, deltas: LedgerDeltas) -> None:
+        """Adds the deltas to the open balances of their periods, creating the missing ones.
+
+        Args:
+            connection: Session or connection to execute on.
+            deltas (LedgerDeltas): Changes by period and amount column.
+        """
+        table = cls.__table__
+        for (year, month), columns in deltas.items():
+            stmt = update(table).where(table.c.year == year, table.c.month == month,
+                                       table.c.closed.is_not(True)) \
+                   .values({column: func.coalesce(table.c[column], 0) + amount
+                            for column, amount in columns.items()})
+
+            if connection.execute(stmt).rowcount == 0:
+                cls.__create_period(connection, year, month)
+                connection.execute(stmt)
+
+    @classmethod
+    def __create_period(cls, connection, year: int, month: int) -> None:
+        """Inserts an empty open balance for the period, unless it exists (ie: closed)."""
+        table = cls.__table__
+        row = dict(id=new_id(), year=year, month=month, closed=False, created_at=Arrow.utcnow(),
+                   **{column: 0 for column in AMOUNT_COLUMNS})
+        dialect = db.engine.dialect.name
+
+        if dialect in ('postgresql', 'sqlite'):
+            stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table).values(row) \
+                   .on_conflict_do_nothing(index_elements=['year', 'month'])
+            connection.execute(stmt)
+        elif connection.execute(select(table.c.id).where(table.c.year == year,
+                                                         table.c.month == month)).first() is None:
+            connection.execute(insert(table).values(row))
+
+    @classmethod
+    def period_totals(cls, year: int, month: int) -> dict[str, int]:
+        """Income, expense and debt of a period computed from the source rows, one query."""
+        start, end = period_bounds(year, month)
+
+        def total(column, *where) -> Any:
+            return select(func.coalesce(func.sum(column), 0)).where(*where).scalar_subquery()
+
+        stmt = select(
+            total(Entry.amount, Entry.date_received >= start, Entry.date_received < end) +
+            total(Transaction.amount, Transaction.created_at >= start, Transaction.created_at < end),
+            total(Expense.amount, Expense.date_emited >= start, Expense.date_emited < end),
+            total(Charge.amount - func.coalesce(Charge.paid_amount, 0),
+                  Charge.created_at >= start, Charge.created_at < end, Charge.completed.is_not(True),
+                  Charge.nulled.is_not(True), Charge.renegotiated.is_not(True)),
+        )
+        income, expense, debt = db.session.execute(stmt).one()
+        return dict(amount_income=int(income), amount_expense=int(expense), amount_debt=int(debt))
+
+    @classmethod
+    def refresh_totals(cls, periods: Optional[Iterable[Period]] = None) -> int:
+        """Recomputes the amounts of the open balances, ie: after bulk imports that bypass
+        the ledger listeners.
+
+        Args:
+            periods (Optional[Iterable[Period]], optional): (year, month) periods to refresh.
+                Defaults to all the open balances.
+
+        Returns:
+            int: Amount of balances refreshed
+        """
+        if periods is None:
+            periods = db.session.execute(select(cls.year, cls.month).where(cls.closed.is_not(True))).all()
+
+        table, refreshed = cls.__table__, 0
+        for year, month in periods:
+            cls.__create_period(db.session, year, month)
+            stmt = update(table).where(table.c.year == year, table.c.month == month,
+                                       table.c.closed.is_not(True)) \
+                   .values(cls.period_totals(year, month))
+            refreshed += db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+
+        return refreshed
+
+    @classmethod
+    def close_period(cls, year: int, month: int, at: Optional[Arrow] = None) -> PeriodClosing:
+        """Closes a finished period with set based statements, in one database transaction:
+
+            1. Assigns the period `balance_id` to the unassigned entries, expenses, transactions
+               and charges dated on the period, one `UPDATE` by table.
+            2. Computes the balance amounts of the assigned rows with one `GROUP BY`.
+            3. Stores them, marks the balance closed and carries its total to the `amount_base`
+               of the next period.
+
+        Args:
+            year (int): Period year.
+            month (int): Period month.
+            at (Optional[Arrow], optional): Closing time, the period must have ended. Defaults to the request clock.
+
+        Raises:
+            BalanceError: When the period has not ended, is already closed or the previous
+                period is still open.
+
+        Returns:
+            PeriodClosing: Assigned rows, totals and timings of each step
+        """
+        start, end = period_bounds(year, month)
+        if end > now(at):
+            raise BalanceError('Periodo no cerrable', f'El periodo {month:02}/{year} aun no termina.')
+
+        previous = cls.of_period(*period_of(start.shift(days=-1)))
+        if previous is not None and not previous.closed:
+            raise BalanceError('Periodo no cerrable',
+                               f'El periodo anterior {previous.month:02}/{previous.year} no esta cerrado.')
+
+        closing = PeriodClosing(year, month)
+
+        @contextmanager
+        def timed(step: str) -> Iterator[None]:
+            begin = perf_counter()
+            yield
+            closing.timings[step] = perf_counter() - begin
+
+        try:
+            cls.__create_period(db.session, year, month)
+            balance = db.session.execute(select(cls).where(cls.year == year, cls.month == month)
+                                         .with_for_update()).scalar_one()
+            if balance.closed:
+                raise BalanceError('Periodo cerrado', f'El periodo {month:02}/{year} ya esta cerrado.')
+
+            with timed('assign'):
+                for model, date in ((Entry, Entry.date_received), (Expense, Expense.date_emited),
+                                    (Transaction, Transaction.created_at), (Charge, Charge.created_at)):
+                    stmt = update(model.__table__).where(model.__table__.c.balance_id.is_(None),
+                                                         date >= start, date < end) \
+                           .values(balance_id=balance.id)
+                    closing.assigned[model.__tablename__] = db.session.execute(
+                        stmt, execution_options={'synchronize_session': False}).rowcount
+
+            with timed('totals'):
+                rows = union_all(
+                    select(literal('amount_income').label('kind'), Entry.amount.label('amount'))
+                    .where(Entry.balance_id == balance.id),
+                    select(literal('amount_income'), Transaction.amount).where(Transaction.balance_id == balance.id),
+                    select(literal('amount_expense'), Expense.amount).where(Expense.balance_id == balance.id),
+                    select(literal('amount_debt'), Charge.amount - func.coalesce(Charge.paid_amount, 0))
+                    .where(Charge.balance_id == balance.id, Charge.completed.is_not(True),
+                           Charge.nulled.is_not(True), Charge.renegotiated.is_not(True)),
+                ).subquery()
+                stmt = select(rows.c.kind, func.coalesce(func.sum(rows.c.amount), 0)).group_by(rows.c.kind)
+                totals = dict(amount_income=0, amount_expense=0, amount_debt=0)
+                totals.update({kind: int(total) for kind, total in db.session.execute(stmt)})
+
+            with timed('close'):
+                for column, total in totals.items():
+                    setattr(balance, column, total)
+                balance.amount_base = balance.amount_base or 0
+                balance.closed = True
+                closing.totals = {column: getattr(balance, column) for column in AMOUNT_COLUMNS}
+                closing.carried = balance.balance_total()
+
+                next_year, next_month = period_of(end)
+                cls.__create_period(db.session, next_year, next_month)
+                db.session.execute(update(cls.__table__).where(cls.__table__.c.year == next_year,
+                                                               cls.__table__.c.month == next_month)
+                                   .values(amount_base=closing.carried),
+                                   execution_options={'synchronize_session': False})
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logging.info(f'Balance {month:02}/{year} closed in {closing.elapsed:.3f}s '
+                     f'({", ".join(f"{step} {seconds:.3f}s" for step, seconds in closing.timings.items())}), '
+                     f'rows assigned: {closing.assigned}')
+        return closing
+
+
+# Ledger ----------------------------------------------------------------------
+# Model: (tracked attributes, function of their values returning (period, column, amount))
+LEDGER: dict[type, tuple[tuple[str, ...], Callable[..., tuple[Period, str, int]]]] = {
+    Entry: (('amount', 'date_received'),
+            lambda amount, date: (period_of(date), 'amount_income', amount or 0)),
+    Expense: (('amount', 'date_emited'),
+              lambda amount, date: (period_of(date), 'amount_expense', amount or 0)),
+    Transaction: (('amount', 'created_at'),
+                  lambda amount, date: (period_of(date), 'amount_income', amount or 0)),
+    Charge: (('created_at', 'amount', 'paid_amount', 'completed', 'nulled', 'renegotiated'),
+             lambda date, *values: (period_of(date), 'amount_debt', outstanding(*values))),
+}
+
+
+def ledger_values(target, attributes: tuple[str, ...], committed: bool) -> list:
+    """Current or last committed values of `attributes` during a flush."""
+    values = []
+    for attribute in attributes:
+        history = get_history(target, attribute)
+        if committed:
+            values.append((history.deleted or history.unchanged or [None])[0])
+        else:
+            values.append((history.added or history.unchanged or [None])[0])
+    return values
+
+
+def ledger_deltas(session: Session) -> LedgerDeltas:
+    return session.info.setdefault('ledger_deltas', LedgerDeltas())
+
+
+def record_change(target, old: bool, new: bool) -> None:
+    """Records on the session the ledger change of a flushed row: its last committed
+    contribution is substracted (`old`) and the current one added (`new`)."""
+    attributes, contribution = LEDGER[type(target)]
+    deltas = ledger_deltas(object_session(target))
+    for committed, sign in ((True, -1), (False, 1)):
+        if (old if committed else new):
+            period, column, amount = contribution(*ledger_values(target, attributes, committed))
+            deltas.add(period, column, sign * amount)
+
+
+for model, (attributes, _) in LEDGER.items():
+    event.listen(model, 'after_insert', lambda mapper, connection, target: record_change(target, False, True))
+    event.listen(model, 'after_update', lambda mapper, connection, target: record_change(target, True, True))
+    event.listen(model, 'after_delete', lambda mapper, connection, target: record_change(target, True, False))
+    for attribute in attributes:
+        # Expired attributes are loaded before being set or deleted, so their history has
+        # the committed value
+        event.listen(getattr(model, attribute), 'set', lambda target, value, old, initiator: None,
+                     active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def apply_ledger_deltas(session: Session, flush_context) -> None:
+    deltas = session.info.get('ledger_deltas')
+    if deltas:
+        Balance.apply_deltas(session, deltas)
+    if deltas is not None:
+        deltas.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_ledger_deltas(session: Session) -> None:
+    session.info.pop('ledger_deltas', None)
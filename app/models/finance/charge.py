@@ -1,14 +1,21 @@
-from uuid import uuid4
+from typing import Optional
 
 from arrow import Arrow, utcnow
+from sqlalchemy import select, update, event
+from sqlalchemy.orm import deferred, undefer
+from sqlalchemy.sql import Select, ColumnElement
 from sqlalchemy_utils import UUIDType, ArrowType
 from sqlalchemy.ext.mutable import MutableDict
 
 from ...db import db
-from ...domain.finance.mixins.charge import ChargeMixin
+from ...utils.ids import new_id
+from ...domain.finance.constants import ChargeState
+from ...domain.finance.mixins.charge import ChargeMixin, expiration_limit
 from ..secondaries.charge import (charges_services, charges_etds,
                                   charges_credit_notes, charges_transactions)
 from ..shared.base import Model
+from ..shared.sequence import Sequence
+from ..shared.types import json_text
 
 
 __all__ = ('Charge',)
@@ -17,19 +24,25 @@ __all__ = ('Charge',)
 class Charge(Model, ChargeMixin):
 
     __tablename__ = 'charges'
+    __table_args__ = (
+        db.Index('ix_charges_persisted_state_expires_at', 'persisted_state', 'expires_at'),
+    )
     
     # ---------- Charge Mixin 
-    user_id = db.Column(UUIDType, db.ForeignKey('users.id'))
+    user_id = db.Column(UUIDType, db.ForeignKey('users.id'), index=True)
     public_id = db.Column(db.String)
     amount = db.Column(db.Integer, nullable=False)
     paid_amount = db.Column(db.Integer, default=0)
     
-    payload = db.Column(MutableDict.as_mutable(db.PickleType), nullable=False)
+    # JSON, water charges follow `WaterChargePayload`. Deferred, see `with_payload`.
+    payload = deferred(db.Column(MutableDict.as_mutable(db.JSON), nullable=False))
     expires_at = db.Column(ArrowType, default=utcnow)
     
     completed = db.Column(db.Boolean, default=False)
     nulled = db.Column(db.Boolean, default=False)
     renegotiated = db.Column(db.Boolean, default=False)
+    # `state` as of the last write or `refresh_states`, used to filter in SQL
+    persisted_state = db.Column(db.Integer, nullable=False, default=int(ChargeState.PENDING))
    
     service = db.relationship('Service', secondary=charges_services, uselist=False)
     transactions = db.relationship('Transaction', secondary=charges_transactions, 
@@ -37,13 +50,67 @@ class Charge(Model, ChargeMixin):
     etd = db.relationship('ETD', secondary=charges_etds, uselist=False)
     credit_note = db.relationship('ETD', secondary=charges_credit_notes, uselist=False)
     
-    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'))
+    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'), index=True)
     
     @classmethod
     def new(cls, amount: int) -> 'Charge':
-        new_id = uuid4()
-        public_id = str(new_id.node)
-        return cls(amount=amount, id=new_id, public_id=public_id)
-        
+        public_id = str(Sequence.next_value('charges.public_id'))
+        return cls(amount=amount, id=new_id(), public_id=public_id)
+
+    @classmethod
+    def with_state(cls, state: ChargeState, select_stmt: Optional[Select] = None) -> Select:
+        """Select statement filtering charges by their persisted state, ie: overdue charges."""
+        return (select(cls) if select_stmt is None else select_stmt).where(cls.persisted_state == int(state))
+
+    @classmethod
+    def refresh_states(cls, at: Optional[Arrow] = None) -> int:
+        """Daily transition of the persisted states, PENDING charges expired at `at` become OVERDUE
+        (and back if their expiration was moved). Other states are set when charges are written.
+
+        Args:
+            at (Optional[Arrow], optional): Reference time. Defaults to the request clock.
+
+        Returns:
+            int: Amount of charges updated
+        """
+        limit = expiration_limit(at)
+        overdue = update(cls).where(cls.persisted_state == int(ChargeState.PENDING), cls.expires_at < limit) \
+                  .values(persisted_state=int(ChargeState.OVERDUE))
+        pending = update(cls).where(cls.persisted_state == int(ChargeState.OVERDUE), cls.expires_at >= limit) \
+                  .values(persisted_state=int(ChargeState.PENDING))
+
+        return sum(db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+                   for stmt in (overdue, pending))
+
+    @classmethod
+    def payload_text(cls, key: str) -> ColumnElement:
+        """SQL expression of the text value of `key` in `payload`, matching its expression index."""
+        return json_text(cls.__table__.c.payload, key)
+
+    @classmethod
+    def with_payload(cls, select_stmt: Optional[Select] = None) -> Select:
+        """Select statement that loads the deferred `payload` along with the charges.
+        Use it on the paths that read it (PDF rendering, XML building).
+
+        Args:
+            select_stmt (Optional[Select], optional): Statement to extend. Defaults to `select(Charge)`.
+
+        Returns:
+            Select: The statement with `payload` undeferred
+        """
+        return (select(cls) if select_stmt is None else select_stmt).options(undefer(cls.payload))
+
+    @classmethod
+    def get_with_payload(cls, pk) -> Optional['Charge']:
+        """Get charge by primary key, loading its `payload` in the same query."""
+        return db.session.get(cls, pk, options=[undefer(cls.payload)])
+
+
+# Payload fields used on filters
+db.Index('ix_charges_payload_current_reading_id', Charge.payload_text('current_reading_id'))
 
 
+@event.listens_for(Charge, 'before_insert')
+@event.listens_for(Charge, 'before_update')
+def sync_charge_state(mapper, connection, target: Charge) -> None:
+    target.persisted_state = int(target.state)
@@ -22,7 +22,7 @@ class Expense(Model, ExpenseMixin):
     
     folio = db.Column(db.BigInteger)
     description = db.Column(db.String(200))
-    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'))
+    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'), index=True)
     
     @classmethod
     def new(cls, amount: int, receptor: str, date_emited: Optional[Arrow] = None, 
@@ -45,7 +45,7 @@ class Entry(Model, EntryMixin):
     description = db.Column(db.String(200))
 
     # --------- SQLAlchemy relationships
-    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'))
+    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'), index=True)
     
     @classmethod
     def new(cls, amount: int, issuer: str, date_received: Optional[Arrow] = None, 
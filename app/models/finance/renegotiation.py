@@ -1,10 +1,20 @@
-from uuid import uuid4
+from typing import Iterable, Optional
+from uuid import UUID
+
 from arrow import Arrow
+from sqlalchemy import select, update, event, exists, func
+from sqlalchemy.sql import Select
 from sqlalchemy_utils import ArrowType, UUIDType
 
 from ...db import db
+from ...utils.ids import new_id
+from ...utils.clock import clock
+from ...domain.finance.constants import InstallmentState, RenegotiationState
+from ...domain.finance.mixins.charge import ChargeMixin, expiration_limit
 from ...domain.finance.mixins.renegotiation import RenegotiationMixin, InstallmentMixin
+from ...domain.finance.schedule import Schedule
 from ..shared.base import Model
+from ..shared.sequence import Sequence
 from ..secondaries.renegotiation import renegotiation_charges, renegotiation_transactions
 
 
@@ -14,25 +24,56 @@ __all__ = ('Installment', 'Renegotiation',)
 class Installment(Model, InstallmentMixin):
 
     __tablename__ = 'installments'
+    __table_args__ = (
+        db.Index('ix_installments_persisted_state_expires_at', 'persisted_state', 'expires_at'),
+    )
     # ---------- InstallmentMixin
     amount = db.Column(db.Integer, nullable=False)
     expires_at = db.Column(ArrowType)
     paid_amount = db.Column(db.Integer, nullable=False, default=0)
     completed = db.Column(db.Boolean, default=False)
+    # `state` as of the last write or `refresh_states`, used to filter in SQL
+    persisted_state = db.Column(db.Integer, nullable=False, default=int(InstallmentState.PENDING))
     
     # -------- SQLAlchemy relationships
-    renegotiation_id = db.Column(db.ForeignKey('renegotiations.id'))
+    renegotiation_id = db.Column(db.ForeignKey('renegotiations.id'), index=True)
     
     @classmethod
     def new(cls, amount: int, expires_at: Arrow) -> 'Installment':        
         return cls(amount=amount, expires_at=expires_at)
+
+    @classmethod
+    def with_state(cls, state: InstallmentState, select_stmt: Optional[Select] = None) -> Select:
+        """Select statement filtering installments by their persisted state, ie: expired ones."""
+        return (select(cls) if select_stmt is None else select_stmt).where(cls.persisted_state == int(state))
+
+    @classmethod
+    def refresh_states(cls, at: Optional[Arrow] = None) -> int:
+        """Daily transition of the persisted states, PENDING installments expired at `at` become
+        EXPIRED (and back if their expiration was moved).
+
+        Args:
+            at (Optional[Arrow], optional): Reference time. Defaults to the request clock.
+
+        Returns:
+            int: Amount of installments updated
+        """
+        limit = expiration_limit(at)
+        expired = update(cls).where(cls.persisted_state == int(InstallmentState.PENDING), cls.expires_at < limit) \
+                  .values(persisted_state=int(InstallmentState.EXPIRED))
+        pending = update(cls).where(cls.persisted_state == int(InstallmentState.EXPIRED), cls.expires_at >= limit) \
+                  .values(persisted_state=int(InstallmentState.PENDING))
+
+        return sum(db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+                   for stmt in (expired, pending))
         
 
 class Renegotiation(Model, RenegotiationMixin):
 
     __tablename__ = 'renegotiations'
 
-    user_id = db.Column(UUIDType, db.ForeignKey('users.id'))
+    user_id = db.Column(UUIDType, db.ForeignKey('users.id'), index=True)
+    account_id = db.Column(UUIDType, db.ForeignKey('accounts.id'), index=True)
     public_id = db.Column(db.String(), nullable=False)
     amount = db.Column(db.Integer, nullable=False)
     paid_amount = db.Column(db.Integer, nullable=False, default=0)
@@ -48,6 +89,92 @@ class Renegotiation(Model, RenegotiationMixin):
     
     @classmethod
     def new(cls, amount: int) -> 'Renegotiation':
-        new_id = uuid4()
-        public_id = str(new_id.node)
-        return cls(amount=amount, id=new_id, public_id=public_id)
+        public_id = str(Sequence.next_value('renegotiations.public_id'))
+        return cls(amount=amount, id=new_id(), public_id=public_id)
+
+    @classmethod
+    def with_state(cls, state: RenegotiationState, select_stmt: Optional[Select] = None,
+                   at: Optional[Arrow] = None) -> Select:
+        """Select statement filtering renegotiations by their state, derived in SQL from the
+        persisted states of their installments, same rules as `RenegotiationMixin.state`:
+        OVERDUE when an installment left is EXPIRED, otherwise PENDING or UP_TO_DATE by the
+        days left to the next installment.
+
+        Args:
+            state (RenegotiationState): State to filter.
+            select_stmt (Optional[Select], optional): Statement to extend. Defaults to `select(Renegotiation)`.
+            at (Optional[Arrow], optional): Reference time of the days left. Defaults to the request clock.
+
+        Returns:
+            Select: The filtered statement
+        """
+        stmt = select(cls) if select_stmt is None else select_stmt
+        if state == RenegotiationState.COMPLETED:
+            return stmt.where(cls.completed.is_(True))
+
+        left = (Installment.renegotiation_id == cls.id,
+                Installment.persisted_state != int(InstallmentState.COMPLETED))
+        expired = exists().where(*left, Installment.persisted_state == int(InstallmentState.EXPIRED))
+        stmt = stmt.where(cls.completed.is_not(True))
+        if state == RenegotiationState.OVERDUE:
+            return stmt.where(expired)
+
+        # `InstallmentMixin.days_to_expiration() > 5`, counted in UTC dates
+        next_due = select(func.min(Installment.expires_at)).where(*left).scalar_subquery()
+        due_soon = next_due < Arrow.fromdate(clock(at).utc_today).shift(days=6)
+        return stmt.where(~expired, due_soon if state == RenegotiationState.PENDING else ~due_soon)
+
+    @classmethod
+    def from_schedule(cls, schedule: Schedule, index: int, user_id: UUID,
+                      charges: Iterable[ChargeMixin] = ()) -> 'Renegotiation':
+        """Creates the renegotiation of the plan at `index` with all its installments, see
+        `plan_schedules`.
+
+        Args:
+            schedule (Schedule): Planned renegotiations, identified by account id.
+            index (int): Plan to create.
+            user_id (UUID): Owner of the account.
+            charges (Iterable[ChargeMixin], optional): Renegotiated charges, they are marked
+                as such. Defaults to none.
+
+        Returns:
+            Renegotiation: The renegotiation of the account
+        """
+        charges = list(charges)
+        renegotiation = cls.new(int(schedule.totals[index]))
+        renegotiation.account_id = schedule.ids[index]
+        renegotiation.user_id = user_id
+        renegotiation.installments = [Installment.new(amount, expires_at)
+                                      for amount, expires_at in schedule.installments(index)]
+        for charge in charges:
+            charge.renegotiated = True
+        renegotiation.charges = charges
+        return renegotiation
+
+    @classmethod
+    def schedules(cls, ids: Optional[Iterable[UUID]] = None) -> Schedule:
+        """Loads, in one query, the installments of the not completed renegotiations as
+        a `Schedule`, for vectorized states, current debts and cash flow projections.
+
+        Args:
+            ids (Optional[Iterable[UUID]], optional): Renegotiations to load. Defaults to all.
+
+        Returns:
+            Schedule: Installments by renegotiation
+        """
+        stmt = select(Installment.renegotiation_id, Installment.amount, Installment.paid_amount,
+                      Installment.expires_at) \
+               .join(cls, cls.id == Installment.renegotiation_id) \
+               .where(cls.completed.is_not(True)) \
+               .order_by(Installment.renegotiation_id, Installment.expires_at)
+
+        if ids is not None:
+            stmt = stmt.where(cls.id.in_(list(ids)))
+
+        return Schedule.from_rows(db.session.execute(stmt).all())
+
+
+@event.listens_for(Installment, 'before_insert')
+@event.listens_for(Installment, 'before_update')
+def sync_installment_state(mapper, connection, target: Installment) -> None:
+    target.persisted_state = int(target.state)
@@ -1,11 +1,22 @@
-from typing import Optional
+from typing import IO, Any, Iterable, Optional
+
+from sqlalchemy import select, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import noload, selectinload
 from sqlalchemy_utils import UUIDType
 from sqlalchemy.ext.mutable import MutableDict
 
 from ...db import db
+from ...utils.ids import new_id
 from ...domain.finance.mixins.transaction import TransactionMixin
 from ...domain.finance.constants import TransactionType
+from ...domain.finance.reconciliation import (Reconciler, ReconciliationReport, parse_statement,
+                                              transfer_factory)
 from ..shared.base import Model
+from ..user import User
+from .charge import Charge
+from .renegotiation import Renegotiation
 
 
 __all__ = ('Transaction',)
@@ -18,11 +29,142 @@ class Transaction(Model, TransactionMixin):
     amount = db.Column(db.Integer, nullable=False)
     type = db.Column(db.Integer, nullable=False, default=TransactionType.CASH)
     payload = db.Column(MutableDict.as_mutable(db.JSON), default=dict)
+    idempotency_key = db.Column(db.String(64), unique=True)
     # ----------- SQLAlchemy relationships
-    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'))
+    balance_id = db.Column(UUIDType, db.ForeignKey('balances.id'), index=True)
     
     @classmethod
     def new(cls, amount: int, type: TransactionType = TransactionType.CASH, 
-            payload: Optional[dict[str,str]] = None) -> 'Transaction':
+            payload: Optional[dict[str,str]] = None, idempotency_key: Optional[str] = None) -> 'Transaction':
         
-        return cls(amount=amount, type=type, payload=payload)
\ No newline at end of file
+        return cls(amount=amount, type=type, payload=payload, idempotency_key=idempotency_key, id=new_id())
+
+    @classmethod
+    def existing_keys(cls, keys: Iterable[str]) -> set[str]:
+        """The given idempotency keys already stored, one indexed lookup."""
+        keys = list(set(keys))
+        if not keys:
+            return set()
+        return set(db.session.execute(select(cls.idempotency_key)
+                                      .where(cls.idempotency_key.in_(keys))).scalars())
+
+    @classmethod
+    def ingest(cls, rows: Iterable[dict[str, Any]], chunk_size: int = 500) -> set[str]:
+        """Bulk insert-or-ignore of transactions identified by their `idempotency_key`, ie:
+        payment gateway callbacks or retried imports. Rows whose key is already stored are
+        skipped by the unique index, so concurrent or repeated ingestions never duplicate.
+        Bulk inserts bypass the ledger, run `Balance.refresh_totals` afterwards.
+
+        PostgreSQL returns the inserted keys (`ON CONFLICT DO NOTHING RETURNING`). SQLite skips
+        conflicts with `ON CONFLICT DO NOTHING` and other dialects insert row by row, in
+        savepoints, once a chunk conflicts. Both look the inserted keys up by the ids this
+        call generated, keys stored meanwhile by a concurrent ingestion are not reported.
+
+        Args:
+            rows (Iterable[dict[str, Any]]): `amount`, `idempotency_key` and optionally `type`,
+                `payload` and `balance_id` of each transaction.
+            chunk_size (int, optional): Rows by statement. Defaults to 500.
+
+        Returns:
+            set[str]: Keys of the transactions inserted by this call
+        """
+        unique = {}
+        for row in rows:
+            unique.setdefault(row['idempotency_key'], row)
+        rows = list(unique.values())
+        dialect = db.engine.dialect.name
+        inserted = set()
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = [{'id': new_id(), 'type': TransactionType.CASH, 'payload': {}, **row}
+                     for row in rows[start:start + chunk_size]]
+
+            if dialect == 'postgresql':
+                stmt = postgresql.insert(cls.__table__).values(chunk) \
+                       .on_conflict_do_nothing(index_elements=['idempotency_key']) \
+                       .returning(cls.__table__.c.idempotency_key)
+                inserted.update(db.session.execute(stmt).scalars())
+                continue
+
+            # No RETURNING (SQLite) or no insert-or-ignore: probe, insert the rest, then find
+            # the rows that made it by their ids
+            existing = cls.existing_keys(row['idempotency_key'] for row in chunk)
+            chunk = [row for row in chunk if row['idempotency_key'] not in existing]
+            if not chunk:
+                continue
+            if dialect == 'sqlite':
+                stmt = sqlite.insert(cls.__table__).on_conflict_do_nothing(index_elements=['idempotency_key'])
+                db.session.execute(stmt, chunk)
+            else:
+                cls.__insert_skipping_conflicts(chunk)
+
+            ids = [row['id'] for row in chunk]
+            inserted.update(db.session.execute(select(cls.idempotency_key).where(cls.id.in_(ids))).scalars())
+
+        return inserted
+
+    @classmethod
+    def __insert_skipping_conflicts(cls, chunk: list[dict[str, Any]]) -> None:
+        """Inserts the chunk at once or, when a concurrent ingestion stored one of its keys
+        after the probe, row by row skipping the keys already stored."""
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(cls.__table__), chunk)
+            return
+        except IntegrityError:
+            pass
+
+        for row in chunk:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(cls.__table__), [row])
+            except IntegrityError:
+                if not cls.existing_keys([row['idempotency_key']]):
+                    raise
+
+    @classmethod
+    def reconcile_statement(cls, stream: IO[str], dry_run: bool = False) -> ReconciliationReport:
+        """Applies the transfers of a bank statement to the pending charges and renegotiations,
+        see `Reconciler`.
+
+        The debts referenced by the statement, by public id or payer RUT, are loaded with two
+        queries and the resulting transactions and paid amounts are written in a single flush
+        and commit. On `dry_run` the session is rolled back after building the report.
+
+        Lines reconciled by a previous run are found by their idempotency keys and skipped, a
+        concurrent run of the same statement fails on the unique index instead of duplicating.
+
+        Args:
+            stream (IO[str]): The statement CSV file, see `parse_statement`.
+            dry_run (bool, optional): Reports without saving. Defaults to `False`.
+
+        Returns:
+            ReconciliationReport: Applied & rejected amounts by line
+        """
+        report = ReconciliationReport(dry_run=dry_run)
+        lines = list(parse_statement(stream, report.rejections))
+        references = {line.reference.lstrip('#') for line in lines if line.reference}
+        ruts = {line.rut for line in lines if line.rut}
+
+        charges = select(Charge, User.rut).join(User, User.id == Charge.user_id) \
+                  .where(or_(Charge.public_id.in_(references), User.rut.in_(ruts)),
+                         Charge.completed.is_not(True), Charge.nulled.is_not(True),
+                         Charge.renegotiated.is_not(True)) \
+                  .options(noload(Charge.transactions))
+        renegotiations = select(Renegotiation, User.rut).join(User, User.id == Renegotiation.user_id) \
+                         .where(or_(Renegotiation.public_id.in_(references), User.rut.in_(ruts)),
+                                Renegotiation.completed.is_not(True)) \
+                         .options(noload(Renegotiation.transactions), selectinload(Renegotiation.installments))
+
+        debts = [tuple(row) for stmt in (charges, renegotiations)
+                 for row in db.session.execute(stmt).unique()]
+        stored_keys = cls.existing_keys(line.allocation_key(0) for line in lines)
+        Reconciler(debts, transfer_factory(cls)).reconcile(lines, report, stored_keys)
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.add_all(report.transactions)
+            db.session.commit()
+
+        return report
\ No newline at end of file
@@ -22,5 +22,6 @@ accounts_installation_charges = db.Table(
 accounts_charges = db.Table(
     'accounts_charges',
     db.Column('account_id', UUIDType, db.ForeignKey('accounts.id')),
-    db.Column('charge_id', UUIDType, db.ForeignKey('charges.id'), unique=True)
+    db.Column('charge_id', UUIDType, db.ForeignKey('charges.id'), unique=True),
+    db.Index('ix_accounts_charges_account_id_charge_id', 'account_id', 'charge_id')
 )
\ No newline at end of file
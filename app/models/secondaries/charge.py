@@ -4,13 +4,15 @@ from app.db import db
 charges_services = db.Table(
     'charge_services',
     db.Column('charge_id', UUIDType, db.ForeignKey('charges.id'), unique=True),
-    db.Column('service_id', UUIDType, db.ForeignKey('services.id'))
+    db.Column('service_id', UUIDType, db.ForeignKey('services.id')),
+    db.Index('ix_charge_services_service_id_charge_id', 'service_id', 'charge_id')
 )
 
 charges_transactions = db.Table(
     'charges_transactions',
     db.Column('charge_id', UUIDType, db.ForeignKey('charges.id')),
-    db.Column('transaction_id', UUIDType, db.ForeignKey('transactions.id'), unique=True)
+    db.Column('transaction_id', UUIDType, db.ForeignKey('transactions.id'), unique=True),
+    db.Index('ix_charges_transactions_charge_id_transaction_id', 'charge_id', 'transaction_id')
 )
 
 charges_etds = db.Table(
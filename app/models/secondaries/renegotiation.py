@@ -4,11 +4,13 @@ from app.db import db
 renegotiation_transactions = db.Table(
     'renegotiation_transactions',
     db.Column('renegotiation_id', UUIDType, db.ForeignKey('renegotiations.id')),
-    db.Column('transaction_id', UUIDType, db.ForeignKey('transactions.id'), unique=True)
+    db.Column('transaction_id', UUIDType, db.ForeignKey('transactions.id'), unique=True),
+    db.Index('ix_renegotiation_transactions_renegotiation_id_transaction_id', 'renegotiation_id', 'transaction_id')
 )
 
 renegotiation_charges = db.Table(
     'renegotiation_charges',
     db.Column('renegotiation_id', UUIDType, db.ForeignKey('renegotiations.id')),
-    db.Column('charge_id', UUIDType, db.ForeignKey('charges.id'), unique=True)
+    db.Column('charge_id', UUIDType, db.ForeignKey('charges.id'), unique=True),
+    db.Index('ix_renegotiation_charges_renegotiation_id_charge_id', 'renegotiation_id', 'charge_id')
 )
\ No newline at end of file
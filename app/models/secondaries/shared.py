@@ -5,10 +5,12 @@ from app.db import db
 actions_owner = db.Table(
     'actions_owner',
     db.Column('action_id', UUIDType, db.ForeignKey('actions.id'), unique=True),
-    db.Column('user_id', UUIDType, db.ForeignKey('users.id'))
+    db.Column('user_id', UUIDType, db.ForeignKey('users.id')),
+    db.Index('ix_actions_owner_user_id_action_id', 'user_id', 'action_id')
 )
 actions_receptor = db.Table(
     'actions_receptor',
     db.Column('action_id', UUIDType, db.ForeignKey('actions.id'), unique=True),
-    db.Column('user_id', UUIDType, db.ForeignKey('users.id'))
+    db.Column('user_id', UUIDType, db.ForeignKey('users.id')),
+    db.Index('ix_actions_receptor_user_id_action_id', 'user_id', 'action_id')
 )
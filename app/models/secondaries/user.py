@@ -4,7 +4,8 @@ from app.db import db
 users_roles = db.Table(
     'users_roles',
     db.Column('user_id', UUIDType, db.ForeignKey('users.id'), unique=True),
-    db.Column('role_id', UUIDType, db.ForeignKey('roles.id'))
+    db.Column('role_id', UUIDType, db.ForeignKey('roles.id')),
+    db.Index('ix_users_roles_role_id_user_id', 'role_id', 'user_id')
 )
 
 users_addresses = db.Table(
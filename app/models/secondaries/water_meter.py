@@ -5,11 +5,13 @@ from app.db import db
 water_meters_current_readings = db.Table(
     'water_meters_current_readings',
     db.Column('water_meter_id', UUIDType, db.ForeignKey('water_meters.id')),
-    db.Column('reading_id', UUIDType, db.ForeignKey('readings.id'), unique=True)
+    db.Column('reading_id', UUIDType, db.ForeignKey('readings.id'), unique=True),
+    db.Index('ix_water_meters_current_readings_water_meter_id_reading_id', 'water_meter_id', 'reading_id')
 )
 
 water_meters_previous_readings = db.Table(
     'water_meters_previous_readings',
     db.Column('water_meter_id', UUIDType, db.ForeignKey('water_meters.id')),
-    db.Column('reading_id', UUIDType, db.ForeignKey('readings.id'), unique=True)
+    db.Column('reading_id', UUIDType, db.ForeignKey('readings.id'), unique=True),
+    db.Index('ix_water_meters_previous_readings_water_meter_id_reading_id', 'water_meter_id', 'reading_id')
 )
\ No newline at end of file
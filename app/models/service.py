@@ -2,6 +2,7 @@ from sqlalchemy_utils import UUIDType
 from sqlalchemy.ext.mutable import MutableDict
 
 from ..domain.service.mixins.service import ServiceMixin, ServiceTypeMixin
+from ..domain.service.tariff import Tariff, compile_tariff
 from ..db import db
 from .shared.base import Model
 from .shared.activable import Activable
@@ -74,9 +75,13 @@ class Service(Model, Activable, ServiceMixin):
 
     __tablename__ = 'services'
 
-    service_type_id = db.Column(UUIDType, db.ForeignKey('service_types.id'))
+    service_type_id = db.Column(UUIDType, db.ForeignKey('service_types.id'), index=True)
     payload = db.Column(MutableDict.as_mutable(db.JSON), nullable=False)
 
+    @property
+    def tariff(self) -> Tariff:
+        """The compiled `payload` of the water service, cached until the service is updated."""
+        return compile_tariff(self.id, self.updated_at, self.payload)
 
     @classmethod
     def new(cls, payload: dict[str, str], service_type: ServiceType) -> 'Service':
@@ -20,8 +20,8 @@ class Address(Model, AddressMixin):
     address = db.Column(db.String(80))
     postal_code = db.Column(db.Integer)
     
-    user_id = db.Column(UUIDType, db.ForeignKey('users.id'))
-    service_account_id = db.Column(UUIDType, db.ForeignKey('service_accounts.id'))
+    user_id = db.Column(UUIDType, db.ForeignKey('users.id'), index=True)
+    service_account_id = db.Column(UUIDType, db.ForeignKey('service_accounts.id'), index=True)
     
     def __init__(self, address: str, city: str = None, commune: str = None, **kwargs) -> None:
         super(Address, self).__init__(**kwargs)
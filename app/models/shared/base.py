@@ -1,6 +1,5 @@
 from dataclasses import dataclass, field
 from math import ceil
-from uuid import uuid4
 from typing import Optional, Iterator
 
 from flask import request, abort, url_for
@@ -11,6 +10,7 @@ from sqlalchemy_utils import UUIDType, ArrowType
 from sqlalchemy.ext.declarative import declared_attr
 
 from ...db import db
+from ...utils.ids import new_id
 from ..mixins.query import QueryMixin
 
 
@@ -150,7 +150,7 @@ class Model(db.Model, QueryMixin):
     """
     __abstract__ = True
 
-    id = db.Column(UUIDType, primary_key=True, default=uuid4)
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
 
     @declared_attr
     def created_at(cls):
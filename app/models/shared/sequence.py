@@ -0,0 +1,82 @@
+from threading import Lock
+from typing import Callable, Optional
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from ...db import db
+from .base import Model
+
+
+__all__ = ('Sequence',)
+
+
+class Sequence(Model):
+    """Named counters used to allocate public ids.
+
+    Values are reserved in blocks of `block_size` with an atomic `UPDATE ... SET value = value + n`
+    on its own transaction, and handed out from memory until the block is exhausted, so
+    allocating is O(1) and collision free across processes. Values of a block not used before
+    the process ends are lost, sequences may have gaps but never repeat values.
+
+    On SQLite, a single writer database, the increment runs inside the current session
+    transaction and no block is kept, so a rollback also releases the value.
+
+    Example:
+
+        public_id = Sequence.next_value('charges.public_id')
+    """
+
+    __tablename__ = 'sequences'
+
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __lock = Lock()
+    __blocks: dict[str, list[int]] = {}  # name: [next value, last reserved value]
+
+    @classmethod
+    def next_value(cls, name: str, block_size: int = 20,
+                   seed: Optional[Callable[[], int]] = None) -> int:
+        """Returns the next value of the sequence `name`, creating it if needed.
+
+        Args:
+            name (str): Sequence name.
+            block_size (int, optional): Values reserved at once by this process. Defaults to 20.
+            seed (Optional[Callable[[], int]], optional): Returns the last value already in use when
+                the sequence is created, ie: the greatest existing public id. Defaults to `None` (0).
+
+        Returns:
+            int: The allocated value
+        """
+        assert block_size > 0
+
+        if db.engine.dialect.name == 'sqlite':
+            return cls.__reserve(db.session, name, 1, seed)
+
+        with cls.__lock:
+            block = cls.__blocks.get(name)
+            if block is None or block[0] > block[1]:
+                with db.engine.begin() as connection:
+                    last = cls.__reserve(connection, name, block_size, seed)
+                block = cls.__blocks[name] = [last - block_size + 1, last]
+
+            value = block[0]
+            block[0] += 1
+            return value
+
+    @classmethod
+    def __reserve(cls, connection, name: str, size: int, seed: Optional[Callable[[], int]]) -> int:
+        """Atomically adds `size` to the sequence, returning its new value."""
+        table = cls.__table__
+        increment = update(table).where(table.c.name == name).values(value=table.c.value + size)
+
+        if connection.execute(increment).rowcount == 0:
+            initial = seed() if seed else 0
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(table).values(name=name, value=initial + size))
+            except IntegrityError:  # Created meanwhile by another process
+                connection.execute(increment)
+
+        return connection.execute(select(table.c.value).where(table.c.name == name)).scalar_one()
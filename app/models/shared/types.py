@@ -0,0 +1,131 @@
+import zlib
+from typing import Optional
+
+from sqlalchemy import Column
+from sqlalchemy.sql import visitors, ColumnElement
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+
+# Preset dictionary for signed ETD XML (DTE, EnvioDTE, EnvioBOLETA, ConsumoFolios).
+# It holds the fragments repeated on every document: namespaces, the signature template,
+# CAF and stamp elements and the header tag names. zlib favours the end of the
+# dictionary, so the most frequent fragments go last.
+# NEVER CHANGE A REGISTERED DICTIONARY, stored values can only be read with the
+# dictionary they were written with; register a new id instead.
+ETD_XML_DICTIONARY = ''.join([
+    '<ConsumoFolios xmlns="http://www.sii.cl/SiiDte" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.sii.cl/SiiDte ConsumoFolio_v10.xsd" version="1.0">'
+    '<DocumentoConsumoFolios ID="FOLIOS-<Resumen><TipoDocumento><MntNeto><MntIva><TasaIVA><MntExento>'
+    '<FoliosEmitidos><FoliosAnulados>0</FoliosAnulados><FoliosUtilizados><RangoUtilizados><Inicial><Final>'
+    '<FchInicio><FchFinal><Correlativo><SecEnvio>',
+    '<EnvioBOLETA xmlns="http://www.sii.cl/SiiDte" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.sii.cl/SiiDte EnvioBOLETA_v11.xsd" version="1.0">',
+    '<EnvioDTE xmlns="http://www.sii.cl/SiiDte" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.sii.cl/SiiDte EnvioDTE_v10.xsd" version="1.0">'
+    '<SetDTE ID="SetDTE-<Caratula version="1.0"><RutEmisor></RutEmisor><RutEnvia></RutEnvia>'
+    '<RutReceptor>60803000-K</RutReceptor><FchResol></FchResol><NroResol></NroResol>'
+    '<TmstFirmaEnv></TmstFirmaEnv><SubTotDTE><TpoDTE></TpoDTE><NroDTE></NroDTE></SubTotDTE></Caratula>',
+    '<Referencia><NroLinRef>1</NroLinRef><TpoDocRef></TpoDocRef><FolioRef></FolioRef><FchRef></FchRef>'
+    '<CodRef></CodRef><RazonRef></RazonRef></Referencia>'
+    '<DscRcgGlobal><NroLinDR>1</NroLinDR><TpoMov>D</TpoMov><GlosaDR></GlosaDR><TpoValor>$</TpoValor>'
+    '<ValorDR></ValorDR><IndExeDR></IndExeDR></DscRcgGlobal>',
+    '<CAF version="1.0"><DA><RE></RE><RS></RS><TD></TD><RNG><D></D><H></H></RNG><FA></FA>'
+    '<RSAPK><M></M><E>Aw==</E></RSAPK><IDK>100</IDK></DA><FRMA algoritmo="SHA1withRSA"></FRMA></CAF>',
+    '<TED version="1.0"><DD><RE></RE><TD></TD><F></F><FE></FE><RR></RR><RSR></RSR><MNT></MNT><IT1></IT1>'
+    '</DD><FRMT algoritmo="SHA1withRSA"></FRMT></TED><TmstFirma></TmstFirma>',
+    '<Signature xmlns="http://www.w3.org/2000/09/xmldsig#"><SignedInfo>'
+    '<CanonicalizationMethod Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/>'
+    '<SignatureMethod Algorithm="http://www.w3.org/2000/09/xmldsig#rsa-sha1"/><Reference URI="#">'
+    '<Transforms><Transform Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/></Transforms>'
+    '<DigestMethod Algorithm="http://www.w3.org/2000/09/xmldsig#sha1"/><DigestValue></DigestValue>'
+    '</Reference></SignedInfo><SignatureValue></SignatureValue><KeyInfo><KeyValue><RSAKeyValue>'
+    '<Modulus></Modulus><Exponent>AQAB</Exponent></RSAKeyValue></KeyValue><X509Data><X509Certificate>'
+    '</X509Certificate></X509Data></KeyInfo></Signature>',
+    '<Detalle><NroLinDet></NroLinDet><IndExe>1</IndExe><NmbItem></NmbItem><DscItem></DscItem>'
+    '<QtyItem></QtyItem><UnmdItem>M3</UnmdItem><PrcItem></PrcItem><DescuentoPct></DescuentoPct>'
+    '<DescuentoMonto></DescuentoMonto><RecargoPct></RecargoPct><RecargoMonto></RecargoMonto>'
+    '<MontoItem></MontoItem></Detalle>',
+    '<?xml version="1.0" encoding="ISO-8859-1"?>\n<DTE version="1.0"><Documento ID="T39F">'
+    '<Encabezado><IdDoc><TipoDTE>39</TipoDTE><Folio></Folio><FchEmis></FchEmis>'
+    '<IndServicio>3</IndServicio><PeriodoDesde></PeriodoDesde><PeriodoHasta></PeriodoHasta>'
+    '<FchVenc></FchVenc></IdDoc><Emisor><RUTEmisor></RUTEmisor><RznSocEmisor></RznSocEmisor>'
+    '<GiroEmisor></GiroEmisor><RznSoc></RznSoc><GiroEmis></GiroEmis><Telefono></Telefono>'
+    '<Acteco></Acteco><CdgSIISucur></CdgSIISucur><DirOrigen></DirOrigen><CmnaOrigen></CmnaOrigen>'
+    '<CiudadOrigen></CiudadOrigen></Emisor><Receptor><RUTRecep></RUTRecep><CdgIntRecep></CdgIntRecep>'
+    '<RznSocRecep></RznSocRecep><GiroRecep></GiroRecep><DirRecep></DirRecep><CmnaRecep></CmnaRecep>'
+    '<CiudadRecep></CiudadRecep></Receptor><Totales><MntNeto></MntNeto><MntExe></MntExe>'
+    '<TasaIVA>19</TasaIVA><IVA></IVA><MntTotal></MntTotal><SaldoAnterior></SaldoAnterior>'
+    '<VlrPagar></VlrPagar></Totales></Encabezado>',
+]).encode('iso-8859-1')
+
+# Dictionary id stored as the first byte of every compressed value.
+COMPRESSION_DICTIONARIES: dict[int, Optional[bytes]] = {
+    0: None,
+    1: ETD_XML_DICTIONARY,
+}
+
+
+def compress(data: bytes, dictionary_id: int = 1, level: int = 9) -> bytes:
+    """Deflates `data` with the registered dictionary, prefixing the dictionary id."""
+    zdict = COMPRESSION_DICTIONARIES[dictionary_id]
+    compressor = zlib.compressobj(level, zdict=zdict) if zdict else zlib.compressobj(level)
+    return bytes([dictionary_id]) + compressor.compress(data) + compressor.flush()
+
+
+def decompress(data: bytes) -> bytes:
+    """Inflates a value written by `compress`. Values not starting with a registered
+    dictionary id (ie: raw XML stored before compression was introduced) are returned as is.
+    """
+    if not data or data[0] not in COMPRESSION_DICTIONARIES:
+        return data
+
+    zdict = COMPRESSION_DICTIONARIES[data[0]]
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(data[1:]) + decompressor.flush()
+
+
+class CompressedBinary(TypeDecorator):
+    """Binary column compressed with zlib and a shared preset dictionary.
+
+    Values are compressed on write and inflated when the row is loaded; combine it
+    with `deferred()` so the blob is only fetched and inflated when accessed.
+
+    Example:
+
+        xml_data = deferred(db.Column(CompressedBinary()))
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dictionary_id: int = 1, level: int = 9, *args, **kwargs) -> None:
+        assert dictionary_id in COMPRESSION_DICTIONARIES
+        super().__init__(*args, **kwargs)
+        self.dictionary_id = dictionary_id
+        self.level = level
+
+    def process_bind_param(self, value: Optional[bytes], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return compress(value, self.dictionary_id, self.level)
+
+    def process_result_value(self, value: Optional[bytes], dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return decompress(bytes(value))
+
+
+def json_text(column: Column, key: str) -> ColumnElement:
+    """Text value of `key` in a JSON column, usable both in expression indexes and queries.
+
+    The JSON path is rendered as a literal instead of a bound parameter, otherwise
+    databases like SQLite do not match the query expression with the index one.
+
+    Example:
+
+        db.Index('ix_charges_payload_current_reading_id', json_text(payload, 'current_reading_id'))
+    """
+    def literal_path(bind) -> None:
+        bind.literal_execute = True
+
+    return visitors.cloned_traverse(column[key].as_string(), {}, {'bindparam': literal_path})
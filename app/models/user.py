@@ -1,4 +1,4 @@
-from uuid import UUID, uuid4
+from uuid import UUID
 from typing import Optional, Union
 
 from arrow import Arrow
@@ -6,6 +6,7 @@ from sqlalchemy_utils import UUIDType, ArrowType
 from sqlalchemy.orm import validates
 
 from ..db import db
+from ..utils.ids import new_id
 from ..utils.validators import (validate_rut, validate_business_name, 
                               validate_user_name, valid_phone, validate_email)
 from ..domain.user.mixins.user import UserMixin
@@ -86,7 +87,7 @@ class User(Model, UserMixin):
     '''
     __tablename__ = 'users'
 
-    id = db.Column(UUIDType, primary_key=True, default=uuid4)
+    id = db.Column(UUIDType, primary_key=True, default=new_id)
     # ---------- Identity Mixin 
     rut = db.Column(db.String(10), nullable=False, index=True, unique=True)
     name = db.Column(db.String(80), nullable=False)
@@ -109,7 +110,7 @@ class User(Model, UserMixin):
     # -----------SQLAlchemy relationships
     address = db.relationship('Address', uselist=False)
     charges = db.relationship('Charge', backref='user')
-    renegotiations = db.relationship('PaymentPlan', backref='user', uselist=True)
+    renegotiations = db.relationship('Renegotiation', backref='user', uselist=True)
     
     incorporation_charge = db.relationship('Charge', secondary=users_incorporation_charges, uselist=False)
     accounts = db.relationship('Account', backref='user', uselist=True, order_by='Account.created_at')
@@ -0,0 +1,103 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from functools import cached_property
+from typing import Iterator, Optional
+
+from arrow import Arrow, utcnow
+
+
+LOCAL_TIMEZONE = 'America/Santiago'
+
+
+class Clock:
+    """Reference instant of a request or job. Local date conversions are computed once and
+    cached, so every state check of a request agrees on what "now" and "today" are.
+
+    Args:
+        at (Optional[Arrow], optional): Reference instant. Defaults to `utcnow()`.
+        timezone (str, optional): Local timezone. Defaults to `LOCAL_TIMEZONE`.
+    """
+
+    def __init__(self, at: Optional[Arrow] = None, timezone: str = LOCAL_TIMEZONE) -> None:
+        self.now: Arrow = (at or utcnow()).to('UTC')
+        self.timezone = timezone
+
+    @cached_property
+    def local_now(self) -> Arrow:
+        return self.now.to(self.timezone)
+
+    @cached_property
+    def today(self) -> date:
+        """Local date of the reference instant."""
+        return self.local_now.date()
+
+    @cached_property
+    def utc_today(self) -> date:
+        return self.now.date()
+
+    @cached_property
+    def day_start(self) -> Arrow:
+        """UTC start of the local day."""
+        return self.local_now.floor('day').to('UTC')
+
+    @cached_property
+    def day_end(self) -> Arrow:
+        """UTC start of the next local day."""
+        return self.local_now.shift(days=1).floor('day').to('UTC')
+
+    def __repr__(self) -> str:
+        return f'<Clock {self.now.isoformat()} {self.timezone}>'
+
+
+__current: ContextVar[Optional[Clock]] = ContextVar('clock', default=None)
+
+
+def clock(at: Optional[Arrow] = None) -> Clock:
+    """The clock of `at` when given, otherwise the frozen clock of the current request or
+    job, otherwise a clock of the current instant.
+    """
+    if at is not None:
+        return Clock(at)
+    return __current.get() or Clock()
+
+
+def now(at: Optional[Arrow] = None) -> Arrow:
+    """Shortcut for `clock(at).now`"""
+    return clock(at).now
+
+
+def local_today(at: Optional[Arrow] = None) -> date:
+    """Shortcut for `clock(at).today`"""
+    return clock(at).today
+
+
+def freeze(at: Optional[Arrow] = None) -> None:
+    """Freezes the reference instant of the current context (request or job) at `at`,
+    registered as a Flask `before_request` function so it must return `None`.
+
+    Args:
+        at (Optional[Arrow], optional): Reference instant. Defaults to `utcnow()`.
+    """
+    __current.set(Clock(at))
+
+
+def unfreeze(*args) -> None:
+    """Releases the frozen clock of the current context, accepts and ignores the arguments
+    Flask passes to teardown functions."""
+    __current.set(None)
+
+
+@contextmanager
+def frozen(at: Optional[Arrow] = None) -> Iterator[Clock]:
+    """Runs the block with a frozen clock, restoring the previous one on exit.
+
+    Example:
+        with frozen(arrow.get('2022-06-01T12:00:00Z')):
+            charge.state  # As of 2022-06-01
+    """
+    token = __current.set(Clock(at))
+    try:
+        yield __current.get()
+    finally:
+        __current.reset(token)
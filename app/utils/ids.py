@@ -0,0 +1,50 @@
+import os
+from threading import Lock
+from time import time_ns
+from uuid import UUID, uuid4
+
+
+# When enabled, `new_id` returns time ordered UUIDs (version 7) instead of random ones (version 4).
+TIME_ORDERED_IDS = False
+
+__lock = Lock()
+__last = [0, 0]  # last (timestamp ms, counter) used
+
+
+def uuid7() -> UUID:
+    """Generates a version 7 UUID (RFC 9562): 48 bits of unix time in milliseconds followed by
+    a 12 bits counter and 62 random bits. IDs generated by this process are strictly increasing,
+    so new rows are appended at the end of primary key & foreign key indexes.
+
+    Returns:
+        UUID: The time ordered UUID
+    """
+    with __lock:
+        timestamp = time_ns() // 1_000_000
+        last_timestamp, counter = __last
+
+        if timestamp > last_timestamp:
+            counter = int.from_bytes(os.urandom(2), 'big') & 0x3FF  # Leaves room to increment
+        else:
+            timestamp, counter = last_timestamp, counter + 1
+            if counter > 0xFFF:
+                timestamp, counter = last_timestamp + 1, 0
+
+        __last[:] = timestamp, counter
+
+    random = int.from_bytes(os.urandom(8), 'big') & 0x3FFFFFFFFFFFFFFF
+    value = (timestamp & 0xFFFFFFFFFFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random
+    return UUID(int=value)
+
+
+def new_id() -> UUID:
+    """Default primary key generator for models, see `TIME_ORDERED_IDS`."""
+    return uuid7() if TIME_ORDERED_IDS else uuid4()
+
+
+def use_time_ordered_ids(enabled: bool) -> None:
+    """Switches `new_id` between time ordered (UUIDv7) and random (UUIDv4) identifiers.
+    Both are stored in the same `UUIDType` columns, so they can coexist on a table.
+    """
+    global TIME_ORDERED_IDS
+    TIME_ORDERED_IDS = enabled
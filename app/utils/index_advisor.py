@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from arrow import utcnow
+from sqlalchemy import MetaData, Table, UniqueConstraint
+
+
+@dataclass(frozen=True)
+class MissingIndex:
+    """A foreign key of `table` whose `columns` are not the leading columns of any index."""
+
+    table: str
+    columns: tuple[str, ...]
+    referred_table: str
+    # Columns of the suggested index: the foreign key columns, followed on association
+    # tables by the other side foreign key so reverse lookups are index only scans.
+    index_columns: tuple[str, ...]
+
+    @property
+    def index_name(self) -> str:
+        return f'ix_{self.table}_{"_".join(self.index_columns)}'
+
+    def __str__(self) -> str:
+        return (f'{self.table}({", ".join(self.columns)}) -> {self.referred_table}: '
+                f'missing index {self.index_name}({", ".join(self.index_columns)})')
+
+
+def indexed_prefixes(table: Table) -> set[tuple[str, ...]]:
+    """Leading column prefixes usable for lookups: primary key, unique constraints & indexes."""
+    column_sets = [tuple(c.name for c in table.primary_key.columns)]
+    column_sets += [tuple(c.name for c in index.columns) for index in table.indexes]
+    column_sets += [tuple(c.name for c in constraint.columns) for constraint in table.constraints
+                    if isinstance(constraint, UniqueConstraint)]
+    column_sets += [(column.name,) for column in table.columns if column.unique or column.index]
+
+    return {columns[:length] for columns in column_sets for length in range(1, len(columns) + 1)}
+
+
+def is_association_table(table: Table) -> bool:
+    """Tables without primary key made of foreign keys only, ie: `db.Table` secondaries."""
+    return not table.primary_key.columns and \
+        all(column.foreign_keys for column in table.columns)
+
+
+def missing_fk_indexes(metadata: MetaData) -> list[MissingIndex]:
+    """Finds the foreign keys not covered by the leading columns of an index.
+
+    Args:
+        metadata (MetaData): Metadata with all the models loaded, see `load_models`.
+
+    Returns:
+        list[MissingIndex]: Uncovered foreign keys sorted by table and columns
+    """
+    missing = []
+    for table in metadata.tables.values():
+        prefixes = indexed_prefixes(table)
+        association = is_association_table(table)
+
+        for constraint in table.foreign_key_constraints:
+            columns = tuple(column.name for column in constraint.columns)
+            if columns in prefixes:
+                continue
+
+            index_columns = columns
+            if association:
+                index_columns += tuple(column.name for column in table.columns
+                                       if column.name not in columns)
+
+            # Resolved by name, referred tables may belong to models not loaded
+            referred_table = constraint.elements[0].target_fullname.rsplit('.', 1)[0]
+            missing.append(MissingIndex(table.name, columns, referred_table, index_columns))
+
+    return sorted(missing, key=lambda item: (item.table, item.columns))
+
+
+def render_migration(missing: list[MissingIndex], revision: str, down_revision: Optional[str] = None,
+                     message: str = 'Add missing foreign key indexes') -> str:
+    """Renders an alembic (Flask-Migrate) migration creating the given indexes.
+
+    Args:
+        missing (list[MissingIndex]): Indexes to create, see `missing_fk_indexes`.
+        revision (str): The new revision id.
+        down_revision (Optional[str], optional): Current head revision. Defaults to `None`.
+        message (str, optional): Migration message. Defaults to 'Add missing foreign key indexes'.
+
+    Returns:
+        str: The migration script
+    """
+    upgrade = [f"    op.create_index('{item.index_name}', '{item.table}', {list(item.index_columns)!r})"
+               for item in missing] or ['    pass']
+    downgrade = [f"    op.drop_index('{item.index_name}', table_name='{item.table}')"
+                 for item in reversed(missing)] or ['    pass']
+
+    return '\n'.join([
+        f'"""{message}',
+        '',
+        f'Revision ID: {revision}',
+        f'Revises: {down_revision or ""}',
+        f'Create Date: {utcnow().format("YYYY-MM-DD HH:mm:ss")}',
+        '',
+        '"""',
+        'from alembic import op',
+        '',
+        '',
+        f'revision = {revision!r}',
+        f'down_revision = {down_revision!r}',
+        'branch_labels = None',
+        'depends_on = None',
+        '',
+        '',
+        'def upgrade():',
+        *upgrade,
+        '',
+        '',
+        'def downgrade():',
+        *downgrade,
+        '',
+    ])
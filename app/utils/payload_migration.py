@@ -0,0 +1,178 @@
+import json
+import logging
+import pickle
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Optional
+from uuid import UUID
+
+from arrow import Arrow, utcnow
+from sqlalchemy import JSON, Column, LargeBinary, bindparam, column, select, table, update
+from sqlalchemy_utils import UUIDType
+
+from ..models.shared.types import json_text
+
+
+logger = logging.getLogger('alembic')
+
+# Unconverted payloads stay on this column after the swap, for manual recovery
+LEGACY_COLUMN = 'payload_pickle'
+INDEX_NAME = 'ix_charges_payload_current_reading_id'
+# Errors of unpickling values whose classes moved or of non JSON values
+CONVERSION_ERRORS = (pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError,
+                     TypeError, ValueError)
+
+
+def json_default(value: Any) -> Any:
+    """`json.dumps` encoder of the values found on pickled payloads."""
+    if isinstance(value, (Arrow, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else str(value)
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def json_key(key: Any) -> str:
+    """Text of a dict key, `json.dumps` does not apply its encoder to keys."""
+    if isinstance(key, str):
+        return key
+    try:
+        return str(json_default(key))
+    except TypeError:
+        return str(key)
+
+
+def json_keys(value: Any) -> Any:
+    """Copy of `value` with every dict key as text, see `json_key`."""
+    if isinstance(value, dict):
+        return {json_key(key): json_keys(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_keys(item) for item in value]
+    return value
+
+
+def payload_to_json(raw: Optional[bytes]) -> dict:
+    """Converts a stored payload, pickled or already JSON encoded, to a JSON dict.
+
+    Raises:
+        ValueError: The payload is not a dict or can not be encoded. Unpickling errors are
+            propagated, see `CONVERSION_ERRORS`.
+    """
+    if raw is None:
+        return {}
+    raw = bytes(raw)
+    data = pickle.loads(raw) if raw.startswith(b'\x80') else json.loads(raw.decode())
+    if not isinstance(data, dict):
+        raise ValueError(f'Payload is a {type(data).__name__}, not a dict')
+    return json.loads(json.dumps(json_keys(dict(data)), default=json_default))
+
+
+def upgrade_charges_payload(op) -> list[Any]:
+    """Migrates `charges.payload` from a pickled BLOB to a JSON column.
+
+    A `payload_json` column is added and filled from the old values, which are then kept
+    as `payload_pickle` while the JSON column takes the `payload` name. Payloads that can
+    not be converted are logged and stored as `{}`, their original value stays on
+    `payload_pickle`.
+
+    Args:
+        op: The alembic operations of the migration.
+
+    Returns:
+        list[Any]: Ids of the charges whose payload could not be converted
+    """
+    op.add_column('charges', Column('payload_json', JSON(), nullable=True))
+
+    charges = table('charges', column('id', UUIDType()), column('payload', LargeBinary()),
+                    column('payload_json', JSON()))
+    bind = op.get_bind()
+    converted, skipped = [], []
+    for charge_id, raw in bind.execute(select(charges.c.id, charges.c.payload)):
+        try:
+            data = payload_to_json(raw)
+        except CONVERSION_ERRORS as e:
+            logger.warning(f'Charge {charge_id} payload not converted: {e!r}')
+            data = {}
+            skipped.append(charge_id)
+        converted.append({'charge_id': charge_id, 'data': data})
+
+    if converted:
+        bind.execute(update(charges).where(charges.c.id == bindparam('charge_id'))
+                     .values(payload_json=bindparam('data')), converted)
+
+    op.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+    with op.batch_alter_table('charges') as batch:
+        batch.alter_column('payload', new_column_name=LEGACY_COLUMN)
+        batch.alter_column('payload_json', new_column_name='payload', existing_type=JSON(),
+                           nullable=False)
+    op.create_index(INDEX_NAME, 'charges', [json_text(column('payload', JSON()), 'current_reading_id')])
+
+    logger.info(f'{len(converted) - len(skipped)} charge payloads converted, {len(skipped)} skipped')
+    return skipped
+
+
+def downgrade_charges_payload(op) -> None:
+    """Reverts `upgrade_charges_payload`. Charges created after the upgrade get their JSON
+    payload pickled."""
+    charges = table('charges', column('id', UUIDType()), column('payload', JSON()),
+                    column(LEGACY_COLUMN, LargeBinary()))
+    bind = op.get_bind()
+    rows = bind.execute(select(charges.c.id, charges.c.payload)
+                        .where(charges.c[LEGACY_COLUMN].is_(None))).all()
+    if rows:
+        bind.execute(update(charges).where(charges.c.id == bindparam('charge_id'))
+                     .values({LEGACY_COLUMN: bindparam('data')}),
+                     [{'charge_id': charge_id, 'data': pickle.dumps(data)} for charge_id, data in rows])
+
+    op.drop_index(INDEX_NAME, table_name='charges')
+    with op.batch_alter_table('charges') as batch:
+        batch.drop_column('payload')
+        batch.alter_column(LEGACY_COLUMN, new_column_name='payload')
+
+
+def render_migration(revision: str, down_revision: Optional[str] = None,
+                     message: str = 'Convert charges payload to JSON') -> str:
+    """Renders the alembic (Flask-Migrate) migration running `upgrade_charges_payload`.
+
+    Args:
+        revision (str): The new revision id.
+        down_revision (Optional[str], optional): Current head revision. Defaults to `None`.
+        message (str, optional): Migration message. Defaults to 'Convert charges payload to JSON'.
+
+    Returns:
+        str: The migration script
+    """
+    return '\n'.join([
+        f'"""{message}',
+        '',
+        f'Revision ID: {revision}',
+        f'Revises: {down_revision or ""}',
+        f'Create Date: {utcnow().format("YYYY-MM-DD HH:mm:ss")}',
+        '',
+        '"""',
+        'from alembic import op',
+        '',
+        'from app.utils.payload_migration import upgrade_charges_payload, downgrade_charges_payload',
+        '',
+        '',
+        f'revision = {revision!r}',
+        f'down_revision = {down_revision!r}',
+        'branch_labels = None',
+        'depends_on = None',
+        '',
+        '',
+        'def upgrade():',
+        '    upgrade_charges_payload(op)',
+        '',
+        '',
+        'def downgrade():',
+        '    downgrade_charges_payload(op)',
+        '',
+    ])
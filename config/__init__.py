@@ -28,6 +28,8 @@ class Config:
     # ---------- Flask Secret Key
     SECRET_KEY = os.environ.get('FLASK_SECRET_KEY', 'Really Hard Password')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # ---------- Primary keys, time ordered (UUIDv7) or random (UUIDv4)
+    TIME_ORDERED_IDS = os.environ.get('TIME_ORDERED_IDS', 'false').lower() in ('1', 'true', 'yes')
 
 
 class DevelopmentConfig(Config):
@@ -35,3 +35,174 @@ def tests(html: bool = False, v: bool = False) -> None:
         ["","-v"][v],               
         ], shell=True)
     return
+
+@app.cli.command(name='charges-payload-to-json')
+@click.argument('migration', type=click.Path(dir_okay=False))
+@click.option('--down-revision', default=None, help='Current head revision for the migration.')
+def charges_payload_to_json(migration: str, down_revision: str = None) -> None:
+    """Writes the alembic migration converting the pickled `charges.payload` column to JSON,
+    see `upgrade_charges_payload`."""
+    from uuid import uuid4
+    from app.utils.payload_migration import render_migration
+
+    with open(migration, 'w') as file:
+        file.write(render_migration(uuid4().hex[:12], down_revision))
+    click.echo(f'Migration written to {migration}')
+
+@app.cli.command(name='consumptions-from-last-13')
+def consumptions_from_last_13() -> None:
+    """Copies the pickled `Account.last_13` consumptions into the `consumptions` table, as
+    measured by the account current water meter. Accounts without meter are skipped."""
+    from arrow import Arrow
+    from sqlalchemy import select
+    from sqlalchemy.orm import undefer
+    from app.models.account.account import Account
+    from app.models.account.consumption import Consumption
+
+    rows, skipped = [], 0
+    for account in db.session.execute(select(Account).options(undefer(Account.last_13))).unique().scalars():
+        months = [(month, value) for month, value in (account.last_13 or {}).items() if isinstance(month, Arrow)]
+        if account.current_water_meter is None:
+            skipped += bool(months)
+            continue
+        rows += [{'account_id': account.id, 'water_meter_id': account.current_water_meter.id,
+                  'month': month, 'value': value} for month, value in months]
+
+    Consumption.record_many(rows)
+    db.session.commit()
+    click.echo(f'{len(rows)} monthly consumptions copied, {skipped} accounts without water meter skipped')
+
+@app.cli.command(name='index-advisor')
+@click.option('--migration', type=click.Path(dir_okay=False), default=None,
+              help='Writes an alembic migration creating the missing indexes.')
+@click.option('--down-revision', default=None, help='Current head revision for the migration.')
+def index_advisor(migration: str = None, down_revision: str = None) -> None:
+    """Reports foreign keys without a covering index."""
+    from uuid import uuid4
+    from app.utils.index_advisor import missing_fk_indexes, render_migration
+
+    missing = missing_fk_indexes(db.metadata)
+    for item in missing:
+        click.echo(str(item))
+    click.echo(f'{len(missing)} foreign keys without index')
+
+    if migration and missing:
+        with open(migration, 'w') as file:
+            file.write(render_migration(missing, uuid4().hex[:12], down_revision))
+        click.echo(f'Migration written to {migration}')
+
+@app.cli.command(name='refresh-states')
+@click.option('--at', default=None, help='Reference time (ISO 8601), defaults to now.')
+def refresh_states(at: str = None) -> None:
+    """Daily job, moves expired charges & installments to their OVERDUE/EXPIRED state."""
+    from arrow import get
+    from app.models.finance.charge import Charge
+    from app.models.finance.renegotiation import Installment
+    from app.utils.clock import frozen
+
+    with frozen(get(at) if at else None):
+        charges, installments = Charge.refresh_states(), Installment.refresh_states()
+    db.session.commit()
+    click.echo(f'{charges} charges and {installments} installments updated')
+
+@app.cli.command(name='import-readings')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--dry-run/--no-dry-run', default=False, help='Validates the file without saving.')
+def import_readings(file, dry_run: bool = False) -> None:
+    """Imports a route readings CSV file (account, value, date)."""
+    from app.models.account.account import Account
+
+    report = Account.import_readings(file)
+    for error in report.errors:
+        click.echo(f'Linea {error.line}: {error.title}. {error.message}')
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    click.echo(f'{report.imported} of {report.total} readings imported, {report.rejected} rejected')
+
+@app.cli.command(name='scan-anomalies')
+@click.option('--z-threshold', type=float, default=3.5, help='Consumption z-score flagged as leak.')
+def scan_anomalies(z_threshold: float = 3.5) -> None:
+    """Nightly job, flags leaking, stalled and suspiciously rolled over water meters."""
+    from app.models.account.water_meters import WaterMeter
+
+    anomalies = WaterMeter.scan_anomalies(z_threshold=z_threshold)
+    for anomaly in anomalies:
+        click.echo(f'{anomaly.meter_id} {anomaly.anomaly_type.name} '
+                   f'score={anomaly.score} consumption={anomaly.consumption}')
+    click.echo(f'{len(anomalies)} water meters flagged')
+
+@app.cli.command(name='reconcile-statement')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--dry-run/--no-dry-run', default=False, help='Reports without saving.')
+def reconcile_statement(file, dry_run: bool = False) -> None:
+    """Applies a bank statement CSV file (date, amount, reference, rut) to pending debts."""
+    from app.models.finance.transaction import Transaction
+    from app.utils.clock import frozen
+
+    with frozen():
+        report = Transaction.reconcile_statement(file, dry_run=dry_run)
+    for allocation in report.allocations:
+        click.echo(f'Linea {allocation.line}: {allocation.amount} -> {allocation.kind} {allocation.public_id}')
+    for rejection in report.rejections:
+        click.echo(f'Linea {rejection.line}: {rejection.title}. {rejection.message}')
+
+    click.echo(f'{report.lines} transfers, {report.received} received, {report.allocated} applied, '
+               f'{report.unallocated} unapplied{" (dry run)" if dry_run else ""}')
+
+@app.cli.command(name='refresh-balances')
+def refresh_balances() -> None:
+    """Recomputes the amounts of the open balances from their entries, expenses,
+    transactions and charges."""
+    from app.models.finance.balance import Balance
+
+    refreshed = Balance.refresh_totals()
+    db.session.commit()
+    click.echo(f'{refreshed} open balances refreshed')
+
+@app.cli.command(name='close-period')
+@click.argument('year', type=int)
+@click.argument('month', type=int)
+def close_period(year: int, month: int) -> None:
+    """Closes the balance of a finished month and opens the next one."""
+    from app.models.finance.balance import Balance
+    from app.utils.clock import frozen
+
+    with frozen():
+        closing = Balance.close_period(year, month)
+    for table, rows in closing.assigned.items():
+        click.echo(f'{rows} {table} assigned')
+    for step, seconds in closing.timings.items():
+        click.echo(f'{step}: {seconds:.3f}s')
+    click.echo(f'Balance {month:02}/{year} closed, {closing.carried} carried to the next period')
+
+@app.cli.command(name='simulate-renegotiations')
+@click.option('--installments', type=int, default=6, help='Installments of the candidate plans.')
+@click.option('--first-due', default=None, help='First due date (YYYY-MM-DD), defaults to a month from today.')
+@click.option('--at', default=None, help='Reference time (ISO 8601), defaults to now.')
+def simulate_renegotiations(installments: int = 6, first_due: str = None, at: str = None) -> None:
+    """What-if monthly cash flow of the open renegotiations plus renegotiating the pending
+    charges of every account with debt."""
+    import numpy as np
+    from arrow import get
+    from app.models.account.account import Account
+    from app.models.finance.renegotiation import Renegotiation
+    from app.domain.finance.schedule import plan_schedules, merge_schedules, project_cashflow
+    from app.utils.clock import frozen
+
+    with frozen(get(at) if at else None) as clock:
+        at = clock.now
+        first_due = get(first_due, tzinfo='America/Santiago') if first_due else at.shift(months=1)
+
+        debts = {account_id: debt.charges for account_id, debt in Account.debts(at=at).items() if debt.charges > 0}
+        candidates = plan_schedules(list(debts), np.array(list(debts.values()), dtype=np.int64),
+                                    installments, first_due)
+        existing = Renegotiation.schedules()
+
+        for label, schedule in (('Current', existing), ('What-if', merge_schedules(existing, candidates))):
+            cashflow = project_cashflow(schedule, at)
+            click.echo(f'{label}: {len(schedule)} plans')
+            for month, scheduled, expected in zip(cashflow.months, cashflow.scheduled, cashflow.expected):
+                click.echo(f'  {month}: scheduled {scheduled}, expected {expected}')
@@ -0,0 +1,34 @@
+import pytest
+
+from app import create_app
+from app.db import db
+from app.domain.etd.sender.constants import use_stand_in
+from app.domain.etd.sender.stand_in import SIIStandIn, StandInConfig
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app('testing')
+
+
+@pytest.fixture
+def session(app):
+    """Session on an empty in-memory database, discarded after the test."""
+    with app.app_context():
+        # Tables referencing tables that are not mapped by this package can not be created
+        names = set(db.metadata.tables)
+        tables = [table for table in db.metadata.tables.values()
+                  if all(key.target_fullname.split('.')[0] in names for key in table.foreign_keys)]
+        db.metadata.create_all(db.engine, tables=tables)
+        yield db.session
+        db.session.remove()
+
+
+@pytest.fixture
+def stand_in():
+    """SII stand-in every sender request goes to."""
+    server = SIIStandIn(StandInConfig(checks_to_final=2)).start()
+    use_stand_in(server.url)
+    yield server
+    server.stop()
+    use_stand_in(None)
@@ -0,0 +1,60 @@
+from itertools import accumulate
+
+from app.domain.account.anomalies import ReadingHistory, detect_anomalies
+from app.domain.account.constants import AnomalyType
+
+
+NORMAL = [10, 12, 11, 9, 13, 10, 12]
+
+
+def history(**meters: list[int]) -> ReadingHistory:
+    """History of meters given their reading values, top limit 9999."""
+    return ReadingHistory.from_rows([(meter_id, value, 9999)
+                                     for meter_id, values in meters.items() for value in values])
+
+
+def readings(consumptions: list[int], first: int = 100) -> list[int]:
+    """Reading values of the given monthly consumptions."""
+    return list(accumulate(consumptions, initial=first))
+
+
+def flags(history: ReadingHistory, **options) -> list[tuple]:
+    return [(anomaly.meter_id, anomaly.anomaly_type, anomaly.consumption)
+            for anomaly in detect_anomalies(history, **options)]
+
+
+def test_normal_series_are_not_flagged():
+    assert flags(history(
+        normal=readings(NORMAL),
+        unused=readings([0] * 7),                                   # Never consumed, not a stall
+        rollover=[9940, 9950, 9961, 9970, 9980, 9990, 1],           # Rolled over near the top limit
+        short=[100, 250],                                           # Not enough history
+        single=[100],
+    )) == []
+
+
+def test_leak_stall_and_rollover():
+    anomalies = detect_anomalies(history(
+        normal=readings(NORMAL),
+        leak=readings(NORMAL[:-1] + [60]),
+        big_leak=readings(NORMAL[:-1] + [200]),
+        stall=readings(NORMAL[:4] + [0, 0, 0]),
+        rollover=readings(NORMAL[:-1]) + [50],                      # From 165, far from 9999
+    ))
+
+    assert [(anomaly.meter_id, anomaly.anomaly_type, anomaly.consumption) for anomaly in anomalies] == [
+        ('big_leak', AnomalyType.LEAK, 200),
+        ('leak', AnomalyType.LEAK, 60),
+        ('stall', AnomalyType.STALL, 0),
+        ('rollover', AnomalyType.ROLLOVER, 9999 - (165 - 50)),     # Not reported as a leak
+    ]
+    assert anomalies[2].score == 10.5                               # Median before the stall
+    assert anomalies[3].score == round((9999 - 165) / 300, 2)
+
+
+def test_thresholds():
+    meters = history(rise=readings(NORMAL[:-1] + [16]), stall=readings(NORMAL[:5] + [0, 0]))
+
+    assert flags(meters) == [('rise', AnomalyType.LEAK, 16)]
+    assert flags(meters, z_threshold=5) == []
+    assert flags(meters, z_threshold=5, stall_readings=2) == [('stall', AnomalyType.STALL, 0)]
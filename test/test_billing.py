@@ -0,0 +1,63 @@
+from arrow import get
+
+from app.domain.account.constants import SubsidyType
+from app.domain.finance.billing import BillingInput, bill
+from app.domain.service.tariff import Tariff
+from app.models.account.account import Account
+from app.models.account.water_meters import Reading, WaterMeter
+from app.models.finance.charge import Charge
+
+
+TARIFF = Tariff.compile({'fixed_charge': 3500, 'tiers': [[15, 600], [None, 1000]]})
+
+
+def new_account(public_id: str, *values: int, **options) -> Account:
+    """Account with a current water meter and a monthly reading of each value."""
+    account = Account.new(public_id, **options)
+    water_meter = WaterMeter(top_limit=9999, consumption=0)
+    for month, value in enumerate(values):
+        water_meter.insert_reading(Reading.new(value, get('2022-01-10').shift(months=month)))
+    account.water_meters.append(water_meter)
+    account.current_water_meter = water_meter
+    return account
+
+
+def test_bill_matches_water_charge_available(session):
+    accounts = [
+        new_account('1', 100, 130),
+        new_account('2', 100),                                  # Single reading
+        new_account('3', 100, 120),                             # Already charged
+        new_account('4', 50, 50, fixed_charge_exent=True),      # Nothing to bill
+        new_account('5', 50, 60, fixed_charge_exent=True),
+        new_account('6', 9990, 20),                             # Rollover
+    ]
+    session.add_all(accounts)
+    session.flush()
+    charged = accounts[2]
+    charged.charges.append(Charge(amount=100, paid_amount=0, nulled=False,
+        payload={'current_reading_id': str(charged.current_water_meter.current_reading.id)}))
+    session.commit()
+
+    rows = list(bill(Account.billing_input(), TARIFF).rows())
+
+    assert {row['account_id']: row['consumption'] for row in rows} == {
+        account.id: account.current_water_meter.last_consumption()
+        for account in accounts if account.water_charge_available()}
+    assert [row['consumption'] for row in rows] == [30, 10, 29]
+    assert rows[1]['fixed_amount'] == 0
+
+
+def test_percentage_subsidy_skips_exempt_first_tier():
+    data = BillingInput.from_rows([
+        ('a', 130, 100, 9999, SubsidyType.PERCENTAGE, 50, False, True, False),
+        ('b', 130, 100, 9999, SubsidyType.PERCENTAGE, 50, False, False, False),
+    ])
+
+    tariff = Tariff.compile({'fixed_charge': 3500, 'tiers': [[15, 600], [None, 1000]], 'subsidy_limit': 15})
+
+    result = bill(data, tariff)
+
+    # 15 m³ at 600 & 15 m³ at 1000, the first tier is neither billed nor subsidized on `a`
+    assert result.tier_amounts.sum(axis=1).tolist() == [15000, 24000]
+    assert result.discounts.tolist() == [3500 // 2, (3500 + 9000) // 2]
+    assert result.totals.tolist() == [16750, 21250]
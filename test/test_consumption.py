@@ -0,0 +1,64 @@
+from io import StringIO
+
+from arrow import get
+from sqlalchemy import select
+
+from app.models.account.account import Account
+from app.models.account.consumption import Consumption
+from app.models.account.water_meters import Reading, WaterMeter
+
+
+MARCH = get('2022-03-10T12:00:00-04:00')
+
+
+def new_account(public_id: str, *values: int) -> Account:
+    """Account with a current water meter and a monthly reading of each value."""
+    account = Account.new(public_id)
+    water_meter = WaterMeter(top_limit=9999, consumption=0)
+    for month, value in enumerate(values):
+        water_meter.insert_reading(Reading.new(value, get('2022-01-10').shift(months=month)))
+    account.water_meters.append(water_meter)
+    account.current_water_meter = water_meter
+    return account
+
+
+def test_replaced_meter_keeps_its_own_rows(session):
+    account = new_account('1', 100)
+    session.add(account)
+    session.commit()
+    old_meter = account.current_water_meter
+
+    account.update_last_13(MARCH, 12)
+    account.update_last_13(MARCH, 15)           # Replaces the month of the same meter
+    new_meter = WaterMeter(top_limit=9999, consumption=0)
+    account.water_meters.append(new_meter)
+    account.current_water_meter = new_meter
+    session.flush()
+    account.update_last_13(MARCH, 4)
+    account.update_last_13(MARCH.shift(months=1), 20)
+    session.commit()
+
+    rows = session.execute(select(Consumption.water_meter_id, Consumption.month, Consumption.value)
+                           .order_by(Consumption.month, Consumption.value)).all()
+    assert [(row[0], str(row[1]), row[2]) for row in rows] == [
+        (new_meter.id, '2022-03-01', 4), (old_meter.id, '2022-03-01', 15), (new_meter.id, '2022-04-01', 20)]
+    assert account.consumption_series(3).values.tolist() == [0, 19, 20]
+
+
+def test_import_readings_records_monthly_consumption(session):
+    accounts = [new_account('1', 100), new_account('2')]
+    session.add_all(accounts)
+    session.commit()
+
+    report = Account.import_readings(StringIO('account,value,date\n1,130,2022-02-15\n2,40,2022-02-15\n'))
+    session.commit()
+
+    assert report.imported == 2
+    assert accounts[0].consumption_series(2).values.tolist() == [0, 30]
+    # A first reading has no consumption
+    assert accounts[1].consumption_series().values.tolist() == []
+
+    report = Account.import_readings(StringIO('account,value,date\n1,150,2022-03-20\n'))
+    session.commit()
+
+    assert accounts[0].consumption_series(2).values.tolist() == [30, 20]
@@ -0,0 +1,43 @@
+from arrow import get
+
+from app.domain.etd.constants.document import DocumentType
+from app.models.etd.etd import ETD
+
+
+DAY = get('2022-06-10T12:00:00-04:00')
+
+
+def new_etd(doc_type: DocumentType, folio: int, date_emited=DAY, total_amount: int = 1000) -> ETD:
+    return ETD(doc_type=int(doc_type), folio=folio, date_emited=date_emited, rut_receptor='11111111-1',
+               net_amount=0, tax_amount=0, exent_amount=total_amount, total_amount=total_amount)
+
+
+def test_folio_usage_ranges_and_totals(session):
+    boleta = DocumentType.BOLETA_ELECTRÓNICA
+    session.add_all([new_etd(boleta, folio) for folio in (1, 2, 3, 5, 6, 9, 12, 10)] + [
+        new_etd(boleta, 4, DAY.shift(days=1)),              # Emited after the period
+        new_etd(boleta, 11, DAY.shift(days=-1)),            # Emited before the period
+        new_etd(DocumentType.FACTURA_ELECTRÓNICA, 7),       # Not summarized
+    ])
+    session.commit()
+
+    usage = ETD.folio_usage(DAY, DAY)
+
+    assert usage[boleta]['ranges'] == [[1, 3], [5, 6], [9, 10], [12, 12]]
+    assert (usage[boleta]['doc_count'], usage[boleta]['total_amount'], usage[boleta]['exe_amount']) == \
+        (8, 8000, 8000)
+    assert usage[DocumentType.BOLETA_ELECTRÓNICA_EXENTA] == {
+        'ranges': [], 'doc_count': 0, 'net_amount': 0, 'tax_amount': 0, 'exe_amount': 0,
+        'total_amount': 0, 'tax_pct': 19.0}
+    assert list(usage) == [boleta, DocumentType.BOLETA_ELECTRÓNICA_EXENTA]
+
+
+def test_folio_usage_keeps_doc_types_apart(session):
+    session.add_all([new_etd(DocumentType.BOLETA_ELECTRÓNICA, folio) for folio in (1, 2)] +
+                    [new_etd(DocumentType.BOLETA_ELECTRÓNICA_EXENTA, folio) for folio in (3, 4, 7)])
+    session.commit()
+
+    usage = ETD.folio_usage(DAY.shift(days=-3), DAY)
+
+    assert usage[DocumentType.BOLETA_ELECTRÓNICA]['ranges'] == [[1, 2]]
+    assert usage[DocumentType.BOLETA_ELECTRÓNICA_EXENTA]['ranges'] == [[3, 4], [7, 7]]
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, Table
+
+from app.db import db
+from app.utils.index_advisor import missing_fk_indexes, render_migration
+from app.utils.loaders import load_models
+
+
+def test_models_foreign_keys_are_indexed():
+    load_models()
+    missing = missing_fk_indexes(db.metadata)
+    assert not missing, 'Unindexed foreign keys:\n' + '\n'.join(map(str, missing))
+
+
+def test_association_tables_get_composite_indexes():
+    metadata = MetaData()
+    Table('parents', metadata, Column('id', Integer, primary_key=True))
+    Table('children', metadata, Column('id', Integer, primary_key=True),
+          Column('parent_id', ForeignKey('parents.id')))
+    Table('parents_children', metadata,
+          Column('parent_id', ForeignKey('parents.id')),
+          Column('child_id', ForeignKey('children.id'), unique=True))
+
+    missing = missing_fk_indexes(metadata)
+
+    assert [(item.table, item.index_columns) for item in missing] == [
+        ('children', ('parent_id',)),
+        ('parents_children', ('parent_id', 'child_id')),
+    ]
+    migration = render_migration(missing, revision='abc123')
+    assert "op.create_index('ix_parents_children_parent_id_child_id', 'parents_children'," in migration
+    assert "op.drop_index('ix_children_parent_id', table_name='children')" in migration
@@ -0,0 +1,101 @@
+import pytest
+from arrow import get
+from sqlalchemy import select
+
+from app.domain.finance.exceptions import BalanceError
+from app.models.finance.balance import Balance
+from app.models.finance.charge import Charge
+from app.models.finance.extras import Entry, Expense
+from app.models.finance.transaction import Transaction
+
+
+APRIL, MAY = get('2022-04-10T12:00:00-04:00'), get('2022-05-10T12:00:00-04:00')
+
+
+def amounts(session, year: int, month: int) -> tuple[int, int, int, int]:
+    """(base, income, expense, debt) of a period as stored."""
+    session.expire_all()
+    balance = session.execute(select(Balance).where(Balance.year == year, Balance.month == month)).scalar_one()
+    return balance.amount_base, balance.amount_income, balance.amount_expense, balance.amount_debt
+
+
+def new_charge(amount: int, created_at) -> Charge:
+    return Charge(amount=amount, paid_amount=0, payload={}, created_at=created_at, expires_at=created_at)
+
+
+def pay(charge: Charge, amount: int, created_at) -> Transaction:
+    transaction = Transaction.new(amount)
+    transaction.created_at = created_at
+    charge.accept_transaction(transaction)
+    return transaction
+
+
+def test_ledger_tracks_inserts_updates_and_deletes(session):
+    entry, expense, charge = Entry.new(1000, 'Aporte', MAY), Expense.new(300, 'Proveedor', MAY), new_charge(800, MAY)
+    session.add_all([entry, expense, charge])
+    session.commit()
+    assert amounts(session, 2022, 5) == (0, 1000, 300, 800)
+
+    session.add(pay(charge, 500, MAY))
+    session.commit()
+    assert amounts(session, 2022, 5) == (0, 1500, 300, 300)
+
+    entry.amount = 1200
+    session.commit()
+    assert amounts(session, 2022, 5) == (0, 1700, 300, 300)
+
+    entry.date_received = APRIL
+    session.commit()
+    assert amounts(session, 2022, 5) == (0, 500, 300, 300)
+    assert amounts(session, 2022, 4) == (0, 1200, 0, 0)
+
+    session.delete(expense)
+    charge.nulled = True
+    session.commit()
+    assert amounts(session, 2022, 5) == (0, 500, 0, 0)
+
+    session.add(Entry.new(77, 'Descartado', MAY))
+    session.flush()
+    session.rollback()
+    assert amounts(session, 2022, 5) == (0, 500, 0, 0)
+
+    session.execute(Balance.__table__.update().values(amount_income=0, amount_expense=0, amount_debt=0))
+    assert Balance.refresh_totals() == 2
+    session.commit()
+    assert (amounts(session, 2022, 4), amounts(session, 2022, 5)) == ((0, 1200, 0, 0), (0, 500, 0, 0))
+
+
+def test_payment_of_a_closed_period_charge_leaves_it_untouched(session):
+    charge = new_charge(800, APRIL)
+    session.add(charge)
+    session.commit()
+    Balance.close_period(2022, 4, at=get('2022-06-01'))
+
+    session.add(pay(charge, 300, MAY))
+    session.commit()
+
+    assert amounts(session, 2022, 4) == (0, 0, 0, 800)
+    assert amounts(session, 2022, 5) == (0, 300, 0, 0)
+
+
+def test_close_period_assigns_rows_and_carries_the_total(session):
+    charge = new_charge(500, APRIL)
+    session.add_all([Entry.new(1000, 'Aporte', APRIL), Expense.new(200, 'Proveedor', APRIL), charge,
+                     Entry.new(50, 'Aporte', MAY)])
+    session.add(pay(charge, 100, APRIL))
+    session.commit()
+
+    with pytest.raises(BalanceError):
+        Balance.close_period(2022, 5, at=get('2022-07-01'))  # April is still open
+    with pytest.raises(BalanceError):
+        Balance.close_period(2022, 4, at=get('2022-04-30'))  # Not finished
+
+    closing = Balance.close_period(2022, 4, at=get('2022-06-01'))
+
+    assert closing.assigned == {'entries': 1, 'expenses': 1, 'transactions': 1, 'charges': 1}
+    assert closing.totals == {'amount_base': 0, 'amount_expense': 200, 'amount_income': 1100, 'amount_debt': 400}
+    assert closing.carried == 900
+    assert amounts(session, 2022, 5) == (900, 50, 0, 0)
+    assert session.execute(select(Entry.balance_id).where(Entry.amount == 50)).scalar() is None
+    with pytest.raises(BalanceError):
+        Balance.close_period(2022, 4, at=get('2022-06-01'))
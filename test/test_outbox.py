@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+from arrow import utcnow
+
+from app.domain.etd.constants.document import DocSetType
+from app.domain.etd.constants.outbox import OutboxState
+from app.domain.etd.sender import outbox as sender_outbox
+from app.domain.etd.sender.exceptions import ETDSendingError
+from app.domain.etd.sender.outbox import CircuitBreaker, OutboxWorker
+from app.models.etd.outbox import SIIOutbox
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the monotonic time of the circuit breakers."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(sender_outbox, 'monotonic', lambda: now.value)
+    return now
+
+
+def new_entry(number: int, doc_set_type: DocSetType = DocSetType.ETD) -> SIIOutbox:
+    xml_data = f'<EnvioDTE>{number}</EnvioDTE>'.encode()
+    return SIIOutbox(doc_set_type=doc_set_type, development=True, rut_issuer='76000000-0',
+                     rut_sender='11111111-1', xml_data=xml_data, content_hash=SIIOutbox.hash_content(xml_data),
+                     state=OutboxState.PENDING, attempts=0, next_attempt_at=utcnow().shift(seconds=-number))
+
+
+class ScriptedWorker(OutboxWorker):
+    """Worker whose uploads succeed while `failing` is false, recording the uploaded entries."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(SIIOutbox, lambda doc_set_type, development: 'token', **kwargs)
+        self.failing = True
+        self.uploads = []
+
+    def upload(self, entry) -> dict:
+        self.uploads.append(entry)
+        if self.failing:
+            raise ETDSendingError('SII unavailable')
+        return {'trackid': str(len(self.uploads))}
+
+
+def test_outbox_uploads_to_sii(session, stand_in):
+    entries = [new_entry(1), new_entry(2, DocSetType.VOUCHER)]
+    session.add_all(entries)
+    session.commit()
+
+    assert OutboxWorker(SIIOutbox, lambda doc_set_type, development: 'token').drain() == 2
+    assert [entry.state for entry in entries] == [OutboxState.SENT] * 2
+    assert all(entry.trackid for entry in entries)
+    assert stand_in.stats.snapshot()['uploads'] == 2
+    assert SIIOutbox.due() == []
+
+
+def test_outbox_retries_until_failed(session, stand_in):
+    stand_in.config.error_rate = 1.0
+    entry = new_entry(1)
+    session.add(entry)
+    session.commit()
+    worker = OutboxWorker(SIIOutbox, lambda doc_set_type, development: 'token', base_delay=60,
+                          max_attempts=3, failure_threshold=10)
+
+    assert worker.drain() == 0
+    assert (entry.state, entry.attempts) == (OutboxState.PENDING, 1)
+    assert 30 <= (entry.next_attempt_at - utcnow()).total_seconds() <= 60
+    assert entry.last_error
+    assert SIIOutbox.due() == []
+
+    for _ in range(2):
+        assert SIIOutbox.due(now=entry.next_attempt_at) == [entry]
+        worker.process(entry)
+
+    assert (entry.state, entry.attempts) == (OutboxState.FAILED, 3)
+    assert SIIOutbox.due(now=utcnow().shift(days=1)) == []
+    entry.retry()
+    assert SIIOutbox.due() == [entry]
+
+
+def test_open_circuit_postpones_the_host_entries(session, clock):
+    entries = [new_entry(number) for number in range(4, 0, -1)]
+    voucher = new_entry(5, DocSetType.VOUCHER)      # Another host
+    session.add_all([*entries, voucher])
+    session.commit()
+    worker = ScriptedWorker(failure_threshold=2, reset_timeout=300)
+
+    assert worker.drain() == 0
+    assert worker.uploads == [voucher, entries[0], entries[1]]
+    assert [entry.attempts for entry in entries] == [1, 1, 0, 0]
+    assert worker.breaker(entries[0].server).state == CircuitBreaker.OPEN
+    # Postponed without counting an attempt, until the circuit lets a trial through
+    for entry in entries[2:]:
+        assert 299 <= (entry.next_attempt_at - utcnow()).total_seconds() <= 300
+
+    clock.value += 300
+    worker.uploads.clear()
+    for entry in entries:
+        entry.next_attempt_at = utcnow()
+    worker.drain()
+
+    # The half open trial fails and opens the circuit again
+    assert worker.uploads == [entries[0]]
+    assert worker.breaker(entries[0].server).state == CircuitBreaker.OPEN
+
+    clock.value += 300
+    worker.failing = False
+    for entry in entries:
+        entry.next_attempt_at = utcnow()
+
+    assert worker.drain() == 4
+    assert worker.breaker(entries[0].server).state == CircuitBreaker.CLOSED
@@ -0,0 +1,70 @@
+import pickle
+from decimal import Decimal
+from uuid import uuid4
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from arrow import get
+from sqlalchemy import JSON, Column, LargeBinary, MetaData, Table, create_engine, inspect, select
+from sqlalchemy_utils import UUIDType
+
+from app.utils.payload_migration import downgrade_charges_payload, upgrade_charges_payload
+
+
+def test_upgrade_swaps_pickled_payloads_for_json():
+    engine = create_engine('sqlite://')
+    charges = Table('charges', MetaData(), Column('id', UUIDType(), primary_key=True),
+                    Column('payload', LargeBinary()))
+    reading_id, pickled, json_encoded, broken, empty = uuid4(), uuid4(), uuid4(), uuid4(), uuid4()
+
+    with engine.begin() as connection:
+        charges.create(connection)
+        connection.execute(charges.insert(), [
+            {'id': pickled, 'payload': pickle.dumps({
+                'current_reading_id': reading_id, 'amount': Decimal('1500'), 'month': get('2022-05-01'),
+                'last_13': {get('2022-04-01'): 12, 3: Decimal('2.5')}})},
+            {'id': json_encoded, 'payload': b'{"current_reading_id": "abc"}'},
+            {'id': broken, 'payload': pickle.dumps(['not', 'a', 'dict'])},
+            {'id': empty, 'payload': None},
+        ])
+
+        skipped = upgrade_charges_payload(Operations(MigrationContext.configure(connection)))
+
+        migrated = Table('charges', MetaData(), Column('id', UUIDType(), primary_key=True),
+                         Column('payload', JSON()), Column('payload_pickle', LargeBinary()))
+        rows = {row.id: row for row in connection.execute(select(migrated))}
+        columns = {column['name']: column for column in inspect(connection).get_columns('charges')}
+        # Expression indexes are not reflected on SQLite
+        index = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'ix_charges_payload_current_reading_id'").scalar()
+
+    assert skipped == [broken]
+    assert rows[pickled].payload == {
+        'current_reading_id': str(reading_id), 'amount': 1500, 'month': '2022-05-01T00:00:00+00:00',
+        'last_13': {'2022-04-01T00:00:00+00:00': 12, '3': '2.5'}}
+    assert rows[json_encoded].payload == {'current_reading_id': 'abc'}
+    assert (rows[broken].payload, pickle.loads(rows[broken].payload_pickle)) == ({}, ['not', 'a', 'dict'])
+    assert rows[empty].payload == {}
+    assert not columns['payload']['nullable']
+    assert '"current_reading_id"' in index
+
+
+def test_downgrade_restores_the_pickled_column():
+    engine = create_engine('sqlite://')
+    charges = Table('charges', MetaData(), Column('id', UUIDType(), primary_key=True),
+                    Column('payload', LargeBinary()))
+    old, new = uuid4(), uuid4()
+
+    with engine.begin() as connection:
+        charges.create(connection)
+        connection.execute(charges.insert(), [{'id': old, 'payload': pickle.dumps({'a': 1})}])
+        op = Operations(MigrationContext.configure(connection))
+        upgrade_charges_payload(op)
+        migrated = Table('charges', MetaData(), Column('id', UUIDType(), primary_key=True),
+                         Column('payload', JSON()))
+        connection.execute(migrated.insert(), [{'id': new, 'payload': {'b': 2}}])
+
+        downgrade_charges_payload(op)
+
+        rows = dict(connection.execute(select(charges.c.id, charges.c.payload)).all())
+
+    assert {key: pickle.loads(value) for key, value in rows.items()} == {old: {'a': 1}, new: {'b': 2}}
@@ -0,0 +1,54 @@
+from arrow import get
+from sqlalchemy import select
+
+from app.domain.finance.constants import RenegotiationState
+from app.models.finance.charge import Charge
+from app.models.finance.renegotiation import Installment, Renegotiation
+from app.utils.clock import frozen
+
+
+START = get('2022-06-01T12:00:00-04:00')
+
+
+def new_renegotiation(*installments: tuple[int, int, int]) -> Renegotiation:
+    """Renegotiation with `(amount, paid_amount, days from START)` installments."""
+    renegotiation = Renegotiation.new(sum(amount for amount, _, _ in installments))
+    renegotiation.installments = [Installment(amount=amount, paid_amount=paid, completed=paid == amount,
+                                              expires_at=START.shift(days=days))
+                                  for amount, paid, days in installments]
+    renegotiation.paid_amount = sum(paid for _, paid, _ in installments)
+    return renegotiation
+
+
+def test_refresh_states_matches_computed_states(session):
+    with frozen(START):
+        charges = [Charge(amount=100, paid_amount=0, payload={}, expires_at=START.shift(days=days))
+                   for days in (-3, 1, 4, 10)]
+        charges.append(Charge(amount=100, paid_amount=100, completed=True, payload={}, expires_at=START))
+        renegotiations = [
+            new_renegotiation((100, 0, -10), (100, 0, 20)),
+            new_renegotiation((100, 0, 2), (100, 0, 32)),
+            new_renegotiation((100, 0, 10)),
+            new_renegotiation((100, 100, -20), (100, 50, 7)),
+            new_renegotiation((100, 0, 30)),
+        ]
+        session.add_all(charges + renegotiations)
+        session.commit()
+
+    with frozen(START.shift(days=5)):
+        assert Charge.refresh_states() == 2
+        assert Installment.refresh_states() == 1
+        session.commit()
+        session.expire_all()
+
+        for charge in charges:
+            assert charge.persisted_state == charge.state
+        for installment in session.execute(select(Installment)).scalars():
+            assert installment.persisted_state == installment.state
+
+        for state in RenegotiationState:
+            derived = set(session.execute(Renegotiation.with_state(state)).scalars())
+            assert derived == {renegotiation for renegotiation in renegotiations if renegotiation.state == state}
+        assert [renegotiation.state for renegotiation in renegotiations] == [
+            RenegotiationState.OVERDUE, RenegotiationState.OVERDUE,
+            RenegotiationState.PENDING, RenegotiationState.PENDING, RenegotiationState.UP_TO_DATE]
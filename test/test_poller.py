@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+from app.domain.etd.constants.document import SIIShipmentType
+from app.domain.etd.sender.exceptions import ETDSendingError
+from app.domain.etd.sender.poller import ShipmentPoller
+
+
+def new_shipment(trackid: str = '1', status=None) -> SimpleNamespace:
+    return SimpleNamespace(type=SIIShipmentType.VOUCHER, trackid=trackid, status=status,
+                           doc_set=SimpleNamespace(cover_data=SimpleNamespace(rut_sender='11111111-1')))
+
+
+class ScriptedPoller(ShipmentPoller):
+    """Poller answering the upload states of `script`, `None` items raise."""
+
+    def __init__(self, script: list, **kwargs) -> None:
+        super().__init__(lambda shipment_type: 'token', **kwargs)
+        self.script = list(script)
+
+    def fetch_state(self, shipment) -> str:
+        state = self.script.pop(0)
+        if state is None:
+            raise ETDSendingError('SII unavailable')
+        return state
+
+
+def test_poller_backs_off_while_the_state_is_unchanged():
+    updates = []
+    poller = ScriptedPoller(['REC', 'REC', None, 'REC', 'REC', 'SOK', 'EPR'], min_interval=30,
+                            max_interval=200,
+                            on_update=lambda shipments: updates.append([item.status for item in shipments]))
+    shipment = new_shipment()
+    poller.track(shipment, now=0)
+
+    now, waits = 0, []
+    while len(poller):
+        now += poller.seconds_to_next_check(now)
+        poller.poll(now)
+        waits.append(poller.seconds_to_next_check(now))
+
+    # Doubles on unchanged states and errors up to `max_interval`, back to the minimum on changes
+    assert waits == [30, 60, 120, 200, 200, 30, None]
+    assert updates == [['REC'], ['SOK'], ['EPR']]
+
+
+def test_poller_batches_and_skips_final_shipments():
+    poller = ScriptedPoller(['REC'] * 3, batch_size=2)
+    poller.track(new_shipment('1', status='EPR'), now=0)        # Already final
+    for trackid in '234':
+        poller.track(new_shipment(trackid), now=0)
+
+    assert len(poller) == 3
+    assert len(poller.poll(now=30)) == 2
+    assert poller.seconds_to_next_check(30) == 0
+    assert len(poller.poll(now=30)) == 1
+
+
+def test_poller_follows_shipments_to_their_final_state(stand_in):
+    poller = ShipmentPoller(lambda shipment_type: 'token')
+    shipment = new_shipment('17')
+    poller.track(shipment, now=0)
+
+    states = []
+    for now in (30, 60, 120):
+        poller.poll(now)
+        states.append(shipment.status)
+
+    assert states == ['REC', 'REC', 'EPR']
+    assert len(poller) == 0
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from arrow import get
+
+from app.models.account.account import Account
+from app.models.account.water_meters import Reading, WaterMeter
+
+
+def new_account(public_id: str, *values: int) -> Account:
+    """Account with a current water meter and a monthly reading of each value."""
+    account = Account.new(public_id)
+    water_meter = WaterMeter(top_limit=9999, consumption=0)
+    for month, value in enumerate(values):
+        water_meter.insert_reading(Reading.new(value, get('2022-01-10').shift(months=month)))
+    account.water_meters.append(water_meter)
+    account.current_water_meter = water_meter
+    return account
+
+
+def meter_state(account: Account) -> tuple:
+    """(current value, previous value, consumption, readings) of the account meter."""
+    meter = account.current_water_meter
+    return (meter.current_reading.value if meter.current_reading else None,
+            meter.previous_reading.value if meter.previous_reading else None,
+            meter.consumption, len(meter.readings))
+
+
+def test_import_readings_rejects_invalid_lines(session):
+    accounts = {public_id: new_account(public_id, *values) for public_id, values in [
+        ('1', (100,)), ('2', (100,)), ('3', (9800,)), ('4', (500,)), ('5', (100,)), ('6', (100,))]}
+    session.add_all([*accounts.values(), Account.new('7')])
+    session.commit()
+
+    report = Account.import_readings(StringIO('\n'.join([
+        'account;value;date',
+        '1;130;2022-02-15',
+        '2;10000;2022-02-15',       # Out of range
+        '3;50;15/02/2022',          # Rollover
+        '4;400;2022-02-15',         # Lower than the current one
+        '5;120;2022-02-05',         # Less than a month after the current one
+        '6;150;2022-02-15',
+        '6;160;2022-02-16',         # Duplicated account
+        '99;10;2022-02-15',         # Unknown account
+        '7;10;2022-02-15',          # Account without water meter
+        '1;abc;2022-02-15',         # Not a number
+    ])))
+    session.commit()
+
+    assert (report.total, report.imported, report.rejected) == (10, 3, 7)
+    assert [(error.line, error.title) for error in report.errors] == [
+        (3, 'Valor de lectura invalido'),
+        (5, 'Valor de lectura invalido'),
+        (6, 'Fecha de lectura invalido'),
+        (8, 'Lectura duplicada'),
+        (9, 'Cuenta invalida'),
+        (10, 'Cuenta invalida'),
+        (11, 'Linea invalida'),
+    ]
+    assert report.errors[0].message.endswith('valor ingresado 10000.')
+
+
+def test_import_readings_moves_current_and_previous_readings(session):
+    accounts = [new_account('1', 100, 120), new_account('2', 9800), new_account('3'), new_account('4', 500)]
+    session.add_all(accounts)
+    session.commit()
+
+    report = Account.import_readings(StringIO(
+        'account,value,date\n1,150,2022-03-15\n2,50,2022-02-15\n3,40,2022-02-15\n4,400,2022-02-15\n'))
+    session.commit()
+    session.expire_all()
+
+    assert report.imported == 3
+    assert [meter_state(account) for account in accounts] == [
+        (150, 120, 50, 3),
+        (50, 9800, 249, 2),         # 9999 - (9800 - 50)
+        (40, None, 0, 1),
+        (500, None, 0, 1),          # Rejected, untouched
+    ]
+    assert accounts[0].current_water_meter.current_reading.date == get('2022-03-15T00:00:00-03:00')
@@ -0,0 +1,74 @@
+import pytest
+from arrow import get
+
+from app.domain.finance.reconciliation import Reconciler, StatementLine, transfer_factory
+from app.models.finance.charge import Charge
+from app.models.finance.renegotiation import Installment, Renegotiation
+from app.models.finance.transaction import Transaction
+
+
+RUT = '11.111.111-1'
+
+
+@pytest.fixture(autouse=True)
+def models(app):
+    """Debts are transient model instances, mappers only need the models loaded."""
+
+
+def new_charge(public_id: str, amount: int, expires_at: str) -> Charge:
+    return Charge(public_id=public_id, amount=amount, paid_amount=0, completed=False, nulled=False,
+                  renegotiated=False, expires_at=get(expires_at))
+
+
+def new_line(line: int, amount: int, reference: str = '', rut: str = '11111111-1') -> StatementLine:
+    return StatementLine(line=line, date=get('2022-06-01'), amount=amount, reference=reference,
+                         rut=rut, key=f'statement:{line}')
+
+
+def test_reference_match():
+    charge, other = new_charge('10', 1000, '2022-05-01'), new_charge('11', 1000, '2022-04-01')
+    reconciler = Reconciler([(charge, RUT), (other, RUT)], transfer_factory(Transaction))
+
+    report = reconciler.reconcile([new_line(2, 400, '#10')])
+
+    assert [(allocation.public_id, allocation.amount) for allocation in report.allocations] == [('10', 400)]
+    assert report.transactions[0].idempotency_key == 'statement:2:0'
+    assert (charge.paid_amount, other.paid_amount) == (400, 0)
+
+
+def test_rut_fallback_pays_oldest_debts_first():
+    newer, older = new_charge('10', 1000, '2022-05-01'), new_charge('11', 1000, '2022-04-01')
+    reconciler = Reconciler([(newer, RUT), (older, RUT)], transfer_factory(Transaction))
+
+    report = reconciler.reconcile([new_line(2, 1500)])
+
+    assert [(allocation.public_id, allocation.amount) for allocation in report.allocations] == [
+        ('11', 1000), ('10', 500)]
+    assert older.completed and not newer.completed
+    assert [transaction.idempotency_key for transaction in report.transactions] == [
+        'statement:2:0', 'statement:2:1']
+
+
+def test_partial_payment_stops_at_first_installment():
+    renegotiation = Renegotiation(public_id='20', amount=900, paid_amount=0, completed=False)
+    renegotiation.installments = [Installment(amount=300, paid_amount=0, completed=False,
+                                              expires_at=get('2022-06-01').shift(months=month))
+                                  for month in range(3)]
+    reconciler = Reconciler([(renegotiation, RUT)], transfer_factory(Transaction))
+
+    reconciler.reconcile([new_line(2, 400, '20'), new_line(3, 50, '20')])
+
+    assert [(installment.paid_amount, installment.completed) for installment in renegotiation.installments] == [
+        (300, True), (150, False), (0, False)]
+    assert (renegotiation.paid_amount, renegotiation.debt()) == (450, 450)
+
+
+def test_overpayment_is_rejected():
+    charge = new_charge('10', 1000, '2022-05-01')
+    reconciler = Reconciler([(charge, RUT)], transfer_factory(Transaction))
+
+    report = reconciler.reconcile([new_line(2, 1500, '10')])
+
+    assert charge.completed
+    assert (report.received, report.allocated, report.unallocated) == (1500, 1000, 500)
+    assert [(rejection.line, rejection.title) for rejection in report.rejections] == [(2, 'Saldo sin asignar')]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from arrow import get
+
+from app.domain.finance.constants import RenegotiationState
+from app.domain.finance.schedule import plan_schedules, renegotiation_states
+from app.models.account.account import Account
+from app.models.finance.charge import Charge
+from app.models.finance.renegotiation import Renegotiation
+from app.models.user import User
+from app.utils.clock import frozen
+
+
+FIRST_DUE = get('2022-07-05T12:00:00-04:00')
+
+
+def test_plan_schedules_splits_debts():
+    schedule = plan_schedules(['a', 'b'], np.array([1000, 90]), np.array([3, 1]), FIRST_DUE)
+
+    assert schedule.amounts.tolist() == [[334, 333, 333], [90, 0, 0]]
+    assert schedule.valid.tolist() == [[True, True, True], [True, False, False]]
+    with frozen(FIRST_DUE.shift(days=-30)):
+        assert renegotiation_states(schedule).tolist() == [RenegotiationState.UP_TO_DATE] * 2
+
+
+@pytest.mark.parametrize('debts, counts', [([100], [0]), ([100], [-1]), ([-100], [2])])
+def test_plan_schedules_rejects_invalid_plans(debts, counts):
+    with pytest.raises(ValueError):
+        plan_schedules(['a'], np.array(debts), np.array(counts), FIRST_DUE)
+
+
+def test_from_schedule_belongs_to_the_account(session):
+    user = User(rut='11111111-1', name='juan', password_hash=b'x')
+    account = Account.new('1')
+    charge = Charge(amount=1000, paid_amount=0, payload={}, expires_at=get('2022-05-01'))
+    account.user, account.charges = user, [charge]
+    session.add(account)
+    session.commit()
+
+    schedule = plan_schedules([account.id], np.array([1000]), 3, FIRST_DUE)
+    renegotiation = Renegotiation.from_schedule(schedule, 0, user.id, [charge])
+    session.add(renegotiation)
+    session.commit()
+
+    assert (renegotiation.account_id, renegotiation.user_id, renegotiation.charges) == (account.id, user.id, [charge])
+    assert charge.renegotiated
+    with frozen(FIRST_DUE.shift(days=-1)):
+        debt = Account.debts([account.id])[account.id]
+    assert (debt.charges, debt.renegotiations, debt.expired_installments) == (0, 1000, 0)
+
+
+def test_from_schedule_links_charges_of_a_generator(session):
+    account = Account.new('1')
+    charges = [Charge(amount=amount, paid_amount=0, payload={}, expires_at=get('2022-05-01')) for amount in (400, 600)]
+    account.charges = charges
+    session.add(account)
+    session.commit()
+
+    schedule = plan_schedules([account.id], np.array([1000]), 2, FIRST_DUE)
+    renegotiation = Renegotiation.from_schedule(schedule, 0, None, (charge for charge in charges))
+    session.add(renegotiation)
+    session.commit()
+    session.expire_all()
+
+    assert sorted(charge.amount for charge in renegotiation.charges) == [400, 600]
+    assert all(charge.renegotiated for charge in charges)
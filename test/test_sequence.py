@@ -0,0 +1,42 @@
+from sqlalchemy import select
+
+from app.db import db
+from app.models.account.account import Account
+from app.models.shared.sequence import Sequence
+
+
+def test_public_ids_start_after_the_greatest_existing_one(session):
+    session.add_all([Account.new(public_id) for public_id in ('A0007', 'A0003', 'Axyz', 'B0100')])
+    session.commit()
+
+    assert [Account.new_public_id('A', 4) for _ in range(3)] == ['A0008', 'A0009', 'A0010']
+    assert Account.new_public_id('B', 4) == 'B0101'
+    assert Account.new_public_id('C', 4) == 'C0001'
+
+
+def test_next_value_is_increasing_and_seeded_once(session):
+    seeds = []
+
+    def seed() -> int:
+        seeds.append(1)
+        return 41
+
+    values = [Sequence.next_value('tests', seed=seed) for _ in range(5)]
+
+    assert values == [42, 43, 44, 45, 46]
+    assert len(seeds) == 1
+    assert Sequence.next_value('other') == 1
+
+
+def test_blocks_are_reserved_at_once(session, monkeypatch):
+    monkeypatch.setattr(db.engine.dialect, 'name', 'other')     # Block allocation path
+    monkeypatch.setattr(Sequence, '_Sequence__blocks', {})
+
+    values = [Sequence.next_value('tests', block_size=3, seed=lambda: 10) for _ in range(7)]
+
+    assert values == list(range(11, 18))
+    # Three blocks reserved, the unused values of the last one are skipped
+    stored = session.execute(select(Sequence.value).where(Sequence.name == 'tests')).scalar_one()
+    assert stored == 19
+    monkeypatch.setattr(Sequence, '_Sequence__blocks', {})
+    assert Sequence.next_value('tests', block_size=3) == 20
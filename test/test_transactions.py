@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.db import db
+from app.models.finance.transaction import Transaction
+
+
+@pytest.mark.parametrize('dialect', ['sqlite', 'other'])
+def test_ingest_reports_only_rows_it_inserted(session, monkeypatch, dialect):
+    session.add(Transaction.new(100, idempotency_key='a'))
+    session.commit()
+    if dialect != 'sqlite':
+        monkeypatch.setattr(db.engine.dialect, 'name', dialect)  # Plain INSERT path
+    # A concurrent ingestion stores `a` between the probe and the insert
+    existing_keys, probes = Transaction.existing_keys, []
+
+    def probe_before_concurrent_insert(cls, keys):
+        probes.append(keys)
+        return existing_keys(keys) if len(probes) > 1 else set()
+
+    monkeypatch.setattr(Transaction, 'existing_keys', classmethod(probe_before_concurrent_insert))
+
+    inserted = Transaction.ingest([{'amount': 100, 'idempotency_key': 'a'},
+                                   {'amount': 200, 'idempotency_key': 'b'},
+                                   {'amount': 300, 'idempotency_key': 'b'}])
+    session.commit()
+
+    assert inserted == {'b'}
+    assert session.execute(select(func.count(Transaction.id))).scalar() == 2
+    assert session.execute(select(Transaction.amount).where(Transaction.idempotency_key == 'b')).scalar() == 200
@@ -0,0 +1,56 @@
+import zlib
+
+import pytest
+from arrow import get
+from sqlalchemy import LargeBinary, column, select, table, update
+from sqlalchemy_utils import UUIDType
+
+from app.domain.etd.constants.document import DocumentType
+from app.models.etd.etd import ETD
+from app.models.shared.types import compress, decompress
+
+
+XML = ('<?xml version="1.0" encoding="ISO-8859-1"?>\n<DTE version="1.0"><Documento ID="T39F120">'
+       '<Encabezado><IdDoc><TipoDTE>39</TipoDTE><Folio>120</Folio><FchEmis>2022-06-10</FchEmis>'
+       '<IndServicio>3</IndServicio></IdDoc><Emisor><RUTEmisor>76000000-0</RUTEmisor>'
+       '<RznSocEmisor>Comité de Agua Potable Rural</RznSocEmisor></Emisor><Receptor>'
+       '<RUTRecep>11111111-1</RUTRecep><RznSocRecep>Juan Pérez</RznSocRecep></Receptor><Totales>'
+       '<MntExe>8500</MntExe><MntTotal>8500</MntTotal></Totales></Encabezado></Documento></DTE>'
+       ).encode('iso-8859-1')
+
+
+@pytest.mark.parametrize('dictionary_id', [0, 1])
+def test_compress_round_trip(dictionary_id):
+    compressed = compress(XML, dictionary_id)
+
+    assert compressed[0] == dictionary_id
+    assert decompress(compressed) == XML
+
+
+def test_dictionary_is_required_to_inflate():
+    compressed = compress(XML)
+
+    assert len(compressed) < len(compress(XML, 0)) < len(XML)
+    with pytest.raises(zlib.error):
+        zlib.decompress(compressed[1:])
+
+
+@pytest.mark.parametrize('data', [XML, b'<DTE version="1.0"/>', b'\xef\xbb\xbf<?xml version="1.0"?><DTE/>', b''])
+def test_decompress_passes_legacy_values_through(data):
+    assert decompress(data) == data
+
+
+def test_etd_xml_data_is_compressed_at_rest(session):
+    stored = table('etds', column('id', UUIDType()), column('xml_data', LargeBinary()))
+    etds = [ETD(doc_type=int(DocumentType.BOLETA_ELECTRÓNICA), folio=folio, date_emited=get('2022-06-10'),
+                rut_receptor='11111111-1', xml_data=XML) for folio in (1, 2)]
+    session.add_all(etds)
+    session.commit()
+    # Rows written before compression hold the raw XML
+    session.execute(update(stored).where(stored.c.id == etds[1].id).values(xml_data=XML))
+    session.commit()
+    session.expire_all()
+
+    raw = dict(session.execute(select(stored.c.id, stored.c.xml_data)).all())
+    assert raw[etds[0].id][0] == 1 and raw[etds[1].id] == XML
+    assert [etd.xml_data for etd in etds] == [XML, XML]